@@ -28,7 +28,7 @@
 import datetime
 import decimal
 from firebirdsql.consts import *    # noqa
-from firebirdsql.fbcore import Connection
+from firebirdsql.fbcore import Connection, BlobReader
 import firebirdsql.services
 from firebirdsql.err import (
     Warning, Error, InterfaceError, DatabaseError, DisconnectByPeer, InternalError,
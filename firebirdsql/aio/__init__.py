@@ -1,4 +1,4 @@
-from .fbcore import AsyncConnection, AsyncCursor
+from .fbcore import AsyncConnection, AsyncCursor, AsyncBlobReader
 from .pool import create_pool
 
 
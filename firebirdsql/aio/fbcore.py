@@ -29,26 +29,29 @@ import sys
 import asyncio
 import datetime
 import itertools
+import collections
 import hashlib
 import select
-from firebirdsql.fbcore import Statement, PreparedStatement, Cursor, Transaction, ConnectionBase, ConnectionResponseMixin
+import time
+from firebirdsql.fbcore import (
+    Statement, PreparedStatement, BlobReader, Cursor, Transaction, Pipeline, ConnectionBase,
+    ConnectionResponseMixin, _parse_segments, _parse_blob_info, _status_error, _BLOB_INFO_ITEMS,
+    _EXECUTEMANY_SAVEPOINT
+)
 from firebirdsql.fberrmsgs import messages
-from firebirdsql.err import InternalError, OperationalError, NotSupportedError, IntegrityError, DataError
+from firebirdsql.err import (
+    InternalError, OperationalError, NotSupportedError, DatabaseError
+)
 from firebirdsql.consts import *    # noqa
 from firebirdsql.utils import *     # noqa
-from firebirdsql.wireprotocol import WireProtocol, get_crypt
+from firebirdsql.wireprotocol import WireProtocol, BatchBuffer, PendingResponse, get_crypt
 from firebirdsql.aio.stream import AsyncSocketStream
-from firebirdsql.xsqlvar import calc_blr, parse_xsqlda
+from firebirdsql.xsqlvar import RowDecoder, ColumnBuilder, parse_xsqlda
+from firebirdsql.fetchsize import FetchSizer
 from firebirdsql.aio.xsqlvar import async_parse_xsqlda
+from firebirdsql.stmtcache import describe_cache
 from firebirdsql import srp
-try:
-    from Crypto.Cipher import ARC4
-except ImportError:
-    from firebirdsql.arc4 import ARC4
-try:
-    from Crypto.Cipher import ChaCha20
-except ImportError:
-    from firebirdsql.chacha import ChaCha20
+from firebirdsql import arc4, chacha
 
 
 def DEBUG_OUTPUT(*argv):
@@ -70,109 +73,188 @@ class AsyncStatement(Statement):
         self._is_open = False
         self.stmt_type = None
         self.handle = -1
+        self.sql = None
+        self.cache_generation = self.trans.connection.statement_cache.generation
+        # ParamEncoder by the types of the parameters
+        self.param_encoders = {}
 
     @classmethod
     async def create(cls, trans):
         self = cls(trans)
+        if self.trans.connection._free_statement_handles:
+            self.handle = self.trans.connection._free_statement_handles.pop()
+            return self
         self.trans.connection._op_allocate_statement()
         if (self.trans.connection.accept_type & ptype_MASK) == ptype_lazy_send:
-            self.trans.connection.lazy_response_count += 1
+            self.trans.connection._defer_response(callback=self._allocated)
             self.handle = -1
         else:
             (h, oid, buf) = await self.trans.connection._async_op_response()
             self.handle = h
         return self
 
-    async def fetch_generator(self, rows, more_data, fetch_count):
+    async def fetch_generator(
+        self, fetch_sizer, memory_budget=None, min_count=1, prefetch_depth=0, blob_mode='eager', first_fetch=None
+    ):
         DEBUG_OUTPUT("AsyncStatement::_fetch_generator()", self.handle, self.trans._trans_handle, self.trans.connection.db_handle)
-        connection = self.trans.connection
-        while rows:
-            for r in rows:
+        self._rows = collections.deque()
+        self._more_data = True
+        self._fetch_sizer = fetch_sizer
+        self._fetch_memory_budget = memory_budget
+        self._min_fetch_count = min_count
+        self.fetch_sizes = []   # op_fetch counts of this result set
+        self._prefetch_depth = prefetch_depth
+        self._prefetching = 0   # op_fetch sent ahead, response not read yet
+        self._blob_mode = blob_mode
+        if first_fetch is None:
+            await self._async_fetch_next()
+        else:
+            fetch_count, response = first_fetch
+            self.fetch_sizes.append(fetch_count)
+            await self.trans.connection._async_recv_pending(response)
+            self._received(*response.result())
+        return self._async_fetch_rows()
+
+    async def _async_fetch_rows(self):
+        while True:
+            self._prefetch()
+            # the rows may be consumed without giving the loop control
+            self.trans.connection.sock.flush()
+            while self._rows:
+                r = self._rows.popleft()
                 # Convert BLOB handle to data
                 for i in range(len(self.xsqlda)):
                     x = self.xsqlda[i]
                     if x.sqltype == SQL_TYPE_BLOB:
                         if not r[i]:
                             continue
-                        connection._op_open_blob2(r[i], self.trans.trans_handle)
-                        if (connection.accept_type & ptype_MASK)== ptype_lazy_send:
-                            connection.lazy_response_count += 1
-                            h = -1
-                        else:
-                            (h, oid, buf) = await connection._async_op_response()
-                        v = bytes([])
-                        n = 1   # 0,1:mora data 2:no more data
-                        while n != 2:
-                            connection._op_get_segment(h)
-                            (n, oid, buf) = await connection._async_op_response()
-                            while buf:
-                                ln = bytes_to_int(buf[:2])
-                                v += buf[2:ln+2]
-                                buf = buf[ln+2:]
-                        connection._op_close_blob(h)
-                        if (connection.accept_type & ptype_MASK)== ptype_lazy_send:
-                            connection.lazy_response_count += 1
-                        else:
-                            (h, oid, buf) = await connection._async_op_response()
-                        r[i] = v
-                        if x.sqlsubtype == 1:    # TEXT
-                            r[i] = connection.bytes_to_str(r[i])
+                        r[i] = await self._async_blob_value(x, r[i])
                 yield tuple(r)
-            if more_data:
-                connection._op_fetch(self.handle, calc_blr(self.xsqlda), fetch_count)
-                (rows, more_data) = await connection._async_op_fetch_response(self.handle, self.xsqlda)
+            if self._prefetching:
+                await self.trans.connection._async_recv_pending(self)
+            elif self._more_data:
+                await self._async_fetch_next()
             else:
                 break
-        return
 
-    async def prepare(self, sql, explain_plan=False):
-        DEBUG_OUTPUT("AsyncStatement::prepare()", self.handle)
-        if explain_plan:
-            self.trans.connection._op_prepare_statement(
-                self.handle, self.trans.trans_handle, sql,
-                option_items=bytes([isc_info_sql_get_plan]))
+    async def _async_fetch_next(self, fetch_count=None, columns=None):
+        connection = self.trans.connection
+        # responses of op_fetch sent ahead come first, don't time them
+        await connection._async_recv_pending()
+        if fetch_count is None:
+            fetch_count = self._next_fetch_count()
+        start, consumed = time.monotonic(), connection.sock.consumed
+        connection._op_fetch(self.handle, self.decoder.blr, fetch_count)
+        if columns is None:
+            (rows, self._more_data) = await connection._async_op_fetch_response(self.handle, self.decoder)
+            self._rows.extend(rows)
+            n = len(rows)
         else:
-            self.trans.connection._op_prepare_statement(
-                self.handle, self.trans.trans_handle, sql)
-            self.plan = None
-
-        if self.trans.connection.lazy_response_count:
-            self.trans.connection.lazy_response_count -= 1
-            (h, oid, buf) = await self.trans.connection._async_op_response()
-            self.handle = h
+            n = columns.count
+            (columns, self._more_data) = await connection._async_op_fetch_response(self.handle, columns.decoder, columns)
+            n = columns.count - n
+        self._fetch_sizer.record(n, connection.sock.consumed - consumed, time.monotonic() - start)
+        if not n:
+            self._more_data = False
+
+    async def _async_blob_value(self, x, blob_id):
+        reader = AsyncBlobReader(self.trans, blob_id, x.sqlsubtype)
+        if self._blob_mode == 'lazy':
+            return reader
+        v = await reader.read()
+        await reader.close()
+        if x.sqlsubtype == 1:    # TEXT
+            v = self.trans.connection.bytes_to_str(v)
+        return v
+
+    async def fetch_columns(self, size=None):
+        """Fetch up to size (all if None) remaining rows into columns.
+        Return [(values, nulls), ...] by column, see ColumnBuilder.
+        """
+        DEBUG_OUTPUT("AsyncStatement::fetch_columns()", self.handle, size)
+        if self._column_decoder is None:
+            self._column_decoder = RowDecoder(self.xsqlda, self.trans.connection.accept_version, columnar=True)
+        columns = ColumnBuilder(self._column_decoder)
+        while size is None or columns.count < size:
+            if self._rows:
+                # rows already fetched for fetchone()/fetchmany() or prefetched
+                columns.append_converted(self._rows.popleft())
+            elif self._prefetching:
+                await self.trans.connection._async_recv_pending(self)
+            elif self._more_data:
+                limit = None if size is None else size - columns.count
+                await self._async_fetch_next(self._next_fetch_count(limit), columns)
+            else:
+                break
+        # Convert BLOB handle to data
+        for x, values in zip(self.xsqlda, columns.values):
+            if x.sqltype == SQL_TYPE_BLOB:
+                values[:] = [(await self._async_blob_value(x, v)) if v else v for v in values]
+        return columns.columns()
 
+    async def prepare(self, sql, explain_plan=False):
+        DEBUG_OUTPUT("AsyncStatement::prepare()", self.handle)
+        self._send_prepare(sql, explain_plan)
+        # the handle is set by the response of op_allocate_statement read first
         (h, oid, buf) = await self.trans.connection._async_op_response()
+        await self._prepared(sql, buf)
 
+    async def _prepared(self, sql, buf):
+        "Parse the response of op_prepare_statement"
         i = 0
         if buf[i] == isc_info_sql_get_plan:
             ln = bytes_to_int(buf[i+1:i+3])
             self.plan = self.trans.connection.bytes_to_str(buf[i+3:i+3+ln])
             i += 3 + ln
-        self.stmt_type, self.xsqlda = await async_parse_xsqlda(buf[i:], self.trans.connection, self.handle)
-        if self.stmt_type == isc_info_sql_stmt_select:
-            self._is_open = True
+        key = self._describe_key(sql)
+        described = describe_cache.get(key, buf[i:])
+        if described is None:
+            stmt_type, xsqlda, describe_length = await async_parse_xsqlda(buf[i:], self.trans.connection, self.handle)
+            described = self._described(key, buf[i:], stmt_type, xsqlda, describe_length)
+        self.stmt_type, self.xsqlda, self.decoder = described.stmt_type, described.xsqlda, described.decoder
+        self._column_decoder = None
+        self.fetch_sizer = FetchSizer(self.xsqlda)
+        self.sql = sql
 
     async def close(self):
         DEBUG_OUTPUT("AsyncStatement::close()", self.handle)
         if self.stmt_type == isc_info_sql_stmt_select and self._is_open:
-            await self.trans.connection._async_op_free_statement(self.handle, DSQL_close)
-            if (self.trans.connection.accept_type & ptype_MASK) == ptype_lazy_send:
-                self.trans.connection.lazy_response_count += 1
+            self.trans.connection._op_free_statement(self.handle, DSQL_close)
+            if self.trans.connection._defers_response():
+                self.trans.connection._defer_response()
             else:
                 (h, oid, buf) = await self.trans.connection._async_op_response()
         self._is_open = False
 
     async def drop(self):
         DEBUG_OUTPUT("AsyncStatement::drop()", self.handle)
-        if self.handle != -1 and self._is_open:
+        if self.handle != -1:
             self.trans.connection._op_free_statement(self.handle, DSQL_drop)
-            if (self.trans.connection.accept_type & ptype_MASK) == ptype_lazy_send:
-                self.trans.connection.lazy_response_count += 1
+            if self.trans.connection._defers_response():
+                self.trans.connection._defer_response()
             else:
                 (h, oid, buf) = await self.trans.connection._async_op_response()
         self._is_open = False
         self.handle = -1
 
+    async def release(self):
+        DEBUG_OUTPUT("AsyncStatement::release()", self.handle)
+        connection = self.trans.connection
+        if (
+            self.handle == -1 or connection.accept_version < PROTOCOL_VERSION13 or
+            len(connection._free_statement_handles) >= MAX_FREE_STATEMENT_HANDLES
+        ):
+            await self.drop()
+            return
+        connection._op_free_statement(self.handle, DSQL_unprepare)
+        if connection._defers_response():
+            connection._defer_response()
+        else:
+            (h, oid, buf) = await connection._async_op_response()
+        connection._free_statement_handles.append(self.handle)
+        self._is_open = False
+        self.handle = -1
+
 
 class AsyncPreparedStatement(PreparedStatement):
     async def __init__(self, cur, sql, explain_plan=False):
@@ -187,6 +269,154 @@ class AsyncPreparedStatement(PreparedStatement):
         await self.stmt.close()
 
 
+class AsyncBlobReader(BlobReader):
+    "BlobReader of asyncio connections, see BlobReader"
+    def __repr__(self):
+        return '<AsyncBlobReader %s>' % (self.blob_id.hex(), )
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc, value, traceback):
+        await self.close()
+
+    async def _open(self):
+        connection = self.trans.connection
+        connection._op_open_blob2(self.blob_id, self.trans.trans_handle)
+        (self._handle, oid, buf) = await connection._async_op_response()
+
+    async def _fill(self):
+        if self._handle is None:
+            await self._open()
+        connection = self.trans.connection
+        connection._op_get_segment(self._handle, BLOB_GET_SEGMENT_LENGTH)
+        (n, oid, buf) = await connection._async_op_response()
+        _parse_segments(buf, self._segments)
+        if n == 2:  # isc_segstr_eof
+            self._eof = True
+
+    async def _read_rest(self, sink=None):
+        if self._handle is None:
+            await self._open()
+        connection = self.trans.connection
+        if not self._info:
+            # the first segments come with the BLOB info
+            connection._op_info_blob(self._handle, _BLOB_INFO_ITEMS)
+            if not self._eof:
+                connection._op_get_segment(self._handle, BLOB_GET_SEGMENT_LENGTH)
+            (h, oid, buf) = await connection._async_op_response()
+            self._info = _parse_blob_info(buf)
+            if not self._eof:
+                (n, oid, buf) = await connection._async_op_response()
+                _parse_segments(buf, self._segments)
+                self._eof = n == 2
+        assembler = self._assembler(sink)
+        while True:
+            for i in range(assembler.requests()):
+                connection._op_get_segment(self._handle, assembler.buffer_length)
+            if not assembler.in_flight:
+                break
+            (n, oid, buf) = await connection._async_op_response()
+            assembler.feed(n, buf)
+        self._eof = True
+        self._pos += assembler.length
+        return assembler
+
+    async def read(self, n=-1):
+        self._check_closed()
+        if n is None or n < 0:
+            return (await self._read_rest()).value()
+        chunks = []
+        while n:
+            if not self._segments:
+                if self._eof:
+                    break
+                await self._fill()
+                continue
+            b = self._take(n)
+            chunks.append(b)
+            n -= len(b)
+        return b''.join(chunks)
+
+    async def readinto(self, b):
+        m = memoryview(b).cast('B')
+        data = await self.read(len(m))
+        m[:len(data)] = data
+        return len(data)
+
+    def __iter__(self):
+        raise TypeError("use 'async for' with AsyncBlobReader")
+
+    async def __aiter__(self):
+        self._check_closed()
+        while True:
+            if not self._segments:
+                if self._eof:
+                    return
+                await self._fill()
+                continue
+            yield bytes(self._take(sys.maxsize))
+
+    async def copy_to(self, f):
+        self._check_closed()
+        return (await self._read_rest(f)).length
+
+    async def _blob_info(self, item):
+        if item not in self._info:
+            if self._handle is None:
+                await self._open()
+            connection = self.trans.connection
+            connection._op_info_blob(self._handle, _BLOB_INFO_ITEMS)
+            (h, oid, buf) = await connection._async_op_response()
+            self._info = _parse_blob_info(buf)
+        return self._info[item]
+
+    async def total_length(self):
+        self._check_closed()
+        return await self._blob_info(isc_info_blob_total_length)
+
+    async def seek(self, offset, whence=0):
+        self._check_closed()
+        if whence == 2:
+            offset += await self.total_length()
+            whence = 0
+        target = self._seek_target(offset, whence)
+        if target == self._pos:
+            return self._pos
+        connection = self.trans.connection
+        if await self._blob_info(isc_info_blob_type) == 1:  # stream BLOB
+            connection._op_seek_blob(self._handle, blb_seek_from_head, target)
+            (h, oid, buf) = await connection._async_op_response()
+            # the new position is in the lower word of the BLOB id
+            self._pos = bytes_to_bint(oid[4:8])
+            self._segments.clear()
+            self._eof = False
+            return self._pos
+        if target < self._pos:
+            await self._close_blob()
+        while self._pos < target and await self.read(min(target - self._pos, BLOB_SEGMENT_SIZE)):
+            pass
+        return self._pos
+
+    async def _close_blob(self):
+        if self._handle is not None:
+            connection = self.trans.connection
+            connection._op_close_blob(self._handle)
+            if connection._defers_response():
+                connection._defer_response()
+            else:
+                (h, oid, buf) = await connection._async_op_response()
+        self._handle = None
+        self._segments.clear()
+        self._eof = False
+        self._pos = 0
+
+    async def close(self):
+        if not self.closed:
+            await self._close_blob()
+        self.closed = True
+
+
 class AsyncCursor(Cursor):
     def __init__(self, obj):
         DEBUG_OUTPUT("AsyncCursor::__init__()")
@@ -203,7 +433,26 @@ class AsyncCursor(Cursor):
         conn._cursors[self._transaction].append(self)
         self.stmt = None
         self.arraysize = 1
+        # False not to ask the server the record count of each execution
+        self.track_rowcount = True
         self.rowcount = -1
+        # number of fetch batches requested ahead while rows are consumed
+        self.prefetch_depth = 0
+        # FetchSizer used instead of the one of the statement
+        self.fetch_sizer = None
+        # upper bound of the memory held by a fetched batch
+        self.fetch_memory_budget = DEFAULT_FETCH_MEMORY_BUDGET
+        # 'eager' or 'lazy' (AsyncBlobReader), None means the connection's
+        self.blob_mode = None
+        # bytes of the rows sent by a batch of executemany()
+        self.batch_buffer_size = DEFAULT_BATCH_BUFFER_SIZE
+        # executemany() executes the rest of the rows after an error
+        self.batch_continue_on_error = False
+        # rows of executemany() sent ahead without the batch interface
+        self.executemany_depth = DEFAULT_EXECUTEMANY_DEPTH
+        # record counts and (row index, error) of the last executemany()
+        self.rowcounts = []
+        self.batch_errors = []
 
     async def __aenter__(self):
         return self
@@ -220,15 +469,38 @@ class AsyncCursor(Cursor):
         if isinstance(query, PreparedStatement):
             stmt = query.stmt
         else:
-            if self.stmt:
-                await self.stmt.drop()
-                self.stmt = None
+            await self._release_stmt()
+            self.stmt = self.transaction.connection.statement_cache.take(query)
             if self.stmt is None:
                 self.stmt = await AsyncStatement.create(self.transaction)
+                await self.stmt.prepare(query)
+                self._remember_decoder(query, self.stmt)
+            else:
+                self.stmt.trans = self.transaction
             stmt = self.stmt
-            await stmt.prepare(query)
         return stmt
 
+    async def _release_stmt(self):
+        "Put back the statement to the statement cache, drop it if not cached"
+        stmt, self.stmt = self.stmt, None
+        self._fetch_records = None
+        if not stmt:
+            return
+        cache = self.transaction.connection.statement_cache
+        if stmt.cache_generation != cache.generation:
+            # prepared before reconnect
+            return
+        if stmt.stmt_type is None:
+            # failed to prepare
+            await stmt.drop()
+            return
+        if stmt.stmt_type == isc_info_sql_stmt_ddl:
+            released = [stmt]
+        else:
+            released = cache.put(stmt.sql, stmt)
+        for stmt in released:
+            await stmt.release()
+
     async def prep(self, query, explain_plan=False):
         DEBUG_OUTPUT("AcyncCursor::prep()")
         prepared_statement = await AsyncPreparedStatement(self, query, explain_plan=explain_plan)
@@ -238,47 +510,152 @@ class AsyncCursor(Cursor):
         if params is None:
             params = []
         await self.transaction.check_trans_handle()
+        if self._prepare_with_execute(query, params):
+            return await self._execute_unprepared(query, params)
         stmt = await self._get_stmt(query)
+        return await self._execute_stmt(stmt, params)
+
+    async def _execute_unprepared(self, query, params):
+        connection = self.transaction.connection
         cooked_params = self._convert_params(params)
+        await self._release_stmt()
+        self.query = query
+        # a miss of the statement cache
+        connection.statement_cache.take(query)
+        stmt = self.stmt = await AsyncStatement.create(self.transaction)
+        decoder = connection.statement_cache.decoder(query)
+        stmt._send_prepare(query)
+        prepared = connection._defer_response(observed=True)
+        connection._op_execute(stmt.handle, self.transaction.trans_handle, cooked_params, stmt.param_encoders)
+        executed = connection._defer_response(observed=True)
+        last = counted = fetched = None
+        if self.track_rowcount:
+            connection._op_info_sql(stmt.handle, bytes([isc_info_sql_records]))
+            last = counted = connection._defer_response(observed=True)
+        if decoder is not None:
+            fetch_sizer = self.fetch_sizer or FetchSizer(decoder.xsqlda)
+            fetch_count = fetch_sizer.fetch_count(self.arraysize, self.fetch_memory_budget)
+            connection._op_fetch(stmt.handle, decoder.blr, fetch_count)
+            last = fetched = connection._defer_response('_recv_prefetch_response', (decoder, ), observed=True)
+
+        try:
+            await connection._async_recv_pending(prepared)
+            prepared.result()
+            await stmt._prepared(query, prepared.value[2])
+            await connection._async_recv_pending(executed)
+            executed.result()
+        except DatabaseError:
+            # the responses of the rest are not used
+            await connection._async_recv_pending(last)
+            raise
+        self._remember_decoder(query, stmt)
+        self.rowcount = -1
+        if counted is not None:
+            await connection._async_recv_pending(counted)
+            self.rowcount = self._parse_rowcount(stmt, counted.result()[2])
+        self._fetch_records = None
+        self._callproc_result = None
+        if stmt.stmt_type != isc_info_sql_stmt_select:
+            return self
+        stmt._is_open = True
+        if fetched is not None:
+            if decoder is not stmt.decoder:
+                # the describe response is changed (the BLR does not tell a
+                # charset or a BLOB subtype), fetch again in the new format
+                await connection._async_recv_pending(fetched)
+                await stmt.close()
+                return await self._execute_stmt(stmt, params)
+            if not self.fetch_sizer:
+                stmt.fetch_sizer = fetch_sizer
+            fetched = (fetch_count, fetched)
+        self._fetch_records = await stmt.fetch_generator(
+            self.fetch_sizer or stmt.fetch_sizer, self.fetch_memory_budget,
+            self.arraysize, self.prefetch_depth,
+            self.blob_mode or connection.blob_mode, fetched)
+        self._fetch_stmt = stmt
+        return self
+
+    async def _execute_stmt(self, stmt, params):
+        cooked_params = self._convert_params(params)
+        if stmt._is_open:
+            # result set of the last execution is left open
+            await stmt.close()
+        if stmt.stmt_type == isc_info_sql_stmt_ddl:
+            await self.transaction.connection._drop_cached_statements()
+        # op_info_sql of the record count is sent along with the execute
+        info_sql = self._info_sql_with_execute(stmt)
         if stmt.stmt_type == isc_info_sql_stmt_exec_procedure:
             self.transaction.connection._op_execute2(
                 stmt.handle,
                 self.transaction.trans_handle, cooked_params,
-                calc_blr(stmt.xsqlda))
-            self._callproc_result = await self.transaction.connection._async_op_sql_response(stmt.xsqlda)
-            await self.transaction.connection._async_op_response()
+                stmt.decoder.blr, stmt.param_encoders)
+            if info_sql:
+                self.transaction.connection._op_info_sql(stmt.handle, bytes([isc_info_sql_records]))
+            try:
+                self._callproc_result = await self.transaction.connection._async_op_sql_response(stmt.decoder)
+                await self.transaction.connection._async_op_response()
+            except DatabaseError:
+                await self._skip_info_sql_response(info_sql)
+                raise
+            await self._receive_rowcount(stmt, info_sql)
             self._fetch_records = None
         else:
             DEBUG_OUTPUT(
                 "AsyncCursor::execute() _op_execute()",
                 stmt.handle, self.transaction.trans_handle)
             self.transaction.connection._op_execute(
-                stmt.handle, self.transaction.trans_handle, cooked_params)
-            (h, oid, buf) = await self.transaction.connection._async_op_response()
+                stmt.handle, self.transaction.trans_handle, cooked_params, stmt.param_encoders)
+            if info_sql:
+                self.transaction.connection._op_info_sql(stmt.handle, bytes([isc_info_sql_records]))
+            try:
+                (h, oid, buf) = await self.transaction.connection._async_op_response()
+            except DatabaseError:
+                await self._skip_info_sql_response(info_sql)
+                raise
+            await self._receive_rowcount(stmt, info_sql)
 
             if stmt.stmt_type == isc_info_sql_stmt_select:
-                fetch_count = max(self.arraysize, DEFAULT_FETCH_COUNT)
-                self.transaction.connection._op_fetch(stmt.handle, calc_blr(stmt.xsqlda), fetch_count)
-                (rows, more_data) = await self.transaction.connection._async_op_fetch_response(stmt.handle, stmt.xsqlda)
-                self._fetch_records = stmt.fetch_generator(rows, more_data, fetch_count)
+                stmt._is_open = True
+                self._fetch_records = await stmt.fetch_generator(
+                    self.fetch_sizer or stmt.fetch_sizer, self.fetch_memory_budget,
+                    self.arraysize, self.prefetch_depth,
+                    self.blob_mode or self.transaction.connection.blob_mode)
+                self._fetch_stmt = stmt
             else:
                 self._fetch_records = None
             self._callproc_result = None
 
         return self
 
+    async def _skip_info_sql_response(self, info_sql):
+        "Read the response of op_info_sql sent along with a failed execute"
+        if info_sql:
+            try:
+                await self.transaction.connection._async_op_response()
+            except DatabaseError:
+                pass
+
+    async def _receive_rowcount(self, stmt, info_sql):
+        self.rowcount = -1
+        if info_sql:
+            (h, oid, buf) = await self.transaction.connection._async_op_response()
+            self.rowcount = self._parse_rowcount(stmt, buf)
+        elif self.track_rowcount:
+            # rowcount property can not wait for the response later
+            self.rowcount = await self._rowcount(stmt)
+
     async def execute(self, query, params=None):
         DEBUG_OUTPUT("AsyncCursor::execute()", query, params)
         try:
             await self._execute(query, params)
-            self.rowcount = await self._rowcount()
             # DML with RETURNING returns a phantom row of NULLs when no rows
             # are affected. Clear it so fetchone()/fetchall() return nothing,
             # matching PEP 249. Don't clear for EXECUTE PROCEDURE statements.
-            if (self.rowcount == 0 and self._callproc_result is not None
+            if (self._callproc_result is not None
                     and self.stmt and self.stmt.xsqlda
                     and self.stmt.stmt_type == isc_info_sql_stmt_exec_procedure
-                    and not self._is_execute_procedure_query()):
+                    and not self._is_execute_procedure_query()
+                    and (self.rowcount if self.track_rowcount else await self._rowcount()) == 0):
                 self._callproc_result = None
             return self
         finally:
@@ -292,9 +669,178 @@ class AsyncCursor(Cursor):
         await self.execute(query, params)
         return self._callproc_result
 
-    async def executemany(self, query, seq_of_params):
+    async def _execute_row(self, stmt, params):
+        "Execute a row of executemany() by a round trip"
+        try:
+            await self._execute_stmt(stmt, params)
+            self.rowcounts.append(self.rowcount if self.track_rowcount else BATCH_SUCCESS_NO_INFO)
+        except DatabaseError as e:
+            self.batch_errors.append((len(self.rowcounts), e))
+            self.rowcounts.append(BATCH_EXECUTE_FAILED)
+
+    async def _send_batch(self, stmt, buf):
+        if not buf:
+            return
+        connection = self.transaction.connection
+        connection._op_batch_create(
+            stmt.handle, buf.blr(), buf.message_length(buf.types), self._batch_parameter_block())
+        connection._defer_response()
+        connection._op_batch_msg(stmt.handle, buf.messages())
+        connection._defer_response()
+        connection._op_batch_exec(stmt.handle, self.transaction.trans_handle)
+        executed = connection._defer_response('_recv_batch_cs', observed=True)
+        connection._op_batch_rls(stmt.handle)
+        connection._defer_response()
+        await connection._async_recv_pending(executed)
+        counts, errors = executed.result()
+        self._batch_result(counts, errors, len(buf))
+
+    async def _execute_batch(self, stmt, seq_of_params):
+        connection = self.transaction.connection
+        buf = BatchBuffer(self.batch_buffer_size)
+        for params in seq_of_params:
+            row = connection._batch_row(params)
+            if row is None:
+                # BLOB parameters are not sent by a batch
+                await self._send_batch(stmt, buf)
+                buf = BatchBuffer(self.batch_buffer_size)
+                await self._execute_row(stmt, params)
+                self._raise_batch_error()
+            elif not buf.add(row):
+                await self._send_batch(stmt, buf)
+                buf = BatchBuffer(self.batch_buffer_size)
+                buf.add(row)
+        await self._send_batch(stmt, buf)
+
+    async def _receive_pipelined(self, stmt):
+        "Read the responses of op_execute and op_info_sql of the oldest row in flight"
+        connection = self.transaction.connection
+        error = None
+        try:
+            await connection._async_op_response()
+        except DatabaseError as e:
+            error = e
+        count = BATCH_SUCCESS_NO_INFO
+        if self.track_rowcount:
+            try:
+                (h, oid, buf) = await connection._async_op_response()
+                count = self._parse_rowcount(stmt, buf)
+            except DatabaseError:
+                count = -1
+        if error:
+            self.batch_errors.append((len(self.rowcounts), error))
+            count = BATCH_EXECUTE_FAILED
+        self.rowcounts.append(count)
+
+    async def _execute_pipelined(self, stmt, seq_of_params):
+        """Send op_execute (and op_info_sql) of the rows without waiting for
+        the responses, up to executemany_depth rows are in flight.
+
+        Rows in flight are executed even if a row before them fails, so
+        they are sent ahead only if batch_continue_on_error.  Otherwise
+        they are sent by windows after a savepoint (see _execute_window),
+        one at a time in an autocommit transaction."""
+        connection = self.transaction.connection
+        if not self.batch_continue_on_error:
+            if self.transaction._autocommit:
+                for params in seq_of_params:
+                    await self._execute_row(stmt, params)
+                    self._raise_batch_error()
+            else:
+                await self._execute_windows(stmt, seq_of_params)
+            return
+        in_flight = 0
         for params in seq_of_params:
-            await self.execute(query, params)
+            if connection._blob_params(params):
+                # creating BLOBs reads responses
+                for i in range(in_flight):
+                    await self._receive_pipelined(stmt)
+                in_flight = 0
+                await self._execute_row(stmt, params)
+            else:
+                self._send_pipelined(stmt, params)
+                in_flight += 1
+                if in_flight >= self.executemany_depth:
+                    await self._receive_pipelined(stmt)
+                    in_flight -= 1
+        for i in range(in_flight):
+            await self._receive_pipelined(stmt)
+
+    async def _execute_windows(self, stmt, seq_of_params):
+        "Execute the rows by windows of executemany_depth rows, stop at the first failed row"
+        connection = self.transaction.connection
+        saved = False
+        window = []
+        for params in seq_of_params:
+            if connection._blob_params(params):
+                # creating BLOBs reads responses
+                saved = await self._execute_window(stmt, window) or saved
+                window = []
+                if not self.batch_errors:
+                    await self._execute_row(stmt, params)
+            else:
+                window.append(params)
+                if len(window) >= self.executemany_depth:
+                    saved = await self._execute_window(stmt, window) or saved
+                    window = []
+            if self.batch_errors:
+                break
+        else:
+            saved = await self._execute_window(stmt, window) or saved
+        if saved:
+            connection._op_exec_immediate(
+                self.transaction.trans_handle, query='RELEASE SAVEPOINT ' + _EXECUTEMANY_SAVEPOINT)
+            connection._defer_response()
+        self._raise_batch_error()
+
+    async def _execute_window(self, stmt, window):
+        "Send the rows after a savepoint and read the responses, see Cursor._execute_window"
+        if not window:
+            return False
+        connection = self.transaction.connection
+        trans_handle = self.transaction.trans_handle
+        start = len(self.rowcounts)
+        connection._op_exec_immediate(trans_handle, query='SAVEPOINT ' + _EXECUTEMANY_SAVEPOINT)
+        connection._defer_response()
+        for params in window:
+            self._send_pipelined(stmt, params)
+        for params in window:
+            await self._receive_pipelined(stmt)
+        if not self.batch_errors:
+            return True
+        failed = self.batch_errors[0][0] - start
+        connection._op_exec_immediate(trans_handle, query='ROLLBACK TO ' + _EXECUTEMANY_SAVEPOINT)
+        await connection._async_op_response()
+        del self.rowcounts[start:]
+        del self.batch_errors[:]
+        for params in window[:failed + 1]:
+            await self._execute_row(stmt, params)
+            if self.batch_errors:
+                return True
+        # the failed row succeeded again (a lock conflict gone), send the rest
+        await self._execute_window(stmt, window[failed + 1:])
+        return True
+
+    async def executemany(self, query, seq_of_params):
+        DEBUG_OUTPUT("AsyncCursor::executemany()", query)
+        self.rowcounts = []
+        self.batch_errors = []
+        try:
+            await self.transaction.check_trans_handle()
+            stmt = await self._get_stmt(query)
+            if stmt.stmt_type not in (
+                isc_info_sql_stmt_insert, isc_info_sql_stmt_update, isc_info_sql_stmt_delete
+            ) or stmt.xsqlda:
+                for params in seq_of_params:
+                    await self._execute_row(stmt, params)
+                    self._raise_batch_error()
+            elif self.transaction.connection.accept_version >= PROTOCOL_VERSION16:
+                await self._execute_batch(stmt, seq_of_params)
+            else:
+                await self._execute_pipelined(stmt, seq_of_params)
+        finally:
+            self.rowcount = sum(n for n in self.rowcounts if n > 0) if self.track_rowcount else -1
+            self.transaction.is_dirty = True
 
     async def fetchone(self):
         if not self.transaction.is_dirty:
@@ -350,6 +896,26 @@ class AsyncCursor(Cursor):
         # select statement
         return list(itertools.islice(self._fetch_records, size))
 
+    async def fetch_columns(self):
+        "Fetch all remaining rows by column, see Cursor.fetch_columns()"
+        return await self._fetch_columns(None)
+
+    async def fetchmany_columns(self, size=None):
+        "Fetch the next size rows by column, see Cursor.fetch_columns()"
+        if not size:
+            size = self.arraysize
+        return await self._fetch_columns(size)
+
+    async def _fetch_columns(self, size):
+        if not self.transaction.is_dirty:
+            return None
+        # callproc or not select statement
+        if not self._fetch_records:
+            return []
+        results = await self._fetch_stmt.fetch_columns(size)
+        DEBUG_OUTPUT("AsyncCursor::fetch_columns()", results)
+        return results
+
     # kinterbasdb extended API
     async def fetchonemap(self):
         r = await self.fetchone()
@@ -373,10 +939,7 @@ class AsyncCursor(Cursor):
 
     async def close(self):
         DEBUG_OUTPUT("AsyncCursor::close()")
-        if not self.stmt:
-            return
-        await self.stmt.drop()
-        self.stmt = None
+        await self._release_stmt()
 
     def nextset(self):
         raise NotSupportedError()
@@ -396,23 +959,15 @@ class AsyncCursor(Cursor):
             x.precision(), x.sqlscale, True if x.null_ok else False
         ) for x in self.stmt.xsqlda]
 
-    async def _rowcount(self):
+    async def _rowcount(self, stmt=None):
         DEBUG_OUTPUT("AsyncCursor::rowcount()")
-        if not self.stmt or self.stmt.handle == -1:
+        stmt = stmt or self.stmt
+        if not stmt or stmt.handle == -1:
             return -1
 
-        self.transaction.connection._op_info_sql(self.stmt.handle, bytes([isc_info_sql_records]))
+        self.transaction.connection._op_info_sql(stmt.handle, bytes([isc_info_sql_records]))
         (h, oid, buf) = await self.transaction.connection._async_op_response()
-        if buf[:3] != bytes([0x17, 0x1d, 0x00]):    # isc_info_sql_records
-            count = -1
-        elif self.stmt.stmt_type == isc_info_sql_stmt_select:
-            assert buf[17:20] == bytes([0x0d, 0x04, 0x00])     # isc_info_req_select_count
-            # select count
-            count = bytes_to_int(buf[20:24])
-        else:
-            # insert count + update count + delete count
-            count = bytes_to_int(buf[27:31]) + bytes_to_int(buf[6:10]) + bytes_to_int(buf[13:17])
-        return count
+        return self._parse_rowcount(stmt, buf)
 
 
 class AsyncTransaction(Transaction):
@@ -458,7 +1013,7 @@ class AsyncTransaction(Transaction):
         else:
             self.connection._op_commit(self._trans_handle)
             (h, oid, buf) = await self.connection._async_op_response()
-            self._trans_handle = None
+            self._end()
         self.is_dirty = False
 
     async def rollback(self, retaining=False, savepoint=None):
@@ -480,7 +1035,7 @@ class AsyncTransaction(Transaction):
         else:
             self.connection._op_rollback(self._trans_handle)
             (h, oid, buf) = await self.connection._async_op_response()
-            self._trans_handle = None
+            self._end()
         self.is_dirty = False
 
     async def _trans_info(self, info_requests):
@@ -534,28 +1089,102 @@ class AsyncTransaction(Transaction):
         DEBUG_OUTPUT("AsyncTransaction::close()", self._trans_handle, self.connection.db_handle)
         self.connection._op_rollback(self._trans_handle)
         (h, oid, buf) = await self.connection._async_op_response()
-        self._trans_handle = None
+        self._end()
         self.is_dirty = False
 
 
+class AsyncPipeline(Pipeline):
+    "Pipeline of asyncio connections, see Pipeline"
+    async def __aenter__(self):
+        self.connection._pipelines += 1
+        return self
+
+    async def __aexit__(self, exc, value, traceback):
+        try:
+            for cur in self._cursors.values():
+                await cur.close()
+            self._cursors.clear()
+            await self.flush()
+        except DatabaseError:
+            if exc is None:
+                raise
+        finally:
+            self.connection._pipelines -= 1
+
+    async def _sent(self, reader='_recv_response', args=()):
+        r = self.connection._defer_response(reader, args, observed=True)
+        self.responses.append(r)
+        if not self.connection._defers_response():
+            await self.connection._async_recv_pending(r)
+        return r
+
+    async def execute(self, query, params=None):
+        cur = self._cursor(query)
+        await cur.transaction.check_trans_handle()
+        stmt = cur.stmt if cur.stmt and cur.query == query else await cur._get_stmt(query)
+        self._check_stmt(stmt)
+        cur.transaction.is_dirty = True
+        if not self.connection._defers_response():
+            r = PendingResponse(observed=True)
+            try:
+                await cur._execute_stmt(stmt, params or [])
+                r.set_result(cur.rowcount)
+            except DatabaseError as e:
+                r.set_error(e)
+            self.responses.append(r)
+            return r
+        self.connection._op_execute(
+            stmt.handle, cur.transaction.trans_handle, cur._convert_params(params or []), stmt.param_encoders)
+        self.connection._op_info_sql(stmt.handle, bytes([isc_info_sql_records]))
+        return await self._sent('_recv_execute_response', (stmt, ))
+
+    async def _end(self, retaining, op, op_retaining):
+        transaction = self.connection._transaction
+        if transaction is None or transaction._trans_handle is None or not transaction.is_dirty:
+            return self._done(None)
+        if retaining:
+            op_retaining(transaction._trans_handle)
+        else:
+            op(transaction._trans_handle)
+            transaction._end()
+        transaction.is_dirty = False
+        return await self._sent()
+
+    async def commit(self, retaining=False):
+        return await self._end(retaining, self.connection._op_commit, self.connection._op_commit_retaining)
+
+    async def rollback(self, retaining=False):
+        return await self._end(retaining, self.connection._op_rollback, self.connection._op_rollback_retaining)
+
+    async def result(self, response):
+        "Wait for the response and return its result"
+        if not response.done:
+            await self.connection._async_recv_pending(response)
+        return response.result()
+
+    async def flush(self):
+        await self.connection._async_recv_pending()
+        responses, self.responses = self.responses, []
+        for r in responses:
+            if r.error and not r.retrieved:
+                raise r.error
+
+
 class AsyncConnectionResponseMixin(ConnectionResponseMixin):
+    # PendingResponse.result() can not wait, see AsyncPipeline.result()
+    _wait_response = None
+
     async def _async_recv_channel(self, nbytes, word_alignment=False):
-        n = nbytes
-        if word_alignment and (n % 4):
-            n += 4 - nbytes % 4  # 4 bytes word alignment
-        r = bytes([])
-        while n:
-            if self.timeout is not None:
-                b = await asyncio.wait_for(self.sock.async_recv(n), timeout=self.timeout)
-            else:
-                b = await self.sock.async_recv(n)
-            if not b:
-                break
-            r += b
-            n -= len(b)
-        if len(r) < nbytes:
-            raise OperationalError('Can not recv() packets')
-        return r[:nbytes]
+        padding = (4 - nbytes % 4) & 3 if word_alignment else 0  # 4 bytes word alignment
+        if self.timeout is not None:
+            return await asyncio.wait_for(self.sock.async_read(nbytes, padding), timeout=self.timeout)
+        return await self.sock.async_read(nbytes, padding)
+
+    async def _async_fill_more(self):
+        if self.timeout is not None:
+            await asyncio.wait_for(self.sock.async_fill_more(), timeout=self.timeout)
+        else:
+            await self.sock.async_fill_more()
 
     async def _async_parse_status_vector(self):
         sql_code = 0
@@ -599,32 +1228,95 @@ class AsyncConnectionResponseMixin(ConnectionResponseMixin):
         buf_len = bytes_to_bint(b[12:])   # buffer length
         buf = await self._async_recv_channel(buf_len, word_alignment=True)
 
-        (gds_codes, sql_code, message) = await self._async_parse_status_vector()
-        if gds_codes.intersection([
-            335544838, 335544879, 335544880, 335544466, 335544665, 335544347, 335544558
-        ]):
-            raise IntegrityError(message, gds_codes, sql_code)
-        elif gds_codes.intersection([335544321]):
-            raise DataError(message, gds_codes, sql_code)
-        elif (sql_code or message) and not gds_codes.intersection([335544434]):
-            raise OperationalError(message, gds_codes, sql_code)
+        e = _status_error(*(await self._async_parse_status_vector()))
+        if e:
+            raise e
         return (h, oid, buf)
 
     async def _async_op_response(self, count=1):
+        await self._async_recv_pending()
+        return await self._async_recv_response()
+
+    async def _async_recv_response(self):
         b = await self._async_recv_channel(4)
         while bytes_to_bint(b) == self.op_dummy:
             b = await self._async_recv_channel(4)
         op_code = bytes_to_bint(b)
-        while op_code == self.op_response and self.lazy_response_count:
-            self.lazy_response_count -= 1
-            h, oid, buf = await self._async_parse_op_response()
-            b = await self._async_recv_channel(4)
         if op_code == self.op_cont_auth:
             raise OperationalError('Unauthorized')
         elif op_code != self.op_response:
             raise InternalError("_async_op_response:op_code = %d" % (op_code,))
         return await self._async_parse_op_response()
 
+    async def _async_recv_pending(self, until=None):
+        "Read the responses of the requests sent ahead, see ConnectionResponseMixin._recv_pending()"
+        error = None
+        while self._pending_responses:
+            r = self._pending_responses.popleft()
+            try:
+                value = await getattr(self, '_async' + r.reader)(*r.args)
+            except InternalError:
+                raise
+            except DatabaseError as e:
+                r.set_error(e)
+                if not r.observed:
+                    error = error or e
+            else:
+                r.set_result(value)
+            if until is not None and (r is until or r.owner is until):
+                break
+        if error:
+            raise error
+
+    async def _async_recv_execute_response(self, stmt):
+        "Read the responses of op_execute and op_info_sql sent by AsyncPipeline.execute()"
+        try:
+            await self._async_recv_response()
+        except InternalError:
+            raise
+        except DatabaseError:
+            try:
+                await self._async_recv_response()
+            except DatabaseError:
+                pass
+            raise
+        (h, oid, buf) = await self._async_recv_response()
+        return Cursor._parse_rowcount(stmt, buf)
+
+    async def _async_parse_batch_cs(self):
+        "Return record counts and {index: error} of the rows failed"
+        b = await self._async_recv_channel(20)
+        updates = bytes_to_bint(b[8:12])
+        vectors = bytes_to_bint(b[12:16])
+        errors = bytes_to_bint(b[16:20])
+        counts = []
+        if updates:
+            b = await self._async_recv_channel(updates * 4)
+            counts = [bytes_to_bint(b[i:i+4]) for i in range(0, updates * 4, 4)]
+        row_errors = {}
+        for i in range(vectors):
+            n = bytes_to_bint(await self._async_recv_channel(4))
+            row_errors[n] = _status_error(*(await self._async_parse_status_vector()))
+        for i in range(errors):
+            # without a status vector (over BATCH_TAG_DETAILED_ERRORS)
+            n = bytes_to_bint(await self._async_recv_channel(4))
+            row_errors.setdefault(n, None)
+        return counts, row_errors
+
+    async def _async_recv_batch_cs(self):
+        "Read op_batch_cs, the response of op_batch_exec"
+        b = await self._async_recv_channel(4)
+        while bytes_to_bint(b) == self.op_dummy:
+            b = await self._async_recv_channel(4)
+        op_code = bytes_to_bint(b)
+        if op_code == self.op_response:
+            # op_batch_exec failed
+            await self._async_parse_op_response()
+            raise InternalError("_async_recv_batch_cs:op_batch_cs is expected")
+        if op_code != self.op_batch_cs:
+            raise InternalError("_async_recv_batch_cs:op_code = %d" % (op_code,))
+        return await self._async_parse_batch_cs()
+
     async def _async_parse_connect_response(self):
         # want and treat op_accept or op_cond_accept or op_accept_data
         b = await self._async_recv_channel(4)
@@ -641,7 +1333,7 @@ class AsyncConnectionResponseMixin(ConnectionResponseMixin):
         self.accept_version = b[3]
         self.accept_architecture = bytes_to_bint(b[4:8])
         self.accept_type = bytes_to_bint(b[8:])
-        self.lazy_response_count = 0
+        self._pending_responses = collections.deque()
 
         if self.accept_type & pflag_compress:
             self.sock.enable_compression()
@@ -737,12 +1429,12 @@ class AsyncConnectionResponseMixin(ConnectionResponseMixin):
                 if enc_plugin in (b'ChaCha64', b'ChaCha'):
                     k = hashlib.sha256(session_key).digest()
                     self.sock.set_translator(
-                        ChaCha20.new(k, nonce),
-                        ChaCha20.new(k, nonce),
+                        chacha.new(k, nonce),
+                        chacha.new(k, nonce),
                     )
                 elif enc_plugin == b'Arc4':
                     self.sock.set_translator(
-                        ARC4.new(session_key), ARC4.new(session_key))
+                        arc4.new(session_key), arc4.new(session_key))
                 else:
                     raise OperationalError(
                         'Unknown wirecrypt plugin %s' % (enc_plugin.encode("utf-8"))
@@ -755,7 +1447,17 @@ class AsyncConnectionResponseMixin(ConnectionResponseMixin):
         else:
             assert op_code == self.op_accept
 
-    async def _async_op_sql_response(self, xsqlda):
+    async def _async_recv_row(self, decoder):
+        while True:
+            buf, pos, end = self.sock.buffer()
+            r, pos = decoder.decode(buf, pos, end)
+            if r is not None:
+                self.sock.consume(pos)
+                return r
+            await self._async_fill_more()
+
+    async def _async_op_sql_response(self, decoder):
+        await self._async_recv_pending()
         b = await self._async_recv_channel(4)
         while bytes_to_bint(b) == self.op_dummy:
             b = await self._async_recv_channel(4)
@@ -767,99 +1469,42 @@ class AsyncConnectionResponseMixin(ConnectionResponseMixin):
 
         b = await self._async_recv_channel(4)
         count = bytes_to_bint(b[:4])
-        r = []
         if count == 0:
             return []
-        if self.accept_version < PROTOCOL_VERSION13:
-            for i in range(len(xsqlda)):
-                x = xsqlda[i]
-                if x.io_length() < 0:
-                    b = await self._async_recv_channel(4)
-                    ln = bytes_to_bint(b)
-                else:
-                    ln = x.io_length()
-                raw_value = await self._async_recv_channel(ln, word_alignment=True)
-                if await self._async_recv_channel(4) == bytes([0]) * 4:     # Not NULL
-                    r.append(x.value(raw_value))
-                else:
-                    r.append(None)
-        else:
-            n = len(xsqlda) // 8
-            if len(xsqlda) % 8 != 0:
-                n += 1
-            null_indicator = 0
-            for c in reversed(await self._async_recv_channel(n, word_alignment=True)):
-                null_indicator <<= 8
-                null_indicator += c
-            for i in range(len(xsqlda)):
-                x = xsqlda[i]
-                if null_indicator & (1 << i):
-                    r.append(None)
-                else:
-                    if x.io_length() < 0:
-                        b = await self._async_recv_channel(4)
-                        ln = bytes_to_bint(b)
-                    else:
-                        ln = x.io_length()
-                    raw_value = await self._async_recv_channel(ln, word_alignment=True)
-                    r.append(x.value(raw_value))
-        return r
+        return await self._async_recv_row(decoder)
 
-    async def _async_op_fetch_response(self, stmt_handle, xsqlda):
+    async def _async_recv_prefetch_response(self, decoder):
+        "Read the response of an op_fetch sent ahead by Statement._prefetch()"
+        consumed = self.sock.consumed
+        rows, more_data = await self._async_recv_fetch_response(decoder)
+        return rows, more_data, self.sock.consumed - consumed
+
+    async def _async_op_fetch_response(self, stmt_handle, decoder, columns=None):
+        await self._async_recv_pending()
+        return await self._async_recv_fetch_response(decoder, columns)
+
+    async def _async_recv_fetch_response(self, decoder, columns=None):
         op_code = bytes_to_bint(await self._async_recv_channel(4))
         while op_code == self.op_dummy:
             op_code = bytes_to_bint(await self._async_recv_channel(4))
 
-        while op_code == self.op_response and self.lazy_response_count:
-            self.lazy_response_count -= 1
-            h, oid, buf = await self._async_parse_op_response()
-            op_code = bytes_to_bint(await self._async_recv_channel(4))
-
         if op_code != self.op_fetch_response:
             if op_code == self.op_response:
                 await self._async_parse_op_response()
             raise InternalError("op_fetch_response:op_code = %d" % (op_code,))
-        b = await self._async_recv_channel(8)
-        status = bytes_to_bint(b[:4])
-        count = bytes_to_bint(b[4:8])
-        rows = []
-        while count:
-            r = [None] * len(xsqlda)
-            if self.accept_version < PROTOCOL_VERSION13:
-                for i in range(len(xsqlda)):
-                    x = xsqlda[i]
-                    if x.io_length() < 0:
-                        b = await self._async_recv_channel(4)
-                        ln = bytes_to_bint(b)
-                    else:
-                        ln = x.io_length()
-                    raw_value = await self._async_recv_channel(ln, word_alignment=True)
-                    if await self._async_recv_channel(4) == bytes([0]) * 4:     # Not NULL
-                        r[i] = x.value(raw_value)
-            else:   # PROTOCOL_VERSION13
-                n = len(xsqlda) // 8
-                if len(xsqlda) % 8 != 0:
-                    n += 1
-                null_indicator = 0
-                for c in reversed(await self._async_recv_channel(n, word_alignment=True)):
-                    null_indicator <<= 8
-                    null_indicator += c
-                for i in range(len(xsqlda)):
-                    x = xsqlda[i]
-                    if null_indicator & (1 << i):
-                        continue
-                    if x.io_length() < 0:
-                        b = await self._async_recv_channel(4)
-                        ln = bytes_to_bint(b)
-                    else:
-                        ln = x.io_length()
-                    raw_value = await self._async_recv_channel(ln, word_alignment=True)
-                    r[i] = x.value(raw_value)
-            rows.append(r)
-            b = await self._async_recv_channel(12)
-            op_code = bytes_to_bint(b[:4])
-            status = bytes_to_bint(b[4:8])
-            count = bytes_to_bint(b[8:])
+        rows = [] if columns is None else columns
+        while True:
+            buf, pos, end = self.sock.buffer()
+            pos, status, op_code = self._parse_fetch_rows(buf, pos, end, decoder, rows)
+            self.sock.consume(pos)
+            if status is not None:
+                break
+            await self._async_fill_more()
+        if op_code != self.op_fetch_response:
+            if op_code == self.op_response:
+                await self._async_parse_op_response()
+                raise InternalError("op_fetch_response:Internal Error")
+            raise InternalError("op_fetch_response:op_code = %d" % (op_code,))
         return rows, status != 100
 
 
@@ -895,16 +1540,27 @@ class AsyncConnection(ConnectionBase, AsyncConnectionResponseMixin):
         if self._transaction:
             await self._transaction.rollback(retaining=retaining, savepoint=savepoint)
 
+    def pipeline(self):
+        "Return an AsyncPipeline, send requests without waiting for the responses"
+        return AsyncPipeline(self)
+
     async def execute_immediate(self, query):
         if self._transaction is None:
             self._transaction = AsyncTransaction(self, self._autocommit)
             await self._transaction.begin()
         await self._transaction.check_trans_handle()
+        # query may be DDL
+        await self._drop_cached_statements()
         self._op_exec_immediate(
             self._transaction.trans_handle, query=query)
         (h, oid, buf) = await self._async_op_response()
         self._transaction.is_dirty = True
 
+    async def _drop_cached_statements(self):
+        describe_cache.invalidate(self._database_key())
+        for stmt in self.statement_cache.clear():
+            await stmt.release()
+
     async def ping(self, reconnect=True):
         try:
             self._op_ping()
@@ -921,6 +1577,9 @@ class AsyncConnection(ConnectionBase, AsyncConnectionResponseMixin):
             del kwargs["loop"]
         else:
             self.loop = asyncio.get_event_loop()
+        # decode received chunks of this size or more off the event loop, see AsyncSocketStream
+        self.offload_threshold = kwargs.pop("offload_threshold", None)
+        self.offload_executor = kwargs.pop("offload_executor", None)
         super().__init__(*args, **kwargs)
         self.last_usage = self.loop.time()
 
@@ -929,8 +1588,13 @@ class AsyncConnection(ConnectionBase, AsyncConnectionResponseMixin):
         self._autocommit = False
         self._transaction = None
         self._cursors = {}
+        self.statement_cache.reset()
+        self._free_statement_handles = []
 
-        self.sock = AsyncSocketStream(self.hostname, self.port, self.loop, self.timeout, self.cloexec)
+        self.sock = AsyncSocketStream(
+            self.hostname, self.port, self.loop, self.timeout, self.cloexec,
+            self.offload_threshold, self.offload_executor)
+        await self.sock.start()
 
         self._op_connect(self.auth_plugin_name, self.wire_crypt, self.wire_compress)
         try:
@@ -1016,6 +1680,7 @@ class AsyncConnection(ConnectionBase, AsyncConnectionResponseMixin):
         self.sock.close()
         self.sock = None
         self.db_handle = None
+        self.statement_cache.reset()
 
     async def close(self):
         DEBUG_OUTPUT("AsyncConnection::close()", id(self), self.db_handle)
@@ -1033,6 +1698,7 @@ class AsyncConnection(ConnectionBase, AsyncConnectionResponseMixin):
         self.sock.close()
         self.sock = None
         self.db_handle = None
+        self.statement_cache.reset()
 
     def __del__(self):
         if self.sock:
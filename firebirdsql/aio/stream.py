@@ -26,65 +26,262 @@
 # Python DB-API 2.0 module for Firebird.
 ##############################################################################
 import asyncio
+import time
 import zlib
 
+from firebirdsql.err import OperationalError
 from firebirdsql.stream import SocketStream
-from firebirdsql.utils import bytes_to_bint
 
 
-class AsyncSocketStream(SocketStream):
-    def __init__(self, host, port, loop, timeout, cloexec):
+# Room made in the buffer for each read of the transport.
+TRANSPORT_RECV_SIZE = 256 * 1024
+# Unread bytes above which reading from the socket is paused until the
+# application reads more.
+READ_HIGH_WATER = 4 * 1024 * 1024
+
+
+class AsyncSocketStream(SocketStream, asyncio.BufferedProtocol):
+    """SocketStream of an event loop.
+
+    After start() the stream is the protocol of a transport of the loop:
+    the transport receives into the buffer of the stream, and a reader
+    waiting for n bytes is woken up by a future once they are there.
+    Reading from the socket is paused while more than `read_high_water`
+    bytes are not read by the application, and reading waits for the
+    transport to write out its buffer (drain()).
+
+    The packets sent while the loop runs a callback or a coroutine step
+    are written together, compressed and encrypted at once, when the loop
+    gets back control or before waiting for a response (flush()).
+
+    Received chunks of `offload_threshold` bytes or more are decrypted and
+    decompressed by `executor` (the default executor of the loop if None)
+    instead of on the event loop.  The cipher and zlib states are kept by
+    the stream, so it must be a thread pool.  Chunks are decoded one at a
+    time, in order.  None of offload_threshold decodes all of them on the
+    loop.
+
+    `offloaded` and `offloaded_bytes` count the chunks decoded by the
+    executor, `inline_seconds` and `max_inline_seconds` are the total and
+    the longest time the loop was blocked by decoding.
+    """
+    def __init__(self, host, port, loop, timeout, cloexec, offload_threshold=None, executor=None):
         super().__init__(host, port, timeout, cloexec)
         self.loop = loop
-        self._send_lock = asyncio.Lock()
-        self._last_send_task = None
+        self.offload_threshold = offload_threshold
+        self.executor = executor
+        self.read_high_water = READ_HIGH_WATER
+        self.offloaded = 0
+        self.offloaded_bytes = 0
+        self.inline_seconds = 0.0
+        self.max_inline_seconds = 0.0
+        self._recv_lock = asyncio.Lock()
+        self._transport = None
+        # encrypted bytes received after the write cursor, not decrypted yet
+        self._raw = 0
+        # compressed bytes received, they are decoded into the buffer
+        self._zbuf = None
+        self._zlen = 0
+        self._eof = False
+        self._waiter = None
+        self._want = 0
+        self._reading_paused = False
+        self._drain_waiter = None
+        self._writing_paused = False
+        self._wbuf = []
+        self._flush_handle = None
         self._sock.setblocking(False)
-        self._buf = b''
 
-    async def _await_pending_send(self):
-        task = self._last_send_task
-        if task is not None:
-            await task
+    async def start(self):
+        "Hand the socket over to a transport of the loop"
+        await self.loop.create_connection(lambda: self, sock=self._sock)
 
-    async def async_recv(self, nbytes):
-        await self._await_pending_send()
+    # asyncio.BufferedProtocol
 
+    def connection_made(self, transport):
+        self._transport = transport
+
+    def get_buffer(self, sizehint):
+        if self._decompressor:
+            if self._zbuf is None:
+                self._zbuf = bytearray(max(sizehint, 8192))
+            elif self._zlen == len(self._zbuf):
+                self._zbuf = self._zbuf + bytes(len(self._zbuf))
+            return memoryview(self._zbuf)[self._zlen:]
+        self._reserve(max(sizehint, TRANSPORT_RECV_SIZE))
+        return self._rview[self._wpos + self._raw:]
+
+    def buffer_updated(self, nbytes):
         if self._decompressor:
-            while len(self._buf) < nbytes:
-                read_size = max(8192, nbytes - len(self._buf))
-                chunk = await self.loop.sock_recv(self._sock, read_size)
-                if not chunk:
-                    break
-                if self.read_translator:
-                    chunk = self.read_translator.decrypt(chunk)
-                self._buf += self._decompressor.decompress(chunk)
+            self._zlen += nbytes
+        elif self.read_translator:
+            self._raw += nbytes
+        else:
+            self._wpos += nbytes
+            self.received += nbytes
+        self._wakeup()
+        if self._waiter is None and not self._reading_paused and \
+                self._wpos + self._raw - self._rpos + self._zlen > self.read_high_water:
+            self._transport.pause_reading()
+            self._reading_paused = True
+
+    def eof_received(self):
+        self._eof = True
+        self._wakeup()
+
+    def connection_lost(self, exc):
+        self._eof = True
+        self._wakeup()
+        self.resume_writing()
+
+    def pause_writing(self):
+        self._writing_paused = True
+
+    def resume_writing(self):
+        self._writing_paused = False
+        waiter = self._drain_waiter
+        if waiter is not None and not waiter.done():
+            waiter.set_result(None)
+
+    def _wakeup(self):
+        waiter = self._waiter
+        if waiter is None or waiter.done():
+            return
+        if self._eof or self._zlen or self._wpos + self._raw - self._rpos >= self._want:
+            waiter.set_result(None)
+
+    async def drain(self):
+        "Flush and wait until the transport takes more data to write"
+        self.flush()
+        if self._writing_paused and not self._eof:
+            self._drain_waiter = self.loop.create_future()
+            try:
+                await self._drain_waiter
+            finally:
+                self._drain_waiter = None
+
+    def _reserve(self, nbytes):
+        "Make room for at least nbytes after the received data, raw data included."
+        end = self._wpos + self._raw
+        if len(self._rbuf) - end >= nbytes:
+            return
+        unread = end - self._rpos
+        if len(self._rbuf) - unread >= nbytes:
+            self._rbuf[:unread] = self._rbuf[self._rpos:end]
         else:
-            if len(self._buf) < nbytes:
-                read_size = max(8192, nbytes - len(self._buf))
-                chunk = await self.loop.sock_recv(self._sock, read_size)
-                if self.read_translator:
-                    chunk = self.read_translator.decrypt(chunk)
-                self._buf += chunk
+            buf = bytearray(max(len(self._rbuf) * 2, unread + nbytes))
+            buf[:unread] = self._rview[self._rpos:end]
+            self._rbuf = buf
+            self._rview = memoryview(buf)
+        self._wpos -= self._rpos
+        self._rpos = 0
+
+    async def _decode(self, func, b):
+        "Return func(b), run by the executor if b is large"
+        if self.offload_threshold is not None and len(b) >= self.offload_threshold:
+            self.offloaded += 1
+            self.offloaded_bytes += len(b)
+            # b may be a view of the buffer, which can move meanwhile
+            return await self.loop.run_in_executor(self.executor, func, bytes(b))
+        start = time.monotonic()
+        r = func(b)
+        elapsed = time.monotonic() - start
+        self.inline_seconds += elapsed
+        if elapsed > self.max_inline_seconds:
+            self.max_inline_seconds = elapsed
+        return r
+
+    async def _decode_received(self):
+        "Decrypt and decompress the data received by the transport"
+        if self._zlen:
+            b = bytes(self._zbuf[:self._zlen])
+            self._zlen = 0
+            self._append(await self._decode(self._decompress, b))
+        elif self._raw:
+            n = self._raw
+            b = await self._decode(self.read_translator.decrypt, self._rview[self._wpos:self._wpos + n])
+            self._rbuf[self._wpos:self._wpos + n] = b
+            self._wpos += n
+            self._raw -= n
+            self.received += n
 
-        ret = self._buf[:nbytes]
-        self._buf = self._buf[nbytes:]
-        return ret
+    async def _async_recv_more(self, nbytes):
+        """Wait until at least nbytes more are in the buffer.
+        Return the number of bytes appended, fewer if the peer closed.
+        """
+        await self.drain()
+        async with self._recv_lock:
+            start = self.received
+            while True:
+                await self._decode_received()
+                n = self.received - start
+                if n >= nbytes or (n and self._decompressor) or (self._eof and not self._zlen and not self._raw):
+                    return n
+                self._want = self._wpos + self._raw - self._rpos + nbytes - n
+                self._waiter = self.loop.create_future()
+                if self._reading_paused:
+                    self._reading_paused = False
+                    self._transport.resume_reading()
+                try:
+                    await self._waiter
+                finally:
+                    self._waiter = None
+
+    async def async_fill_more(self):
+        "Receive more data, buffer() positions are invalidated."
+        if not await self._async_recv_more(1):
+            raise OperationalError('Can not recv() packets')
+
+    async def async_read(self, nbytes, padding=0):
+        """Read exactly nbytes and skip following padding bytes.
+        """
+        while self._wpos - self._rpos < nbytes + padding:
+            if not await self._async_recv_more(nbytes + padding - (self._wpos - self._rpos)):
+                raise OperationalError('Can not recv() packets')
+        pos = self._rpos
+        self._rpos += nbytes + padding
+        return bytes(self._rview[pos:pos + nbytes])
+
+    async def async_recv(self, nbytes):
+        if self._rpos == self._wpos:
+            if not await self._async_recv_more(1):
+                return b''
+        return await self.async_read(min(nbytes, self._wpos - self._rpos))
 
     def send(self, b):
-        if not self.loop.is_running():
+        if self._transport is None:
             return super().send(b)
+        self._wbuf.append(b)
+        if self._flush_handle is None:
+            self._flush_handle = self.loop.call_soon(self.flush)
+
+    def flush(self):
+        "Write out the packets sent so far"
+        if self._flush_handle is not None:
+            self._flush_handle.cancel()
+            self._flush_handle = None
+        if not self._wbuf:
+            return
+        b = self._wbuf[0] if len(self._wbuf) == 1 else b''.join(self._wbuf)
+        self._wbuf.clear()
         if self._compressor:
             b = self._compressor.compress(b) + self._compressor.flush(zlib.Z_SYNC_FLUSH)
         if self.write_translator:
             b = self.write_translator.encrypt(b)
+        self._transport.write(b)
 
-        previous_task = self._last_send_task
+    def enable_compression(self):
+        self.flush()
+        super().enable_compression()
 
-        async def _send_all(payload):
-            if previous_task is not None:
-                await previous_task
-            async with self._send_lock:
-                await self.loop.sock_sendall(self._sock, payload)
+    def set_translator(self, read_translator, write_translator):
+        # op_crypt is sent in clear just before
+        self.flush()
+        super().set_translator(read_translator, write_translator)
 
-        self._last_send_task = self.loop.create_task(_send_all(b))
-        return None
+    def close(self):
+        if self._transport is not None:
+            self.flush()
+            self._transport.close()
+        else:
+            self._sock.close()
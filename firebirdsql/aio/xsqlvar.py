@@ -27,13 +27,14 @@
 ##############################################################################
 from firebirdsql.consts import *    # noqa
 from firebirdsql.utils import *     # noqa
-from firebirdsql.wireprotocol import INFO_SQL_SELECT_DESCRIBE_VARS
-from firebirdsql.xsqlvar import parse_select_items
+from firebirdsql.xsqlvar import parse_select_items, DescribeContinuation
 
 
 async def async_parse_xsqlda(buf, connection, stmt_handle):
+    "See parse_xsqlda()"
     xsqlda = []
     stmt_type = None
+    describe_length = None
     i = 0
     while i < len(buf):
         if buf[i:i+3] == bytes([isc_info_sql_stmt_type, 0x04, 0x00]):
@@ -46,16 +47,18 @@ async def async_parse_xsqlda(buf, connection, stmt_handle):
             col_len = bytes_to_int(buf[i:i+ln])
             xsqlda = [None] * col_len
             next_index = parse_select_items(buf[i+ln:], xsqlda, connection)
-            while next_index > 0:   # more describe vars
-                connection._op_info_sql(
-                    stmt_handle,
-                    bytes([isc_info_sql_sqlda_start, 2]) + int_to_bytes(next_index, 2) + INFO_SQL_SELECT_DESCRIBE_VARS
-                )
-                (h, oid, buf) = await connection._async_op_response()
-                assert buf[:2] == bytes([0x04, 0x07])
-                ln = bytes_to_int(buf[2:4])
-                assert bytes_to_int(buf[4:4+ln]) == col_len
-                next_index = parse_select_items(buf[4+ln:], xsqlda, connection)
+            if next_index > 0:
+                more = DescribeContinuation(xsqlda, next_index, len(buf))
+                requests = more.requests()
+                while requests:
+                    for start, length in requests:
+                        connection._op_info_sql(stmt_handle, more.items(start), length)
+                    for start, length in requests:
+                        (h, oid, info) = await connection._async_op_response()
+                        more.received(start, info, connection)
+                    requests = more.requests()
+                describe_length = more.describe_length
+            break
         else:
             break
-    return stmt_type, xsqlda
+    return stmt_type, xsqlda, describe_length
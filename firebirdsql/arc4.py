@@ -25,6 +25,22 @@
 #
 # Python DB-API 2.0 module for Firebird.
 ##############################################################################
+try:
+    from cryptography.hazmat.decrepit.ciphers.algorithms import ARC4 as _ARC4Algorithm
+except ImportError:
+    try:
+        from cryptography.hazmat.primitives.ciphers.algorithms import ARC4 as _ARC4Algorithm
+    except ImportError:
+        _ARC4Algorithm = None
+if _ARC4Algorithm is not None:
+    from cryptography.exceptions import UnsupportedAlgorithm
+    from cryptography.hazmat.primitives.ciphers import Cipher
+try:
+    from Crypto.Cipher import ARC4 as CryptoARC4
+except ImportError:
+    CryptoARC4 = None
+
+
 class ARC4:
     def __init__(self, key):
         state = list(range(256))
@@ -41,15 +57,23 @@ class ARC4:
         self.y = 0
 
     def translate(self, plain):
+        "Generate the keystream of plain into a bytearray and XOR it as an int"
+        n = len(plain)
+        if n == 0:
+            return b''
         state = self.state
-        enc = b''
-        for i in range(len(plain)):
-            self.x = (self.x + 1) % 256
-            self.y = (self.y + state[self.x]) % 256
-            (state[self.x], state[self.y]) = (state[self.y], state[self.x])
-            xorIndex = (state[self.x] + state[self.y]) % 256
-            enc += bytes([plain[i] ^ state[xorIndex]])
-        return enc
+        x, y = self.x, self.y
+        keystream = bytearray(n)
+        for i in range(n):
+            x = (x + 1) & 255
+            sx = state[x]
+            y = (y + sx) & 255
+            sy = state[y]
+            state[x] = sy
+            state[y] = sx
+            keystream[i] = state[(sx + sy) & 255]
+        self.x, self.y = x, y
+        return (int.from_bytes(plain, 'little') ^ int.from_bytes(keystream, 'little')).to_bytes(n, 'little')
 
     # PyCrypto compatible method
     @staticmethod
@@ -57,3 +81,31 @@ class ARC4:
         return ARC4(key)
     encrypt = translate
     decrypt = translate
+
+
+class CryptographyARC4:
+    "ARC4 of the cryptography package, see ARC4"
+    def __init__(self, key):
+        self._context = Cipher(_ARC4Algorithm(key), mode=None).encryptor()
+
+    def translate(self, plain):
+        return self._context.update(plain)
+
+    @staticmethod
+    def new(key):
+        return CryptographyARC4(key)
+    encrypt = translate
+    decrypt = translate
+
+
+def new(key):
+    "ARC4 of the cryptography package or PyCryptodome if installed, else of this module"
+    if _ARC4Algorithm is not None and len(key) * 8 in _ARC4Algorithm.key_sizes:
+        try:
+            return CryptographyARC4(key)
+        except UnsupportedAlgorithm:
+            # OpenSSL without the legacy provider
+            pass
+    if CryptoARC4 is not None:
+        return CryptoARC4.new(key)
+    return ARC4(key)
@@ -25,122 +25,163 @@
 #
 # Python DB-API 2.0 module for Firebird.
 ##############################################################################
+import array
 import struct
-import copy
-
-sigma = b"expand 32-byte k"
-
-
-def bytes_to_uint(b):        # Read as little endian.
-    fmt = {1: 'B', 2: '<H', 4: '<L', 8: '<Q'}[len(b)]
-    return struct.unpack(fmt, b)[0]
+import sys
 
+try:
+    from cryptography.hazmat.primitives.ciphers import Cipher, algorithms
+except ImportError:
+    algorithms = None
+try:
+    from Crypto.Cipher import ChaCha20 as CryptoChaCha20
+except ImportError:
+    CryptoChaCha20 = None
 
-def int_to_bytes(val, nbytes):  # Convert int value to little endian bytes.
-    v = abs(val)
-    byte_array = []
-    for n in range(nbytes):
-        byte_array.append((v >> (8 * n)) & 0xff)
-    if val < 0:
-        for i in range(nbytes):
-            byte_array[i] = ~byte_array[i] + 256
-        byte_array[0] += 1
-        for i in range(nbytes):
-            if byte_array[i] == 256:
-                byte_array[i] = 0
-                byte_array[i+1] += 1
-
-    return bytes(byte_array)
-
+sigma = b"expand 32-byte k"
 
-def add_u32(x, y):
-    return (x + y) & 0xffffffff
+# keystream blocks computed at once
+MAX_BLOCKS = 1024
 
+_STATE = struct.Struct('<16L')
+# array typecode of a 32 bit word
+_WORD = 'I' if array.array('I').itemsize == 4 else 'L'
 
-def rotate_u32(x, n):
-    y = x << n
-    z = x >> (32 - n)
-    return (y | z) & 0xffffffff
 
+def _lanes(n):
+    """(ones, mask) for n blocks: each block is a 64 bit lane of an int, a
+    32 bit word is kept in the lower half and carries go to the upper half"""
+    ones = int.from_bytes((b'\x01' + bytes(7)) * n, 'little')
+    return ones, ones * 0xffffffff
 
-def quaterround_u32(a, b, c, d):
-    a = add_u32(a, b)
-    d ^= a
-    d = rotate_u32(d, 16)
 
-    c = add_u32(c, d)
-    b ^= c
-    b = rotate_u32(b, 12)
+class ChaCha20:
+    """ChaCha20 of 64 bit nonce (and 64 bit counter) or 96 bit nonce.
 
-    a = add_u32(a, b)
-    d ^= a
-    d = rotate_u32(d, 8)
+    The keystream of up to MAX_BLOCKS blocks is computed at once: word i
+    of all the blocks is an int with a 64 bit lane by block, the rounds
+    are done by a few operations on these ints.  Data is XORed as an int.
+    """
+    def __init__(self, key, nonce, counter=0):
+        assert len(key) == 32
+        assert len(nonce) in (8, 12)
+        self.nonce = nonce
+        self.counter = counter      # counter of the next block
+        self.state = list(_STATE.unpack(sigma + key + bytes(16 - len(nonce)) + nonce))
+        self._keystream = b''
+        self._lanes = {}
+
+    def _blocks(self, n):
+        "Keystream of the next n blocks"
+        if n not in self._lanes:
+            self._lanes[n] = _lanes(n)
+        ones, mask = self._lanes[n]
+        state = self.state
+        counters = [(self.counter + i) & 0xffffffffffffffff for i in range(n)]
+        low = array.array('Q', [c & 0xffffffff for c in counters])
+        if sys.byteorder == 'big':
+            low.byteswap()
+        x = [v * ones for v in state]
+        x[12] = int.from_bytes(low.tobytes(), 'little')
+        if len(self.nonce) == 8:
+            # ChaCha64: 64 bit nonce, 64 bit counter
+            high = array.array('Q', [c >> 32 for c in counters])
+            if sys.byteorder == 'big':
+                high.byteswap()
+            x[13] = int.from_bytes(high.tobytes(), 'little')
+        initial = list(x)
+
+        for _ in range(10):
+            for a, b, c, d in (
+                (0, 4, 8, 12), (1, 5, 9, 13), (2, 6, 10, 14), (3, 7, 11, 15),   # column rounds
+                (0, 5, 10, 15), (1, 6, 11, 12), (2, 7, 8, 13), (3, 4, 9, 14),   # diagonal rounds
+            ):
+                xa, xb, xc, xd = x[a], x[b], x[c], x[d]
+                xa = (xa + xb) & mask
+                xd ^= xa
+                xd = ((xd << 16) | (xd >> 16)) & mask
+                xc = (xc + xd) & mask
+                xb ^= xc
+                xb = ((xb << 12) | (xb >> 20)) & mask
+                xa = (xa + xb) & mask
+                xd ^= xa
+                xd = ((xd << 8) | (xd >> 24)) & mask
+                xc = (xc + xd) & mask
+                xb ^= xc
+                xb = ((xb << 7) | (xb >> 25)) & mask
+                x[a], x[b], x[c], x[d] = xa, xb, xc, xd
+
+        # interleave the words of the blocks
+        words = array.array(_WORD, bytes(64 * n))
+        for i in range(16):
+            w = array.array(_WORD, ((x[i] + initial[i]) & mask).to_bytes(8 * n, 'little'))
+            if sys.byteorder == 'big':
+                w.byteswap()
+            words[i::16] = w[0::2]
+        if sys.byteorder == 'big':
+            words.byteswap()
+        self.counter += n
+        return words.tobytes()
 
-    c = add_u32(c, d)
-    b ^= c
-    b = rotate_u32(b, 7)
+    def translate(self, plain):
+        n = len(plain)
+        keystream = self._keystream
+        while len(keystream) < n:
+            blocks = min((n - len(keystream) + 63) // 64, MAX_BLOCKS)
+            keystream += self._blocks(blocks)
+        self._keystream = keystream[n:]
+        if n == 0:
+            return b''
+        return (int.from_bytes(plain, 'little') ^ int.from_bytes(keystream[:n], 'little')).to_bytes(n, 'little')
 
-    return a, b, c, d
+    # PyCrypto compatible method
+    @staticmethod
+    def new(key, nonce):
+        return ChaCha20(key, nonce)
+    encrypt = translate
+    decrypt = translate
 
 
-class ChaCha20:
+class CryptographyChaCha20:
+    "ChaCha20 of the cryptography package, see ChaCha20"
     def __init__(self, key, nonce, counter=0):
         assert len(key) == 32
         assert len(nonce) in (8, 12)
+        self.key = key
         self.nonce = nonce
-        self.counter = counter
-        counter_bytes = int_to_bytes(self.counter, 16 - len(self.nonce))
-        block_bytes = sigma + key + counter_bytes + self.nonce
-        assert len(block_bytes) == 64
-
-        state = []
-        for i in range(0, len(block_bytes), 4):
-            state.append(bytes_to_uint(block_bytes[i:i+4]))
-        self.state = state
-        self.set_chacha20_round_block()
-
-    def set_chacha20_round_block(self):
-        x = copy.copy(self.state)
-
-        for i in range(10):
-            # column rounds
-            x[0], x[4], x[8], x[12] = quaterround_u32(x[0], x[4], x[8], x[12])
-            x[1], x[5], x[9], x[13] = quaterround_u32(x[1], x[5], x[9], x[13])
-            x[2], x[6], x[10], x[14] = quaterround_u32(x[2], x[6], x[10], x[14])
-            x[3], x[7], x[11], x[15] = quaterround_u32(x[3], x[7], x[11], x[15])
-            # diagonal rounds
-            x[0], x[5], x[10], x[15] = quaterround_u32(x[0], x[5], x[10], x[15])
-            x[1], x[6], x[11], x[12] = quaterround_u32(x[1], x[6], x[11], x[12])
-            x[2], x[7], x[8], x[13] = quaterround_u32(x[2], x[7], x[8], x[13])
-            x[3], x[4], x[9], x[14] = quaterround_u32(x[3], x[4], x[9], x[14])
+        self._start(counter)
 
-        for i in range(16):
-            x[i] = add_u32(x[i], self.state[i])
-
-        self.block =  b''.join([int_to_bytes(i, 4) for i in x])
-        self.block_pos = 0
+    def _start(self, counter):
+        # the initial counter and nonce words of the state
+        iv = (counter & 0xffffffffffffffff).to_bytes(16 - len(self.nonce), 'little') + self.nonce
+        self._context = Cipher(algorithms.ChaCha20(self.key, iv), mode=None).encryptor()
+        self._counter = counter
+        # bytes until the lower 32 bits of the counter wrap, cryptography
+        # does not carry them to the upper word of the 64 bit counter
+        self._remaining = (0x100000000 - (counter & 0xffffffff)) * 64
 
     def translate(self, plain):
-        enc = b''
-
-        for i in range(len(plain)):
-            enc += bytes([plain[i] ^ self.block[self.block_pos]])
-            self.block_pos += 1
-            if len(self.block) == self.block_pos:
-                # increment counter
-                self.counter += 1
-                counter_bytes = int_to_bytes(self.counter, 16 - len(self.nonce))
-                self.state[12] = bytes_to_uint(counter_bytes[:4])
-                if len(self.nonce) == 8:
-                    # ChaCha64: 64 bit nonce, 64 bit counter
-                    self.state[13] = bytes_to_uint(counter_bytes[4:])
-                self.set_chacha20_round_block()
-
-        return enc
+        n = len(plain)
+        if n <= self._remaining or len(self.nonce) == 12:
+            self._remaining -= n
+            return self._context.update(plain)
+        plain = memoryview(plain)
+        k = self._remaining
+        enc = self._context.update(plain[:k])
+        self._start((self._counter | 0xffffffff) + 1)
+        return enc + self.translate(plain[k:])
 
-    # PyCrypto compatible method
     @staticmethod
     def new(key, nonce):
-        return ChaCha20(key, nonce)
+        return CryptographyChaCha20(key, nonce)
     encrypt = translate
     decrypt = translate
+
+
+def new(key, nonce):
+    "ChaCha20 of the cryptography package or PyCryptodome if installed, else of this module"
+    if algorithms is not None:
+        return CryptographyChaCha20(key, nonce)
+    if CryptoChaCha20 is not None:
+        return CryptoChaCha20.new(key=key, nonce=nonce)
+    return ChaCha20(key, nonce)
@@ -30,12 +30,30 @@ DEFAULT_CHARSET = 'UTF8'
 ISC_TIME_SECONDS_PRECISION = 10000
 MAX_CHAR_LENGTH = 32767
 BLOB_SEGMENT_SIZE = 32000
+# buffer length of op_get_segment and the number of them kept in flight
+BLOB_GET_SEGMENT_LENGTH = 32767
+BLOB_SEGMENT_REQUESTS = 8
+# upper bound of the segments sent by an op_batch_segments
+BLOB_BATCH_LENGTH = 65535
 
-# Number of rows requested from the server per op_fetch roundtrip.
-# Used as the lower bound when a cursor's arraysize is smaller, so the
-# DB-API default (arraysize == 1) keeps its historical batching behaviour.
+# Number of rows requested by the first op_fetch of a statement, later
+# counts are chosen by firebirdsql.fetchsize.FetchSizer.
 DEFAULT_FETCH_COUNT = 400
 
+# Default upper bound of the memory held by the rows of a fetch batch.
+DEFAULT_FETCH_MEMORY_BUDGET = 16 * 1024 * 1024
+
+# Default size of the messages sent by an op_batch_exec (executemany())
+DEFAULT_BATCH_BUFFER_SIZE = 16 * 1024 * 1024
+MAX_BATCH_BUFFER_SIZE = 256 * 1024 * 1024
+
+# Default number of rows executemany() sends ahead of the responses
+# without the batch interface (before Firebird 4)
+DEFAULT_EXECUTEMANY_DEPTH = 64
+
+# Parameter signatures of a statement whose encoders are kept
+MAX_PARAM_ENCODERS = 16
+
 DESCRIPTION_NAME = 0
 DESCRIPTION_TYPE_CODE = 1
 DESCRIPTION_DISPLAY_SIZE = 2
@@ -161,6 +179,17 @@ isc_info_req_insert_count = 14
 isc_info_req_update_count = 15
 isc_info_req_delete_count = 16
 
+# blob info items
+isc_info_blob_num_segments = 4
+isc_info_blob_max_segment = 5
+isc_info_blob_total_length = 6
+isc_info_blob_type = 7
+
+# blob seek mode
+blb_seek_from_head = 0
+blb_seek_relative = 1
+blb_seek_from_tail = 2
+
 isc_info_svc_svr_db_info = 50
 isc_info_svc_get_license = 51
 isc_info_svc_get_license_mask = 52
@@ -561,6 +590,21 @@ CNCT_client_crypt = 11
 
 DSQL_close = 1
 DSQL_drop = 2
+DSQL_unprepare = 4
+
+# op_batch_create parameter block (IBatch)
+BATCH_VERSION1 = 1
+BATCH_TAG_MULTIERROR = 1
+BATCH_TAG_RECORD_COUNTS = 2
+BATCH_TAG_BUFFER_BYTES_SIZE = 3
+BATCH_TAG_BLOB_POLICY = 4
+BATCH_TAG_DETAILED_ERRORS = 5
+# op_batch_cs record counts
+BATCH_EXECUTE_FAILED = -1
+BATCH_SUCCESS_NO_INFO = -2
+
+# statement handles kept by a connection for reuse
+MAX_FREE_STATEMENT_HANDLES = 8
 
 charset_map = {
     # DB CHAR SET NAME    :   PYTHON CODEC NAME (CANONICAL)
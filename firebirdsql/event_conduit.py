@@ -25,8 +25,7 @@
 #
 # Python DB-API 2.0 module for Firebird.
 ##############################################################################
-import select
-from firebirdsql.err import InternalError, OperationalError
+from firebirdsql.err import InternalError
 from firebirdsql.consts import *    # noqa
 from firebirdsql.utils import *     # noqa
 from firebirdsql.wireprotocol import WireProtocol
@@ -35,21 +34,8 @@ from firebirdsql.stream import SocketStream
 
 class EventConduit(WireProtocol):
     def _recv_channel(self, nbytes, timeout):
-        n = nbytes
-        if n % 4:
-            n += 4 - nbytes % 4  # 4 bytes word alignment
-        r = bytes([])
-        while n:
-            if (timeout is not None and select.select([self.sock._sock], [], [], timeout)[0] == []):
-                raise TimeoutError("Pakcet recv timeout error")
-            b = self.sock.recv(n)
-            if not b:
-                break
-            r += b
-            n -= len(b)
-        if len(r) < nbytes:
-            raise OperationalError('Can not recv() packets')
-        return r[:nbytes]
+        padding = (4 - nbytes % 4) & 3  # 4 bytes word alignment
+        return self.sock.read(nbytes, timeout, padding)
 
     def _wait_for_event(self, timeout):
         event_count = {}
@@ -27,21 +27,28 @@
 ##############################################################################
 from __future__ import print_function
 import sys
+import re
 import datetime
 import itertools
+import collections
 import hashlib
-import select
+import struct
+import time
 from firebirdsql.fberrmsgs import messages
-from firebirdsql.err import InternalError, OperationalError, NotSupportedError, IntegrityError, DataError
+from firebirdsql.err import (
+    InternalError, OperationalError, NotSupportedError, IntegrityError, DataError, DatabaseError,
+    ProgrammingError
+)
 from firebirdsql.consts import *    # noqa
 from firebirdsql.utils import *     # noqa
-from firebirdsql.wireprotocol import WireProtocol, get_crypt
+from firebirdsql.wireprotocol import WireProtocol, BatchBuffer, PendingResponse, get_crypt
 from firebirdsql.stream import SocketStream
-from firebirdsql.xsqlvar import calc_blr, parse_xsqlda
+from firebirdsql.xsqlvar import RowDecoder, ColumnBuilder, parse_xsqlda
+from firebirdsql.fetchsize import FetchSizer
+from firebirdsql.stmtcache import StatementCache, Described, describe_cache
 from firebirdsql.event_conduit import EventConduit
 from firebirdsql import srp
-from firebirdsql.arc4 import ARC4
-from firebirdsql.chacha import ChaCha20
+from firebirdsql import arc4, chacha
 
 def DEBUG_OUTPUT(*argv):
     if debug_level() == 0:
@@ -51,6 +58,19 @@ def DEBUG_OUTPUT(*argv):
     print(file=sys.stderr)
 
 
+def _status_error(gds_codes, sql_code, message):
+    "Exception of a status vector, None if it is not an error"
+    if gds_codes.intersection([
+        335544838, 335544879, 335544880, 335544466, 335544665, 335544347, 335544558
+    ]):
+        return IntegrityError(message, gds_codes, sql_code)
+    elif gds_codes.intersection([335544321]):
+        return DataError(message, gds_codes, sql_code)
+    elif (sql_code or message) and not gds_codes.intersection([335544434]):
+        return OperationalError(message, gds_codes, sql_code)
+    return None
+
+
 class Statement(object):
     """
     statement handle and status (open/close)
@@ -59,93 +79,210 @@ class Statement(object):
         DEBUG_OUTPUT("Statement::__init__()")
         self.trans = trans
 
-        self.trans.connection._op_allocate_statement()
-        if (self.trans.connection.accept_type & ptype_MASK) == ptype_lazy_send:
-            self.trans.connection.lazy_response_count += 1
-            self.handle = -1
+        if self.trans.connection._free_statement_handles:
+            self.handle = self.trans.connection._free_statement_handles.pop()
         else:
-            (h, oid, buf) = self.trans.connection._op_response()
-            self.handle = h
+            self.trans.connection._op_allocate_statement()
+            if (self.trans.connection.accept_type & ptype_MASK) == ptype_lazy_send:
+                self.trans.connection._defer_response(callback=self._allocated)
+                self.handle = -1
+            else:
+                (h, oid, buf) = self.trans.connection._op_response()
+                self.handle = h
 
         self._is_open = False
         self.stmt_type = None
+        self.sql = None
+        self.cache_generation = self.trans.connection.statement_cache.generation
+        # ParamEncoder by the types of the parameters
+        self.param_encoders = {}
+
+    def _allocated(self, response):
+        "The response of op_allocate_statement sent without waiting for it is read"
+        (self.handle, oid, buf) = response
 
-    def fetch_generator(self, rows, more_data, fetch_count):
+    def fetch_generator(
+        self, fetch_sizer, memory_budget=None, min_count=1, prefetch_depth=0, blob_mode='eager', first_fetch=None
+    ):
+        """first_fetch is (count, PendingResponse) of the first op_fetch if it
+        is sent with the execute"""
         DEBUG_OUTPUT("Statement::_fetch_generator()", self.handle, self.trans._trans_handle, self.trans.connection.db_handle)
-        connection = self.trans.connection
-        while rows:
-            for r in rows:
+        self._rows = collections.deque()
+        self._more_data = True
+        self._fetch_sizer = fetch_sizer
+        self._fetch_memory_budget = memory_budget
+        self._min_fetch_count = min_count
+        self.fetch_sizes = []   # op_fetch counts of this result set
+        self._prefetch_depth = prefetch_depth
+        self._prefetching = 0   # op_fetch sent ahead, response not read yet
+        self._blob_mode = blob_mode
+        if first_fetch is None:
+            self._fetch_next()
+        else:
+            fetch_count, response = first_fetch
+            self.fetch_sizes.append(fetch_count)
+            self._received(*response.result())
+        return self._fetch_rows()
+
+    def _fetch_rows(self):
+        while True:
+            self._prefetch()
+            while self._rows:
+                r = self._rows.popleft()
                 # Convert BLOB handle to data
                 for i in range(len(self.xsqlda)):
                     x = self.xsqlda[i]
                     if x.sqltype == SQL_TYPE_BLOB:
                         if not r[i]:
                             continue
-                        connection._op_open_blob2(r[i], self.trans.trans_handle)
-                        if (connection.accept_type & ptype_MASK)== ptype_lazy_send:
-                            connection.lazy_response_count += 1
-                            h = -1
-                        else:
-                            (h, oid, buf) = connection._op_response()
-                        v = bytes([])
-                        n = 1   # 0,1:mora data 2:no more data
-                        while n != 2:
-                            connection._op_get_segment(h)
-                            (n, oid, buf) = connection._op_response()
-                            while buf:
-                                ln = bytes_to_int(buf[:2])
-                                v += buf[2:ln+2]
-                                buf = buf[ln+2:]
-                        connection._op_close_blob(h)
-                        if (connection.accept_type & ptype_MASK)== ptype_lazy_send:
-                            connection.lazy_response_count += 1
-                        else:
-                            (h, oid, buf) = connection._op_response()
-                        r[i] = v
-                        if x.sqlsubtype == 1:    # TEXT
-                            r[i] = connection.bytes_to_str(r[i])
+                        r[i] = self._blob_value(x, r[i])
                 yield tuple(r)
-            if more_data:
-                connection._op_fetch(self.handle, calc_blr(self.xsqlda), fetch_count)
-                (rows, more_data) = connection._op_fetch_response(self.handle, self.xsqlda)
+            if self._prefetching:
+                self.trans.connection._recv_pending(self)
+            elif self._more_data:
+                self._fetch_next()
             else:
                 break
 
-        return
-
-    def prepare(self, sql, explain_plan=False):
-        DEBUG_OUTPUT("Statement::prepare()", self.handle)
+    def _next_fetch_count(self, limit=None):
+        "Count of the next op_fetch, chosen by the fetch sizer"
+        fetch_count = self._fetch_sizer.fetch_count(self._min_fetch_count, self._fetch_memory_budget)
+        if limit is not None:
+            fetch_count = min(fetch_count, limit)
+        DEBUG_OUTPUT("Statement::_next_fetch_count()", self.handle, fetch_count)
+        self.fetch_sizes.append(fetch_count)
+        return fetch_count
+
+    def _prefetch(self):
+        "Send op_fetch ahead, up to the prefetch depth"
+        connection = self.trans.connection
+        while self._more_data and self._prefetching < self._prefetch_depth:
+            connection._op_fetch(self.handle, self.decoder.blr, self._next_fetch_count())
+            connection._defer_response('_recv_prefetch_response', (self.decoder, ), self._prefetched, self)
+            self._prefetching += 1
+
+    def _prefetched(self, response):
+        "The response of an op_fetch sent by _prefetch() is read"
+        self._prefetching -= 1
+        self._received(*response)
+
+    def _received(self, rows, more_data, nbytes):
+        "Rows of an op_fetch sent ahead are received by a response nbytes long"
+        self._fetch_sizer.record(len(rows), nbytes)
+        self._rows.extend(rows)
+        self._more_data = more_data and len(rows) > 0
+
+    def _fetch_next(self, fetch_count=None, columns=None):
+        connection = self.trans.connection
+        # responses of op_fetch sent ahead come first, don't time them
+        connection._recv_pending()
+        if fetch_count is None:
+            fetch_count = self._next_fetch_count()
+        start, consumed = time.monotonic(), connection.sock.consumed
+        connection._op_fetch(self.handle, self.decoder.blr, fetch_count)
+        if columns is None:
+            (rows, self._more_data) = connection._op_fetch_response(self.handle, self.decoder)
+            self._rows.extend(rows)
+            n = len(rows)
+        else:
+            n = columns.count
+            (columns, self._more_data) = connection._op_fetch_response(self.handle, columns.decoder, columns)
+            n = columns.count - n
+        self._fetch_sizer.record(n, connection.sock.consumed - consumed, time.monotonic() - start)
+        if not n:
+            self._more_data = False
+
+    def _blob_value(self, x, blob_id):
+        reader = BlobReader(self.trans, blob_id, x.sqlsubtype)
+        if self._blob_mode == 'lazy':
+            return reader
+        v = reader.read()
+        reader.close()
+        if x.sqlsubtype == 1:    # TEXT
+            v = self.trans.connection.bytes_to_str(v)
+        return v
+
+    def fetch_columns(self, size=None):
+        """Fetch up to size (all if None) remaining rows into columns.
+        Return [(values, nulls), ...] by column, see ColumnBuilder.
+        """
+        DEBUG_OUTPUT("Statement::fetch_columns()", self.handle, size)
+        if self._column_decoder is None:
+            self._column_decoder = RowDecoder(self.xsqlda, self.trans.connection.accept_version, columnar=True)
+        columns = ColumnBuilder(self._column_decoder)
+        while size is None or columns.count < size:
+            if self._rows:
+                # rows already fetched for fetchone()/fetchmany() or prefetched
+                columns.append_converted(self._rows.popleft())
+            elif self._prefetching:
+                self.trans.connection._recv_pending(self)
+            elif self._more_data:
+                limit = None if size is None else size - columns.count
+                self._fetch_next(self._next_fetch_count(limit), columns)
+            else:
+                break
+        # Convert BLOB handle to data
+        for x, values in zip(self.xsqlda, columns.values):
+            if x.sqltype == SQL_TYPE_BLOB:
+                values[:] = [self._blob_value(x, v) if v else v for v in values]
+        return columns.columns()
+
+    def _send_prepare(self, sql, explain_plan=False):
+        # describe buffer large enough for the columns seen last time
+        buffer_length = describe_cache.buffer_length(self._describe_key(sql))
         if explain_plan:
             self.trans.connection._op_prepare_statement(
                 self.handle, self.trans.trans_handle, sql,
-                option_items=bytes([isc_info_sql_get_plan]))
+                option_items=bytes([isc_info_sql_get_plan]), buffer_length=buffer_length)
         else:
             self.trans.connection._op_prepare_statement(
-                self.handle, self.trans.trans_handle, sql)
+                self.handle, self.trans.trans_handle, sql, buffer_length=buffer_length)
             self.plan = None
 
-        while self.trans.connection.lazy_response_count:
-            self.trans.connection.lazy_response_count -= 1
-            (h, oid, buf) = self.trans.connection._op_response()
-            self.handle = h
-
+    def prepare(self, sql, explain_plan=False):
+        DEBUG_OUTPUT("Statement::prepare()", self.handle)
+        self._send_prepare(sql, explain_plan)
+        # the handle is set by the response of op_allocate_statement read first
         (h, oid, buf) = self.trans.connection._op_response()
+        self._prepared(sql, buf)
 
+    def _prepared(self, sql, buf):
+        "Parse the response of op_prepare_statement"
         i = 0
         if buf[i] == isc_info_sql_get_plan:
             ln = bytes_to_int(buf[i+1:i+3])
             self.plan = self.trans.connection.bytes_to_str(buf[i+3:i+3+ln])
             i += 3 + ln
-        self.stmt_type, self.xsqlda = parse_xsqlda(buf[i:], self.trans.connection, self.handle)
-        if self.stmt_type == isc_info_sql_stmt_select:
-            self._is_open = True
+        key = self._describe_key(sql)
+        described = describe_cache.get(key, buf[i:])
+        if described is None:
+            stmt_type, xsqlda, describe_length = parse_xsqlda(buf[i:], self.trans.connection, self.handle)
+            described = self._described(key, buf[i:], stmt_type, xsqlda, describe_length)
+        self.stmt_type, self.xsqlda, self.decoder = described.stmt_type, described.xsqlda, described.decoder
+        self._column_decoder = None
+        self.fetch_sizer = FetchSizer(self.xsqlda)
+        self.sql = sql
+
+    def _describe_key(self, sql):
+        connection = self.trans.connection
+        return (connection._database_key(), sql, connection.charset, connection.accept_version)
+
+    def _described(self, key, buf, stmt_type, xsqlda, describe_length):
+        described = Described(bytes(buf), stmt_type, xsqlda, RowDecoder(xsqlda, self.trans.connection.accept_version))
+        if describe_length is None:
+            describe_cache.put(key, described)
+        else:
+            # the columns asked by more round trips are not checked by buf,
+            # ask them all by the next prepare
+            describe_cache.set_buffer_length(key, describe_length)
+        return described
 
     def close(self):
         DEBUG_OUTPUT("Statement::close()", self.handle)
         if self.stmt_type == isc_info_sql_stmt_select and self._is_open:
             self.trans.connection._op_free_statement(self.handle, DSQL_close)
-            if (self.trans.connection.accept_type & ptype_MASK)== ptype_lazy_send:
-                self.trans.connection.lazy_response_count += 1
+            if self.trans.connection._defers_response():
+                self.trans.connection._defer_response()
             else:
                 (h, oid, buf) = self.trans.connection._op_response()
         self._is_open = False
@@ -154,13 +291,33 @@ class Statement(object):
         DEBUG_OUTPUT("Statement::drop()", self.handle)
         if self.handle != -1:
             self.trans.connection._op_free_statement(self.handle, DSQL_drop)
-            if (self.trans.connection.accept_type & ptype_MASK) == ptype_lazy_send:
-                self.trans.connection.lazy_response_count += 1
+            if self.trans.connection._defers_response():
+                self.trans.connection._defer_response()
             else:
                 (h, oid, buf) = self.trans.connection._op_response()
         self._is_open = False
         self.handle = -1
 
+    def release(self):
+        """Unprepare the statement and keep the handle for the next one,
+        drop it if the connection has enough free handles."""
+        DEBUG_OUTPUT("Statement::release()", self.handle)
+        connection = self.trans.connection
+        if (
+            self.handle == -1 or connection.accept_version < PROTOCOL_VERSION13 or
+            len(connection._free_statement_handles) >= MAX_FREE_STATEMENT_HANDLES
+        ):
+            self.drop()
+            return
+        connection._op_free_statement(self.handle, DSQL_unprepare)
+        if connection._defers_response():
+            connection._defer_response()
+        else:
+            (h, oid, buf) = connection._op_response()
+        connection._free_statement_handles.append(self.handle)
+        self._is_open = False
+        self.handle = -1
+
     @property
     def is_opened(self):
         return self._is_open and self.handle != -1
@@ -194,6 +351,318 @@ class PreparedStatement(object):
         self.stmt.close()
 
 
+_SEGMENT_LENGTH = struct.Struct('<H')
+
+
+def _parse_segments(buf, segments):
+    "Append segments (memoryview) in an op_get_segment response buffer"
+    view = memoryview(buf)
+    i, n = 0, len(buf)
+    while i < n:
+        ln = _SEGMENT_LENGTH.unpack_from(buf, i)[0]
+        if ln:
+            segments.append(view[i + 2:i + 2 + ln])
+        i += ln + 2
+
+
+def _parse_blob_info(buf):
+    "Parse op_info_blob response buffer into {item: value}"
+    info = {}
+    i = 0
+    while i < len(buf) and buf[i] != isc_info_end:
+        ln = bytes_to_int(buf[i + 1:i + 3])
+        info[buf[i]] = bytes_to_int(buf[i + 3:i + 3 + ln])
+        i += 3 + ln
+    return info
+
+
+_BLOB_INFO_ITEMS = bytes([
+    isc_info_blob_num_segments, isc_info_blob_max_segment,
+    isc_info_blob_total_length, isc_info_blob_type, isc_info_end
+])
+
+
+class SegmentAssembler(object):
+    """Collect the rest of a BLOB from op_get_segment responses.
+
+    The buffer length of op_get_segment is chosen from the BLOB info, and
+    requests() tells how many requests to send so that enough of them are
+    in flight for the remaining length.  Segments are written to sink if
+    given, kept to be joined once otherwise.
+    """
+    def __init__(self, info, received=0, sink=None):
+        self.remaining = max(info.get(isc_info_blob_total_length, 0) - received, 0)
+        max_segment = info.get(isc_info_blob_max_segment) or BLOB_SEGMENT_SIZE
+        num_segments = info.get(isc_info_blob_num_segments, 1)
+        self.buffer_length = max(min(BLOB_GET_SEGMENT_LENGTH, self.remaining + num_segments * 2), 2)
+        # data bytes of a response, each segment is preceded by its length
+        self.payload = max(self.buffer_length + self.buffer_length // -(max_segment + 2) * 2, 1)
+        self.sink = sink
+        self.chunks = []
+        self.length = 0
+        self.in_flight = 0
+        self.eof = False
+
+    def append(self, segment):
+        if self.sink is None:
+            self.chunks.append(segment)
+        else:
+            self.sink.write(segment)
+        self.length += len(segment)
+        self.remaining -= len(segment)
+
+    def requests(self):
+        "Number of op_get_segment to send now"
+        if self.eof:
+            return 0
+        n = min(
+            -(-self.remaining // self.payload) - self.in_flight,
+            BLOB_SEGMENT_REQUESTS - self.in_flight
+        )
+        if n <= 0:
+            # the end of the BLOB is not known yet
+            n = 0 if self.in_flight else 1
+        self.in_flight += n
+        return n
+
+    def feed(self, n, buf):
+        "Take an op_get_segment response, n is its object handle (2: end of BLOB)"
+        self.in_flight -= 1
+        if self.eof:
+            return
+        segments = []
+        _parse_segments(buf, segments)
+        for segment in segments:
+            self.append(segment)
+        if n == 2:  # isc_segstr_eof
+            self.eof = True
+
+    def value(self):
+        return b''.join(self.chunks)
+
+
+class BlobReader(object):
+    """File like reader of a BLOB value.
+
+    Returned for BLOB columns when blob_mode is 'lazy'.  The BLOB is opened
+    when it is read first and must be read before the transaction ends.
+    read() returns bytes also for text BLOBs, iterating the reader yields
+    the received segments.
+    """
+    def __init__(self, trans, blob_id, sqlsubtype=0):
+        self.trans = trans
+        self.blob_id = blob_id
+        self.sqlsubtype = sqlsubtype
+        self.closed = False
+        self._handle = None     # not opened yet
+        self._segments = collections.deque()    # received, not read yet
+        self._eof = False
+        self._pos = 0
+        self._info = {}
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc, value, traceback):
+        self.close()
+
+    def __repr__(self):
+        return '<BlobReader %s>' % (self.blob_id.hex(), )
+
+    def readable(self):
+        return True
+
+    def seekable(self):
+        return True
+
+    def tell(self):
+        return self._pos
+
+    def _check_closed(self):
+        if self.closed:
+            raise ValueError('I/O operation on closed blob')
+
+    def _open(self):
+        connection = self.trans.connection
+        connection._op_open_blob2(self.blob_id, self.trans.trans_handle)
+        (self._handle, oid, buf) = connection._op_response()
+
+    def _fill(self):
+        "Receive the next segments"
+        if self._handle is None:
+            self._open()
+        connection = self.trans.connection
+        connection._op_get_segment(self._handle, BLOB_GET_SEGMENT_LENGTH)
+        (n, oid, buf) = connection._op_response()
+        _parse_segments(buf, self._segments)
+        if n == 2:  # isc_segstr_eof
+            self._eof = True
+
+    def _assembler(self, sink):
+        """Return a SegmentAssembler for the rest of the BLOB, holding the
+        segments received and not read yet."""
+        assembler = SegmentAssembler(self._info, self._pos + sum(len(s) for s in self._segments), sink)
+        for segment in self._segments:
+            assembler.append(segment)
+        self._segments.clear()
+        assembler.eof = self._eof
+        return assembler
+
+    def _read_rest(self, sink=None):
+        "Read the rest of the BLOB into a SegmentAssembler"
+        if self._handle is None:
+            self._open()
+        connection = self.trans.connection
+        if not self._info:
+            # the first segments come with the BLOB info
+            connection._op_info_blob(self._handle, _BLOB_INFO_ITEMS)
+            if not self._eof:
+                connection._op_get_segment(self._handle, BLOB_GET_SEGMENT_LENGTH)
+            (h, oid, buf) = connection._op_response()
+            self._info = _parse_blob_info(buf)
+            if not self._eof:
+                (n, oid, buf) = connection._op_response()
+                _parse_segments(buf, self._segments)
+                self._eof = n == 2
+        assembler = self._assembler(sink)
+        while True:
+            for i in range(assembler.requests()):
+                connection._op_get_segment(self._handle, assembler.buffer_length)
+            if not assembler.in_flight:
+                break
+            (n, oid, buf) = connection._op_response()
+            assembler.feed(n, buf)
+        self._eof = True
+        self._pos += assembler.length
+        return assembler
+
+    def _take(self, n):
+        "Pop up to n bytes of the received segments"
+        b = self._segments[0]
+        if len(b) > n:
+            self._segments[0] = b[n:]
+            b = b[:n]
+        else:
+            self._segments.popleft()
+        self._pos += len(b)
+        return b
+
+    def read(self, n=-1):
+        "Read up to n bytes (all if n is negative), b'' at the end of the BLOB"
+        self._check_closed()
+        if n is None or n < 0:
+            return self._read_rest().value()
+        chunks = []
+        while n:
+            if not self._segments:
+                if self._eof:
+                    break
+                self._fill()
+                continue
+            b = self._take(n)
+            chunks.append(b)
+            n -= len(b)
+        return b''.join(chunks)
+
+    def readinto(self, b):
+        m = memoryview(b).cast('B')
+        data = self.read(len(m))
+        m[:len(data)] = data
+        return len(data)
+
+    def __iter__(self):
+        self._check_closed()
+        while True:
+            if not self._segments:
+                if self._eof:
+                    return
+                self._fill()
+                continue
+            yield bytes(self._take(sys.maxsize))
+
+    def copy_to(self, f):
+        "Write the rest of the BLOB to the file like object f, return the written length"
+        self._check_closed()
+        return self._read_rest(f).length
+
+    def _blob_info(self, item):
+        if item not in self._info:
+            if self._handle is None:
+                self._open()
+            connection = self.trans.connection
+            connection._op_info_blob(self._handle, _BLOB_INFO_ITEMS)
+            (h, oid, buf) = connection._op_response()
+            self._info = _parse_blob_info(buf)
+        return self._info[item]
+
+    def total_length(self):
+        "Length of the BLOB in bytes (isc_info_blob_total_length)"
+        self._check_closed()
+        return self._blob_info(isc_info_blob_total_length)
+
+    def _seek_target(self, offset, whence):
+        "Absolute position of seek(), whence 2 is resolved by the caller"
+        if whence == 0:
+            target = offset
+        elif whence == 1:
+            target = self._pos + offset
+        else:
+            raise ValueError('invalid whence (%r)' % (whence, ))
+        if target < 0:
+            raise ValueError('negative seek position %r' % (target, ))
+        return target
+
+    def seek(self, offset, whence=0):
+        """Move to offset.  Stream BLOBs are positioned by the server,
+        segmented BLOBs are read forward (reopened to move backward)."""
+        self._check_closed()
+        if whence == 2:
+            offset += self.total_length()
+            whence = 0
+        target = self._seek_target(offset, whence)
+        if target == self._pos:
+            return self._pos
+        connection = self.trans.connection
+        if self._blob_info(isc_info_blob_type) == 1:  # stream BLOB
+            connection._op_seek_blob(self._handle, blb_seek_from_head, target)
+            (h, oid, buf) = connection._op_response()
+            # the new position is in the lower word of the BLOB id
+            self._pos = bytes_to_bint(oid[4:8])
+            self._segments.clear()
+            self._eof = False
+            return self._pos
+        if target < self._pos:
+            self._close_blob()
+        while self._pos < target and self.read(min(target - self._pos, BLOB_SEGMENT_SIZE)):
+            pass
+        return self._pos
+
+    def _close_blob(self):
+        if self._handle is not None:
+            connection = self.trans.connection
+            connection._op_close_blob(self._handle)
+            if connection._defers_response():
+                connection._defer_response()
+            else:
+                (h, oid, buf) = connection._op_response()
+        self._handle = None
+        self._segments.clear()
+        self._eof = False
+        self._pos = 0
+
+    def close(self):
+        if not self.closed:
+            self._close_blob()
+        self.closed = True
+
+
+# statements executed by op_execute, see Cursor._prepare_with_execute()
+_ONE_FLIGHT_SQL = re.compile(r'\s*(select|with|insert|update|delete|merge)\b', re.IGNORECASE)
+_RETURNING = re.compile(r'\breturning\b', re.IGNORECASE)
+# savepoint of the rows sent ahead by executemany()
+_EXECUTEMANY_SAVEPOINT = 'PYFIREBIRDSQL_EXECUTEMANY'
+
+
 class Cursor(object):
     def __init__(self, obj):
         DEBUG_OUTPUT("Cursor::__init__()")
@@ -210,7 +679,26 @@ class Cursor(object):
         conn._cursors[self._transaction].append(self)
         self.stmt = None
         self.arraysize = 1
+        # False not to ask the server the record count of each execution
+        self.track_rowcount = True
         self.rowcount = -1
+        # number of fetch batches requested ahead while rows are consumed
+        self.prefetch_depth = 0
+        # FetchSizer used instead of the one of the statement
+        self.fetch_sizer = None
+        # upper bound of the memory held by a fetched batch
+        self.fetch_memory_budget = DEFAULT_FETCH_MEMORY_BUDGET
+        # 'eager' or 'lazy' (BlobReader), None means the connection's
+        self.blob_mode = None
+        # bytes of the rows sent by a batch of executemany()
+        self.batch_buffer_size = DEFAULT_BATCH_BUFFER_SIZE
+        # executemany() executes the rest of the rows after an error
+        self.batch_continue_on_error = False
+        # rows of executemany() sent ahead without the batch interface
+        self.executemany_depth = DEFAULT_EXECUTEMANY_DEPTH
+        # record counts and (row index, error) of the last executemany()
+        self.rowcounts = []
+        self.batch_errors = []
 
     def __enter__(self):
         return self
@@ -235,50 +723,219 @@ class Cursor(object):
         if isinstance(query, PreparedStatement):
             stmt = query.stmt
         else:
-            if self.stmt:
-                self.stmt.drop()
-                self.stmt = None
+            self._release_stmt()
+            self.stmt = self.transaction.connection.statement_cache.take(query)
             if self.stmt is None:
                 self.stmt = Statement(self.transaction)
+                self.stmt.prepare(query)
+                self._remember_decoder(query, self.stmt)
+            else:
+                self.stmt.trans = self.transaction
             stmt = self.stmt
-            stmt.prepare(query)
         return stmt
 
+    def _release_stmt(self):
+        "Put back the statement to the statement cache, drop it if not cached"
+        stmt, self.stmt = self.stmt, None
+        self._fetch_records = None
+        if self._rowcount_stmt is stmt:
+            self._rowcount_stmt = None
+        if not stmt:
+            return
+        cache = self.transaction.connection.statement_cache
+        if stmt.cache_generation != cache.generation:
+            # prepared before reconnect
+            return
+        if stmt.stmt_type is None:
+            # failed to prepare
+            stmt.drop()
+            return
+        if stmt.stmt_type == isc_info_sql_stmt_ddl:
+            released = [stmt]
+        else:
+            released = cache.put(stmt.sql, stmt)
+        for stmt in released:
+            stmt.release()
+
     def prep(self, query, explain_plan=False):
         DEBUG_OUTPUT("Cursor::prep()")
         prepared_statement = PreparedStatement(self, query, explain_plan=explain_plan)
         return prepared_statement
 
+    def _remember_decoder(self, query, stmt):
+        if stmt.stmt_type == isc_info_sql_stmt_select:
+            self.transaction.connection.statement_cache.set_decoder(query, stmt.decoder)
+
     def _execute(self, query, params):
         if params is None:
             params = []
         self.transaction.check_trans_handle()
+        if self._prepare_with_execute(query, params):
+            return self._execute_unprepared(query, params)
         stmt = self._get_stmt(query)
+        return self._execute_stmt(stmt, params)
+
+    def _prepare_with_execute(self, query, params):
+        """True if query can be prepared and executed by op_execute in one
+        flight: the server takes requests ahead of the responses and query
+        is a SELECT or DML without RETURNING, not in the statement cache.
+        BLOB parameters are created before the execute, the server would
+        take the BLOB for the statement of handle -1 (the last allocated)."""
+        connection = self.transaction.connection
+        return (
+            isinstance(query, str) and
+            (connection.accept_type & ptype_MASK) >= ptype_batch_send and
+            _ONE_FLIGHT_SQL.match(query) is not None and
+            _RETURNING.search(query) is None and
+            query not in connection.statement_cache and
+            not connection._blob_params(params)
+        )
+
+    def _execute_unprepared(self, query, params):
+        """Send op_prepare_statement, op_execute, op_info_sql of the record
+        count and the first op_fetch (if the SELECT was prepared before,
+        its output format is known) then read the responses in order."""
+        connection = self.transaction.connection
         cooked_params = self._convert_params(params)
+        self._release_stmt()
+        self.query = query
+        # a miss of the statement cache
+        connection.statement_cache.take(query)
+        stmt = self.stmt = Statement(self.transaction)
+        decoder = connection.statement_cache.decoder(query)
+        stmt._send_prepare(query)
+        prepared = connection._defer_response(observed=True)
+        connection._op_execute(stmt.handle, self.transaction.trans_handle, cooked_params, stmt.param_encoders)
+        executed = connection._defer_response(observed=True)
+        last = counted = fetched = None
+        if self.track_rowcount:
+            connection._op_info_sql(stmt.handle, bytes([isc_info_sql_records]))
+            last = counted = connection._defer_response(observed=True)
+        if decoder is not None:
+            fetch_sizer = self.fetch_sizer or FetchSizer(decoder.xsqlda)
+            fetch_count = fetch_sizer.fetch_count(self.arraysize, self.fetch_memory_budget)
+            connection._op_fetch(stmt.handle, decoder.blr, fetch_count)
+            last = fetched = connection._defer_response('_recv_prefetch_response', (decoder, ), observed=True)
+
+        try:
+            prepared.result()
+            stmt._prepared(query, prepared.value[2])
+            executed.result()
+        except DatabaseError:
+            # the responses of the rest are not used
+            connection._recv_pending(last)
+            raise
+        self._remember_decoder(query, stmt)
+        self.rowcount = -1
+        if counted is not None:
+            self.rowcount = self._parse_rowcount(stmt, counted.result()[2])
+        self._fetch_records = None
+        self._callproc_result = None
+        if stmt.stmt_type != isc_info_sql_stmt_select:
+            return self
+        stmt._is_open = True
+        if fetched is not None:
+            if decoder is not stmt.decoder:
+                # the describe response is changed (the BLR does not tell a
+                # charset or a BLOB subtype), fetch again in the new format
+                connection._recv_pending(fetched)
+                stmt.close()
+                return self._execute_stmt(stmt, params)
+            if not self.fetch_sizer:
+                stmt.fetch_sizer = fetch_sizer
+            fetched = (fetch_count, fetched)
+        self._fetch_records = stmt.fetch_generator(
+            self.fetch_sizer or stmt.fetch_sizer, self.fetch_memory_budget,
+            self.arraysize, self.prefetch_depth,
+            self.blob_mode or connection.blob_mode, fetched)
+        self._fetch_stmt = stmt
+        return self
+
+    def _execute_stmt(self, stmt, params):
+        cooked_params = self._convert_params(params)
+        if stmt._is_open:
+            # result set of the last execution is left open
+            stmt.close()
+        if stmt.stmt_type == isc_info_sql_stmt_ddl:
+            self.transaction.connection._drop_cached_statements()
+        # op_info_sql of the record count is sent along with the execute
+        info_sql = self._info_sql_with_execute(stmt)
         if stmt.stmt_type == isc_info_sql_stmt_exec_procedure:
             self.transaction.connection._op_execute2(
                 stmt.handle,
                 self.transaction.trans_handle, cooked_params,
-                calc_blr(stmt.xsqlda))
-            self._callproc_result = self.transaction.connection._op_sql_response(stmt.xsqlda)
-            self.transaction.connection._op_response()
+                stmt.decoder.blr, stmt.param_encoders)
+            if info_sql:
+                self.transaction.connection._op_info_sql(stmt.handle, bytes([isc_info_sql_records]))
+            try:
+                self._callproc_result = self.transaction.connection._op_sql_response(stmt.decoder)
+                self.transaction.connection._op_response()
+            except DatabaseError:
+                self._skip_info_sql_response(info_sql)
+                raise
+            self._receive_rowcount(stmt, info_sql)
             self._fetch_records = None
         else:
             self.transaction.connection._op_execute(
-                stmt.handle, self.transaction.trans_handle, cooked_params)
-            (h, oid, buf) = self.transaction.connection._op_response()
+                stmt.handle, self.transaction.trans_handle, cooked_params, stmt.param_encoders)
+            if info_sql:
+                self.transaction.connection._op_info_sql(stmt.handle, bytes([isc_info_sql_records]))
+            try:
+                (h, oid, buf) = self.transaction.connection._op_response()
+            except DatabaseError:
+                self._skip_info_sql_response(info_sql)
+                raise
+            self._receive_rowcount(stmt, info_sql)
 
             if stmt.stmt_type == isc_info_sql_stmt_select:
-                fetch_count = max(self.arraysize, DEFAULT_FETCH_COUNT)
-                self.transaction.connection._op_fetch(stmt.handle, calc_blr(stmt.xsqlda), fetch_count)
-                (rows, more_data) = self.transaction.connection._op_fetch_response(stmt.handle, stmt.xsqlda)
-                self._fetch_records = stmt.fetch_generator(rows, more_data, fetch_count)
+                stmt._is_open = True
+                self._fetch_records = stmt.fetch_generator(
+                    self.fetch_sizer or stmt.fetch_sizer, self.fetch_memory_budget,
+                    self.arraysize, self.prefetch_depth,
+                    self.blob_mode or self.transaction.connection.blob_mode)
+                self._fetch_stmt = stmt
             else:
                 self._fetch_records = None
             self._callproc_result = None
 
         return self
 
+    def _info_sql_with_execute(self, stmt):
+        "True if op_info_sql can be sent without waiting for the response of the execute"
+        return (
+            self.track_rowcount and stmt.handle != -1 and
+            (self.transaction.connection.accept_type & ptype_MASK) >= ptype_batch_send
+        )
+
+    def _skip_info_sql_response(self, info_sql):
+        "Read the response of op_info_sql sent along with a failed execute"
+        if info_sql:
+            try:
+                self.transaction.connection._op_response()
+            except DatabaseError:
+                pass
+
+    def _receive_rowcount(self, stmt, info_sql):
+        self.rowcount = -1
+        if info_sql:
+            (h, oid, buf) = self.transaction.connection._op_response()
+            self.rowcount = self._parse_rowcount(stmt, buf)
+        elif self.track_rowcount:
+            # asked when rowcount is read
+            self._rowcount_stmt = stmt
+
+    @property
+    def rowcount(self):
+        if self._rowcount_stmt is not None:
+            stmt, self._rowcount_stmt = self._rowcount_stmt, None
+            self._rowcount_value = self._rowcount(stmt)
+        return self._rowcount_value
+
+    @rowcount.setter
+    def rowcount(self, value):
+        self._rowcount_stmt = None
+        self._rowcount_value = value
+
     def _is_execute_procedure_query(self):
         """Return True if the current query is EXECUTE PROCEDURE / EXECUTE BLOCK."""
         q = self.query
@@ -290,14 +947,14 @@ class Cursor(object):
         DEBUG_OUTPUT("Cursor::execute()", query, params)
         try:
             self._execute(query, params)
-            self.rowcount = self._rowcount()
             # DML with RETURNING returns a phantom row of NULLs when no rows
             # are affected. Clear it so fetchone()/fetchall() return nothing,
             # matching PEP 249. Don't clear for EXECUTE PROCEDURE statements.
-            if (self.rowcount == 0 and self._callproc_result is not None
+            if (self._callproc_result is not None
                     and self.stmt and self.stmt.xsqlda
                     and self.stmt.stmt_type == isc_info_sql_stmt_exec_procedure
-                    and not self._is_execute_procedure_query()):
+                    and not self._is_execute_procedure_query()
+                    and (self.rowcount if self.track_rowcount else self._rowcount()) == 0):
                 self._callproc_result = None
             return self
         finally:
@@ -311,13 +968,219 @@ class Cursor(object):
         self.execute(query, params)
         return tuple(self._callproc_result) if self._callproc_result else None
 
-    def executemany(self, query, seq_of_params):
-        total = 0
+    def _batch_parameter_block(self):
+        def tag(k, v):
+            return bytes([k]) + int_to_bytes(4, 4) + int_to_bytes(v, 4)
+        bpb = bytes([BATCH_VERSION1])
+        bpb += tag(BATCH_TAG_RECORD_COUNTS, 1 if self.track_rowcount else 0)
+        bpb += tag(BATCH_TAG_BUFFER_BYTES_SIZE, min(self.batch_buffer_size, MAX_BATCH_BUFFER_SIZE))
+        if self.batch_continue_on_error:
+            bpb += tag(BATCH_TAG_MULTIERROR, 1)
+        return bpb
+
+    def _raise_batch_error(self):
+        if self.batch_errors and not self.batch_continue_on_error:
+            raise self.batch_errors[0][1]
+
+    def _batch_result(self, counts, errors, nrows):
+        "Record the result of a batch, raise the first error unless batch_continue_on_error"
+        base = len(self.rowcounts)
+        if not self.track_rowcount:
+            # rows after a failed one are not executed without BATCH_TAG_MULTIERROR
+            if errors and not self.batch_continue_on_error:
+                nrows = min(errors) + 1
+            counts = [BATCH_EXECUTE_FAILED if i in errors else BATCH_SUCCESS_NO_INFO for i in range(nrows)]
+        self.rowcounts.extend(counts)
+        for i in sorted(errors):
+            e = errors[i] or DatabaseError("executemany() failed at row %d" % (base + i,))
+            self.batch_errors.append((base + i, e))
+        self._raise_batch_error()
+
+    def _execute_row(self, stmt, params):
+        "Execute a row of executemany() by a round trip"
+        try:
+            self._execute_stmt(stmt, params)
+            self.rowcounts.append(self.rowcount if self.track_rowcount else BATCH_SUCCESS_NO_INFO)
+        except DatabaseError as e:
+            self.batch_errors.append((len(self.rowcounts), e))
+            self.rowcounts.append(BATCH_EXECUTE_FAILED)
+
+    def _send_batch(self, stmt, buf):
+        if not buf:
+            return
+        connection = self.transaction.connection
+        connection._op_batch_create(
+            stmt.handle, buf.blr(), buf.message_length(buf.types), self._batch_parameter_block())
+        connection._defer_response()
+        connection._op_batch_msg(stmt.handle, buf.messages())
+        connection._defer_response()
+        connection._op_batch_exec(stmt.handle, self.transaction.trans_handle)
+        executed = connection._defer_response('_recv_batch_cs', observed=True)
+        connection._op_batch_rls(stmt.handle)
+        connection._defer_response()
+        connection._recv_pending(executed)
+        counts, errors = executed.result()
+        self._batch_result(counts, errors, len(buf))
+
+    def _execute_batch(self, stmt, seq_of_params):
+        connection = self.transaction.connection
+        buf = BatchBuffer(self.batch_buffer_size)
+        for params in seq_of_params:
+            row = connection._batch_row(params)
+            if row is None:
+                # BLOB parameters are not sent by a batch
+                self._send_batch(stmt, buf)
+                buf = BatchBuffer(self.batch_buffer_size)
+                self._execute_row(stmt, params)
+                self._raise_batch_error()
+            elif not buf.add(row):
+                self._send_batch(stmt, buf)
+                buf = BatchBuffer(self.batch_buffer_size)
+                buf.add(row)
+        self._send_batch(stmt, buf)
+
+    def _receive_pipelined(self, stmt):
+        "Read the responses of op_execute and op_info_sql of the oldest row in flight"
+        connection = self.transaction.connection
+        error = None
+        try:
+            connection._op_response()
+        except DatabaseError as e:
+            error = e
+        count = BATCH_SUCCESS_NO_INFO
+        if self.track_rowcount:
+            try:
+                (h, oid, buf) = connection._op_response()
+                count = self._parse_rowcount(stmt, buf)
+            except DatabaseError:
+                count = -1
+        if error:
+            self.batch_errors.append((len(self.rowcounts), error))
+            count = BATCH_EXECUTE_FAILED
+        self.rowcounts.append(count)
+
+    def _send_pipelined(self, stmt, params):
+        "Send op_execute (and op_info_sql) of a row without waiting for the responses"
+        connection = self.transaction.connection
+        connection._op_execute(
+            stmt.handle, self.transaction.trans_handle, self._convert_params(params),
+            stmt.param_encoders)
+        if self.track_rowcount:
+            connection._op_info_sql(stmt.handle, bytes([isc_info_sql_records]))
+
+    def _execute_pipelined(self, stmt, seq_of_params):
+        """Send op_execute (and op_info_sql) of the rows without waiting for
+        the responses, up to executemany_depth rows are in flight.
+
+        Rows in flight are executed even if a row before them fails, so
+        they are sent ahead only if batch_continue_on_error.  Otherwise
+        they are sent by windows after a savepoint (see _execute_window),
+        one at a time in an autocommit transaction."""
+        connection = self.transaction.connection
+        if not self.batch_continue_on_error:
+            if self.transaction._autocommit:
+                for params in seq_of_params:
+                    self._execute_row(stmt, params)
+                    self._raise_batch_error()
+            else:
+                self._execute_windows(stmt, seq_of_params)
+            return
+        in_flight = 0
         for params in seq_of_params:
-            self.execute(query, params)
-            if self.rowcount > 0:
-                total += self.rowcount
-        self.rowcount = total
+            if connection._blob_params(params):
+                # creating BLOBs reads responses
+                for i in range(in_flight):
+                    self._receive_pipelined(stmt)
+                in_flight = 0
+                self._execute_row(stmt, params)
+            else:
+                self._send_pipelined(stmt, params)
+                in_flight += 1
+                if in_flight >= self.executemany_depth:
+                    self._receive_pipelined(stmt)
+                    in_flight -= 1
+        for i in range(in_flight):
+            self._receive_pipelined(stmt)
+
+    def _execute_windows(self, stmt, seq_of_params):
+        "Execute the rows by windows of executemany_depth rows, stop at the first failed row"
+        connection = self.transaction.connection
+        saved = False
+        window = []
+        for params in seq_of_params:
+            if connection._blob_params(params):
+                # creating BLOBs reads responses
+                saved = self._execute_window(stmt, window) or saved
+                window = []
+                if not self.batch_errors:
+                    self._execute_row(stmt, params)
+            else:
+                window.append(params)
+                if len(window) >= self.executemany_depth:
+                    saved = self._execute_window(stmt, window) or saved
+                    window = []
+            if self.batch_errors:
+                break
+        else:
+            saved = self._execute_window(stmt, window) or saved
+        if saved:
+            connection._op_exec_immediate(
+                self.transaction.trans_handle, query='RELEASE SAVEPOINT ' + _EXECUTEMANY_SAVEPOINT)
+            connection._defer_response()
+        self._raise_batch_error()
+
+    def _execute_window(self, stmt, window):
+        """Send the rows after a savepoint and read the responses.  When a
+        row fails, the rows sent after it are undone by rolling back to
+        the savepoint, and the rows up to the failed one are executed
+        again one at a time.  If the failed row succeeds this time, the
+        rest of the window is sent again."""
+        if not window:
+            return False
+        connection = self.transaction.connection
+        trans_handle = self.transaction.trans_handle
+        start = len(self.rowcounts)
+        connection._op_exec_immediate(trans_handle, query='SAVEPOINT ' + _EXECUTEMANY_SAVEPOINT)
+        connection._defer_response()
+        for params in window:
+            self._send_pipelined(stmt, params)
+        for params in window:
+            self._receive_pipelined(stmt)
+        if not self.batch_errors:
+            return True
+        failed = self.batch_errors[0][0] - start
+        connection._op_exec_immediate(trans_handle, query='ROLLBACK TO ' + _EXECUTEMANY_SAVEPOINT)
+        connection._op_response()
+        del self.rowcounts[start:]
+        del self.batch_errors[:]
+        for params in window[:failed + 1]:
+            self._execute_row(stmt, params)
+            if self.batch_errors:
+                return True
+        # the failed row succeeded again (a lock conflict gone), send the rest
+        self._execute_window(stmt, window[failed + 1:])
+        return True
+
+    def executemany(self, query, seq_of_params):
+        DEBUG_OUTPUT("Cursor::executemany()", query)
+        self.rowcounts = []
+        self.batch_errors = []
+        try:
+            self.transaction.check_trans_handle()
+            stmt = self._get_stmt(query)
+            if stmt.stmt_type not in (
+                isc_info_sql_stmt_insert, isc_info_sql_stmt_update, isc_info_sql_stmt_delete
+            ) or stmt.xsqlda:
+                for params in seq_of_params:
+                    self._execute_row(stmt, params)
+                    self._raise_batch_error()
+            elif self.transaction.connection.accept_version >= PROTOCOL_VERSION16:
+                self._execute_batch(stmt, seq_of_params)
+            else:
+                self._execute_pipelined(stmt, seq_of_params)
+        finally:
+            self.rowcount = sum(n for n in self.rowcounts if n > 0) if self.track_rowcount else -1
+            self.transaction.is_dirty = True
 
     def fetchone(self):
         if not self.transaction.is_dirty:
@@ -381,6 +1244,32 @@ class Cursor(object):
         DEBUG_OUTPUT("Cursor::fetchmany()", results_list)
         return results_list
 
+    def fetch_columns(self):
+        """Fetch all remaining rows by column.
+        Return a list of (values, nulls) in the column order.  values of
+        SHORT, LONG, INT64 (without scale), FLOAT, DOUBLE and DATE columns
+        are numpy arrays if numpy is installed, array.array otherwise
+        (DATE as a list of datetime.date), values of other columns are lists.
+        nulls is the NULL mask of the column.
+        """
+        return self._fetch_columns(None)
+
+    def fetchmany_columns(self, size=None):
+        "Fetch the next size rows by column, see fetch_columns()"
+        if not size:
+            size = self.arraysize
+        return self._fetch_columns(size)
+
+    def _fetch_columns(self, size):
+        if not self.transaction.is_dirty:
+            return None
+        # callproc or not select statement
+        if not self._fetch_records:
+            return []
+        results = self._fetch_stmt.fetch_columns(size)
+        DEBUG_OUTPUT("Cursor::fetch_columns()", results)
+        return results
+
     # kinterbasdb extended API
     def fetchonemap(self):
         r = self.fetchone()
@@ -404,10 +1293,7 @@ class Cursor(object):
 
     def close(self):
         DEBUG_OUTPUT("Cursor::close()")
-        if not self.stmt:
-            return
-        self.stmt.drop()
-        self.stmt = None
+        self._release_stmt()
 
     def nextset(self):
         raise NotSupportedError()
@@ -429,16 +1315,29 @@ class Cursor(object):
             x.precision(), x.sqlscale, True if x.null_ok else False
         ) for x in self.stmt.xsqlda]
 
-    def _rowcount(self):
+    @property
+    def fetch_sizes(self):
+        "op_fetch counts chosen for the current result set"
+        if not getattr(self, '_fetch_records', None):
+            return []
+        return list(self._fetch_stmt.fetch_sizes)
+
+    def _rowcount(self, stmt=None):
         DEBUG_OUTPUT("Cursor::rowcount()")
-        if not self.stmt or self.stmt.handle == -1:
+        stmt = stmt or self.stmt
+        if not stmt or stmt.handle == -1:
             return -1
 
-        self.transaction.connection._op_info_sql(self.stmt.handle, bytes([isc_info_sql_records]))
+        self.transaction.connection._op_info_sql(stmt.handle, bytes([isc_info_sql_records]))
         (h, oid, buf) = self.transaction.connection._op_response()
+        return self._parse_rowcount(stmt, buf)
+
+    @staticmethod
+    def _parse_rowcount(stmt, buf):
+        "Record count in the response of op_info_sql isc_info_sql_records"
         if buf[:3] != bytes([0x17, 0x1d, 0x00]):    # isc_info_sql_records
             count = -1
-        elif self.stmt.stmt_type == isc_info_sql_stmt_select:
+        elif stmt.stmt_type == isc_info_sql_stmt_select:
             assert buf[17:20] == bytes([0x0d, 0x04, 0x00])     # isc_info_req_select_count
             # select count
             count = bytes_to_int(buf[20:24])
@@ -481,6 +1380,15 @@ class Transaction(object):
             "Transaction::_begin()", self.connection.db_handle, isolation_level, self._autocommit, self._trans_handle)
         self.is_dirty = False
 
+    def _end(self):
+        "The server closes the result sets of the transaction when it ends"
+        self._trans_handle = None
+        statements = list(self.connection.statement_cache)
+        statements.extend(cur.stmt for cur in self.connection._cursors.get(self, ()) if cur.stmt)
+        for stmt in statements:
+            if stmt.trans is self:
+                stmt._is_open = False
+
     def close(self):
         if self._trans_handle is None:
             return
@@ -489,7 +1397,7 @@ class Transaction(object):
         DEBUG_OUTPUT("Transaction::close()", self._trans_handle, self.connection.db_handle)
         self.connection._op_rollback(self._trans_handle)
         (h, oid, buf) = self.connection._op_response()
-        self._trans_handle = None
+        self._end()
         self.is_dirty = False
 
     def begin(self):
@@ -516,7 +1424,7 @@ class Transaction(object):
         else:
             self.connection._op_commit(self._trans_handle)
             (h, oid, buf) = self.connection._op_response()
-            self._trans_handle = None
+            self._end()
         self.is_dirty = False
 
     def rollback(self, retaining=False, savepoint=None):
@@ -538,7 +1446,7 @@ class Transaction(object):
         else:
             self.connection._op_rollback(self._trans_handle)
             (h, oid, buf) = self.connection._op_response()
-            self._trans_handle = None
+            self._end()
         self.is_dirty = False
 
     def _trans_info(self, info_requests):
@@ -594,23 +1502,122 @@ class Transaction(object):
         return self._trans_handle
 
 
+class Pipeline(object):
+    """Requests sent without waiting for their responses, Connection.pipeline().
+
+    execute(), commit() and rollback() return a PendingResponse.  The
+    responses of them and of the statements freed or closed meanwhile are
+    read in order by flush(), at the end of the with block, by result() of
+    a response or when a request can not go on without the answer of the
+    server (a statement to prepare, a transaction to start).
+    """
+    _stmt_types = (isc_info_sql_stmt_insert, isc_info_sql_stmt_update, isc_info_sql_stmt_delete)
+
+    def __init__(self, connection):
+        self.connection = connection
+        self.responses = []
+        self._cursors = {}  # by SQL text, a cursor keeps its statement prepared
+
+    def __enter__(self):
+        self.connection._pipelines += 1
+        return self
+
+    def __exit__(self, exc, value, traceback):
+        try:
+            for cur in self._cursors.values():
+                cur.close()
+            self._cursors.clear()
+            self.flush()
+        except DatabaseError:
+            if exc is None:
+                raise
+        finally:
+            self.connection._pipelines -= 1
+
+    def _cursor(self, query):
+        cur = self._cursors.get(query)
+        if cur is None:
+            cur = self._cursors[query] = self.connection.cursor()
+        return cur
+
+    def _check_stmt(self, stmt):
+        if stmt.stmt_type not in self._stmt_types or stmt.xsqlda:
+            raise ProgrammingError("pipeline() executes INSERT, UPDATE and DELETE statements without RETURNING")
+
+    def _sent(self, reader='_recv_response', args=()):
+        r = self.connection._defer_response(reader, args, observed=True)
+        self.responses.append(r)
+        if not self.connection._defers_response():
+            # the server does not take a request before the response of the last one
+            self.connection._recv_pending(r)
+        return r
+
+    def _done(self, value):
+        r = PendingResponse(observed=True)
+        r.set_result(value)
+        self.responses.append(r)
+        return r
+
+    def execute(self, query, params=None):
+        """Execute an INSERT, UPDATE or DELETE statement, return a
+        PendingResponse of the record count"""
+        cur = self._cursor(query)
+        cur.transaction.check_trans_handle()
+        stmt = cur.stmt if cur.stmt and cur.query == query else cur._get_stmt(query)
+        self._check_stmt(stmt)
+        cur.transaction.is_dirty = True
+        if not self.connection._defers_response():
+            r = PendingResponse(observed=True)
+            try:
+                cur._execute_stmt(stmt, params or [])
+                r.set_result(cur.rowcount)
+            except DatabaseError as e:
+                r.set_error(e)
+            self.responses.append(r)
+            return r
+        self.connection._op_execute(
+            stmt.handle, cur.transaction.trans_handle, cur._convert_params(params or []), stmt.param_encoders)
+        self.connection._op_info_sql(stmt.handle, bytes([isc_info_sql_records]))
+        return self._sent('_recv_execute_response', (stmt, ))
+
+    def _end(self, retaining, op, op_retaining):
+        transaction = self.connection._transaction
+        if transaction is None or transaction._trans_handle is None or not transaction.is_dirty:
+            return self._done(None)
+        if retaining:
+            op_retaining(transaction._trans_handle)
+        else:
+            op(transaction._trans_handle)
+            transaction._end()
+        transaction.is_dirty = False
+        return self._sent()
+
+    def commit(self, retaining=False):
+        "Commit the transaction of the connection, return a PendingResponse"
+        return self._end(retaining, self.connection._op_commit, self.connection._op_commit_retaining)
+
+    def rollback(self, retaining=False):
+        "Rollback the transaction of the connection, return a PendingResponse"
+        return self._end(retaining, self.connection._op_rollback, self.connection._op_rollback_retaining)
+
+    def flush(self):
+        """Read all the responses, raise the first error of the requests whose
+        result() is not asked"""
+        self.connection._recv_pending()
+        responses, self.responses = self.responses, []
+        for r in responses:
+            if r.error and not r.retrieved:
+                raise r.error
+
+
+_INT = struct.Struct('>i')
+_FETCH_HEADER = struct.Struct('>ii')    # status, count
+
+
 class ConnectionResponseMixin:
     def _recv_channel(self, nbytes, word_alignment=False):
-        n = nbytes
-        if word_alignment and (n % 4):
-            n += 4 - nbytes % 4  # 4 bytes word alignment
-        r = bytes([])
-        while n:
-            if (self.timeout is not None and select.select([self.sock._sock], [], [], self.timeout)[0] == []):
-                raise TimeoutError("Pakcet recv timeout error")
-            b = self.sock.recv(n)
-            if not b:
-                break
-            r += b
-            n -= len(b)
-        if len(r) < nbytes:
-            raise OperationalError('Can not recv() packets')
-        return r[:nbytes]
+        padding = (4 - nbytes % 4) & 3 if word_alignment else 0  # 4 bytes word alignment
+        return self.sock.read(nbytes, self.timeout, padding)
 
     def _parse_status_vector(self):
         sql_code = 0
@@ -654,32 +1661,104 @@ class ConnectionResponseMixin:
         buf_len = bytes_to_bint(b[12:])   # buffer length
         buf = self._recv_channel(buf_len, word_alignment=True)
 
-        (gds_codes, sql_code, message) = self._parse_status_vector()
-        if gds_codes.intersection([
-            335544838, 335544879, 335544880, 335544466, 335544665, 335544347, 335544558
-        ]):
-            raise IntegrityError(message, gds_codes, sql_code)
-        elif gds_codes.intersection([335544321]):
-            raise DataError(message, gds_codes, sql_code)
-        elif (sql_code or message) and not gds_codes.intersection([335544434]):
-            raise OperationalError(message, gds_codes, sql_code)
+        e = _status_error(*self._parse_status_vector())
+        if e:
+            raise e
         return (h, oid, buf)
 
     def _op_response(self):
+        self._recv_pending()
+        return self._recv_response()
+
+    def _recv_response(self):
         b = self._recv_channel(4)
         while bytes_to_bint(b) == self.op_dummy:
             b = self._recv_channel(4)
         op_code = bytes_to_bint(b)
-        while op_code == self.op_response and self.lazy_response_count:
-            self.lazy_response_count -= 1
-            h, oid, buf = self._parse_op_response()
-            b = self._recv_channel(4)
         if op_code == self.op_cont_auth:
             raise OperationalError('Unauthorized')
         elif op_code != self.op_response:
             raise InternalError("_op_response:op_code = %d" % (op_code,))
         return self._parse_op_response()
 
+    def _recv_pending(self, until=None):
+        """Read the responses of the requests sent without waiting for them
+        (queued by _defer_response()) in the order they were sent, up to
+        `until`, a PendingResponse or its owner, all if None.  They come
+        before the response of any later request.  The first error of a
+        response not observed is raised after the rest are read.
+        """
+        error = None
+        while self._pending_responses:
+            r = self._pending_responses.popleft()
+            try:
+                value = getattr(self, r.reader)(*r.args)
+            except InternalError:
+                raise
+            except DatabaseError as e:
+                r.set_error(e)
+                if not r.observed:
+                    error = error or e
+            else:
+                r.set_result(value)
+            if until is not None and (r is until or r.owner is until):
+                break
+        if error:
+            raise error
+
+    def _recv_execute_response(self, stmt):
+        "Read the responses of op_execute and op_info_sql sent by Pipeline.execute(), return the record count"
+        try:
+            self._recv_response()
+        except InternalError:
+            raise
+        except DatabaseError:
+            try:
+                self._recv_response()
+            except DatabaseError:
+                pass
+            raise
+        (h, oid, buf) = self._recv_response()
+        return Cursor._parse_rowcount(stmt, buf)
+
+    def _wait_response(self, response):
+        "Wait for a PendingResponse, see PendingResponse.result()"
+        self._recv_pending(response)
+
+    def _parse_batch_cs(self):
+        "Return record counts and {index: error} of the rows failed"
+        b = self._recv_channel(20)
+        updates = bytes_to_bint(b[8:12])
+        vectors = bytes_to_bint(b[12:16])
+        errors = bytes_to_bint(b[16:20])
+        counts = []
+        if updates:
+            b = self._recv_channel(updates * 4)
+            counts = [bytes_to_bint(b[i:i+4]) for i in range(0, updates * 4, 4)]
+        row_errors = {}
+        for i in range(vectors):
+            n = bytes_to_bint(self._recv_channel(4))
+            row_errors[n] = _status_error(*self._parse_status_vector())
+        for i in range(errors):
+            # without a status vector (over BATCH_TAG_DETAILED_ERRORS)
+            n = bytes_to_bint(self._recv_channel(4))
+            row_errors.setdefault(n, None)
+        return counts, row_errors
+
+    def _recv_batch_cs(self):
+        "Read op_batch_cs, the response of op_batch_exec"
+        b = self._recv_channel(4)
+        while bytes_to_bint(b) == self.op_dummy:
+            b = self._recv_channel(4)
+        op_code = bytes_to_bint(b)
+        if op_code == self.op_response:
+            # op_batch_exec failed
+            self._parse_op_response()
+            raise InternalError("_recv_batch_cs:op_batch_cs is expected")
+        if op_code != self.op_batch_cs:
+            raise InternalError("_recv_batch_cs:op_code = %d" % (op_code,))
+        return self._parse_batch_cs()
+
     def _parse_connect_response(self):
         # want and treat op_accept or op_cond_accept or op_accept_data
         b = self._recv_channel(4)
@@ -696,7 +1775,7 @@ class ConnectionResponseMixin:
         self.accept_version = b[3]
         self.accept_architecture = bytes_to_bint(b[4:8])
         self.accept_type = bytes_to_bint(b[8:])
-        self.lazy_response_count = 0
+        self._pending_responses = collections.deque()
 
         if self.accept_type & pflag_compress:
             self.sock.enable_compression()
@@ -793,12 +1872,12 @@ class ConnectionResponseMixin:
                 if enc_plugin in (b'ChaCha64', b'ChaCha'):
                     k = hashlib.sha256(session_key).digest()
                     self.sock.set_translator(
-                        ChaCha20.new(k, nonce),
-                        ChaCha20.new(k, nonce),
+                        chacha.new(k, nonce),
+                        chacha.new(k, nonce),
                     )
                 elif enc_plugin == b'Arc4':
                     self.sock.set_translator(
-                        ARC4.new(session_key), ARC4.new(session_key))
+                        arc4.new(session_key), arc4.new(session_key))
                 else:
                     raise OperationalError(
                         'Unknown wirecrypt plugin %s' % (enc_plugin)
@@ -811,7 +1890,49 @@ class ConnectionResponseMixin:
         else:
             assert op_code == self.op_accept
 
-    def _op_sql_response(self, xsqlda):
+    def _parse_fetch_rows(self, buf, pos, end, decoder, rows):
+        """Decode a batch of op_fetch_response packets from buf[pos:end].
+
+        pos points at the status of a packet whose op code is already read.
+        Complete rows are appended to rows, a list or a ColumnBuilder.
+        Return (pos, status, op_code): status is None if more data is
+        needed, op_code is the op code that ended the batch
+        (op_fetch_response for a normal end).
+        """
+        columnar = isinstance(rows, ColumnBuilder)
+        while end - pos >= 8:
+            if columnar:
+                pos = rows.append_packed(buf, pos, end, self.op_fetch_response)
+                if end - pos < 8:
+                    break
+            status, count = _FETCH_HEADER.unpack_from(buf, pos)
+            if not count:
+                return pos + 8, status, self.op_fetch_response
+            r, next_pos = decoder.decode(buf, pos + 8, end)
+            if r is None or end - next_pos < 4:
+                break
+            rows.append(r)
+            # Read the next opcode first (4 bytes) before committing to the
+            # full fetch-response continuation header.  Firebird can send
+            # op_response (an error) here instead of another
+            # op_fetch_response.
+            op_code = _INT.unpack_from(buf, next_pos)[0]
+            pos = next_pos + 4
+            if op_code != self.op_fetch_response:
+                return pos, status, op_code
+        return pos, None, None
+
+    def _recv_row(self, decoder):
+        while True:
+            buf, pos, end = self.sock.buffer()
+            r, pos = decoder.decode(buf, pos, end)
+            if r is not None:
+                self.sock.consume(pos)
+                return r
+            self.sock.fill_more(self.timeout)
+
+    def _op_sql_response(self, decoder):
+        self._recv_pending()
         b = self._recv_channel(4)
         while bytes_to_bint(b) == self.op_dummy:
             b = self._recv_channel(4)
@@ -823,109 +1944,42 @@ class ConnectionResponseMixin:
 
         b = self._recv_channel(4)
         count = bytes_to_bint(b[:4])
-        r = []
         if count == 0:
             return []
-        if self.accept_version < PROTOCOL_VERSION13:
-            for i in range(len(xsqlda)):
-                x = xsqlda[i]
-                if x.io_length() < 0:
-                    b = self._recv_channel(4)
-                    ln = bytes_to_bint(b)
-                else:
-                    ln = x.io_length()
-                raw_value = self._recv_channel(ln, word_alignment=True)
-                if self._recv_channel(4) == bytes([0]) * 4:     # Not NULL
-                    r.append(x.value(raw_value))
-                else:
-                    r.append(None)
-        else:
-            n = len(xsqlda) // 8
-            if len(xsqlda) % 8 != 0:
-                n += 1
-            null_indicator = 0
-            for c in reversed(self._recv_channel(n, word_alignment=True)):
-                null_indicator <<= 8
-                null_indicator += c
-            for i in range(len(xsqlda)):
-                x = xsqlda[i]
-                if null_indicator & (1 << i):
-                    r.append(None)
-                else:
-                    if x.io_length() < 0:
-                        b = self._recv_channel(4)
-                        ln = bytes_to_bint(b)
-                    else:
-                        ln = x.io_length()
-                    raw_value = self._recv_channel(ln, word_alignment=True)
-                    r.append(x.value(raw_value))
-        return r
+        return self._recv_row(decoder)
+
+    def _recv_prefetch_response(self, decoder):
+        "Read the response of an op_fetch sent ahead by Statement._prefetch()"
+        consumed = self.sock.consumed
+        rows, more_data = self._recv_fetch_response(decoder)
+        return rows, more_data, self.sock.consumed - consumed
 
-    def _op_fetch_response(self, stmt_handle, xsqlda):
+    def _op_fetch_response(self, stmt_handle, decoder, columns=None):
+        self._recv_pending()
+        return self._recv_fetch_response(decoder, columns)
+
+    def _recv_fetch_response(self, decoder, columns=None):
         op_code = bytes_to_bint(self._recv_channel(4))
         while op_code == self.op_dummy:
             op_code = bytes_to_bint(self._recv_channel(4))
 
-        while op_code == self.op_response and self.lazy_response_count:
-            self.lazy_response_count -= 1
-            h, oid, buf = self._parse_op_response()
-            op_code = bytes_to_bint(self._recv_channel(4))
-
         if op_code != self.op_fetch_response:
             if op_code == self.op_response:
                 self._parse_op_response()  # raises the actual Firebird error
             raise InternalError("op_fetch_response:op_code = %d" % (op_code,))
-        b = self._recv_channel(8)
-        status = bytes_to_bint(b[:4])
-        count = bytes_to_bint(b[4:8])
-        rows = []
-        while count:
-            r = [None] * len(xsqlda)
-            if self.accept_version < PROTOCOL_VERSION13:
-                for i in range(len(xsqlda)):
-                    x = xsqlda[i]
-                    if x.io_length() < 0:
-                        b = self._recv_channel(4)
-                        ln = bytes_to_bint(b)
-                    else:
-                        ln = x.io_length()
-                    raw_value = self._recv_channel(ln, word_alignment=True)
-                    if self._recv_channel(4) == bytes([0]) * 4:     # Not NULL
-                        r[i] = x.value(raw_value)
-            else:   # PROTOCOL_VERSION13
-                n = len(xsqlda) // 8
-                if len(xsqlda) % 8 != 0:
-                    n += 1
-                null_indicator = 0
-                for c in reversed(self._recv_channel(n, word_alignment=True)):
-                    null_indicator <<= 8
-                    null_indicator += c
-                for i in range(len(xsqlda)):
-                    x = xsqlda[i]
-                    if null_indicator & (1 << i):
-                        continue
-                    if x.io_length() < 0:
-                        b = self._recv_channel(4)
-                        ln = bytes_to_bint(b)
-                    else:
-                        ln = x.io_length()
-                    raw_value = self._recv_channel(ln, word_alignment=True)
-                    r[i] = x.value(raw_value)
-            rows.append(r)
-            # Read the next opcode first (4 bytes) before committing to the
-            # full 12-byte fetch-response continuation header.  Firebird can
-            # send op_response (an error) here instead of another
-            # op_fetch_response, which would desynchronise the protocol if we
-            # consumed the bytes blindly.
-            next_op = bytes_to_bint(self._recv_channel(4))
-            if next_op == self.op_response:
+        rows = [] if columns is None else columns
+        while True:
+            buf, pos, end = self.sock.buffer()
+            pos, status, op_code = self._parse_fetch_rows(buf, pos, end, decoder, rows)
+            self.sock.consume(pos)
+            if status is not None:
+                break
+            self.sock.fill_more(self.timeout)
+        if op_code != self.op_fetch_response:
+            if op_code == self.op_response:
                 self._parse_op_response()  # raises the actual Firebird error
                 raise InternalError("op_fetch_response:Internal Error")
-            if next_op != self.op_fetch_response:
-                raise InternalError("op_fetch_response:op_code = %d" % (next_op,))
-            b = self._recv_channel(8)
-            status = bytes_to_bint(b[:4])
-            count = bytes_to_bint(b[4:8])
+            raise InternalError("op_fetch_response:op_code = %d" % (op_code,))
         return rows, status != 100
 
 
@@ -964,11 +2018,27 @@ class ConnectionBase(WireProtocol):
             self._transaction = Transaction(self, self._autocommit)
             self._transaction.begin()
         self._transaction.check_trans_handle()
+        # query may be DDL
+        self._drop_cached_statements()
         self._op_exec_immediate(
             self._transaction.trans_handle, query=query)
         (h, oid, buf) = self._op_response()
         self._transaction.is_dirty = True
 
+    def pipeline(self):
+        "Return a Pipeline, send requests without waiting for the responses"
+        return Pipeline(self)
+
+    def _database_key(self):
+        "Identity of the database for the process wide caches"
+        return (self.hostname, self.port, self.filename)
+
+    def _drop_cached_statements(self):
+        "Cached statements may depend on the metadata changed by DDL, and lock it"
+        describe_cache.invalidate(self._database_key())
+        for stmt in self.statement_cache.clear():
+            stmt.release()
+
     def ping(self, reconnect=True):
         try:
             self._op_ping()
@@ -985,7 +2055,8 @@ class ConnectionBase(WireProtocol):
         page_size=4096, is_services=False, cloexec=False,
         timeout=None, isolation_level=None,
         auth_plugin_name=None, wire_crypt=True, create_new=False,
-        timezone=None, wire_compress=False, readonly=False
+        timezone=None, wire_compress=False, readonly=False, blob_mode='eager',
+        statement_cache_size=0
     ):
         DEBUG_OUTPUT("Connection::__init__()", id(self))
         self.accept_plugin_name = ''
@@ -1014,6 +2085,11 @@ class ConnectionBase(WireProtocol):
         else:
             self.isolation_level = int(isolation_level)
         self.timezone = timezone
+        if blob_mode not in ('eager', 'lazy'):
+            raise NotSupportedError("blob_mode must be 'eager' or 'lazy'")
+        self.blob_mode = blob_mode
+        # prepared statements kept for reuse, see Cursor._get_stmt()
+        self.statement_cache = StatementCache(statement_cache_size)
 
 
     def _initialize(self):
@@ -1021,6 +2097,8 @@ class ConnectionBase(WireProtocol):
         self._autocommit = False
         self._transaction = None
         self._cursors = {}
+        self.statement_cache.reset()
+        self._free_statement_handles = []
 
         self.sock = SocketStream(self.hostname, self.port, self.timeout, self.cloexec)
 
@@ -1219,6 +2297,7 @@ class ConnectionBase(WireProtocol):
             self.sock.close()
             self.sock = None
             self.db_handle = None
+            self.statement_cache.reset()
 
     def close(self):
         DEBUG_OUTPUT("Connection::close()", id(self), self.db_handle)
@@ -1231,6 +2310,7 @@ class ConnectionBase(WireProtocol):
         self.sock.close()
         self.sock = None
         self.db_handle = None
+        self.statement_cache.reset()
 
     def event_conduit(self, event_count, event_id=None):
         return EventConduit(self, event_count, event_id, self.timeout)
@@ -0,0 +1,130 @@
+##############################################################################
+# Copyright (c) 2009-2025, Hajime Nakagami<nakagami@gmail.com>
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#
+# * Redistributions of source code must retain the above copyright notice, this
+#   list of conditions and the following disclaimer.
+#
+# * Redistributions in binary form must reproduce the above copyright notice,
+#  this list of conditions and the following disclaimer in the documentation
+#  and/or other materials provided with the distribution.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+# DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE
+# FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL
+# DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR
+# SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER
+# CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY,
+# OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+# OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+#
+# Python DB-API 2.0 module for Firebird.
+##############################################################################
+import collections
+
+from firebirdsql.consts import *    # noqa
+
+
+class FetchSizer:
+    """Choose the number of rows requested by each op_fetch.
+
+    Each batch costs a round trip plus the transfer of its rows.  The
+    round trip latency and the time per byte are fitted from the size and
+    elapsed time of earlier batches, and the count is chosen so that the
+    transfer takes about `latency_ratio` times the latency.  The count is
+    bounded by the memory budget of the cursor, estimated from the row
+    width (measured on received batches, from the XSQLDA before that).
+
+    `sizes` keeps the counts chosen recently.
+    """
+    # bytes assumed for each BLOB value read into a row
+    blob_size_estimate = 65536
+    # bytes of a Python object held for each value
+    value_overhead = 48
+    # op_fetch count is a 16 bit value on the server side
+    max_fetch_count = 32767
+
+    def __init__(self, xsqlda=(), initial_count=DEFAULT_FETCH_COUNT, latency_ratio=4.0, history=8):
+        self.initial_count = initial_count
+        self.latency_ratio = latency_ratio
+        self.estimated_row_width = self._row_width(xsqlda)
+        self.blob_count = sum(1 for x in xsqlda if x.sqltype == SQL_TYPE_BLOB)
+        self.column_count = len(xsqlda)
+        self.samples = collections.deque(maxlen=history)    # (nbytes, elapsed)
+        self.sizes = collections.deque(maxlen=64)
+        self.rows = 0
+        self.nbytes = 0
+
+    @staticmethod
+    def _row_width(xsqlda):
+        "Estimated wire size of a row: op_fetch_response header, NULL bitmap and values"
+        n = 12 + (((len(xsqlda) + 7) // 8 + 3) & ~3)
+        for x in xsqlda:
+            if x.sqltype == SQL_TYPE_VARYING:
+                n += 4 + ((x.sqllen + 3) & ~3)
+            else:
+                n += (x.io_length() + 3) & ~3
+        return n
+
+    @property
+    def row_width(self):
+        "Wire size of a row, measured if rows have been received"
+        if self.rows:
+            return max(self.nbytes // self.rows, 1)
+        return self.estimated_row_width
+
+    @property
+    def row_memory(self):
+        "Estimated memory held by a fetched row"
+        return (
+            self.row_width + self.column_count * self.value_overhead +
+            self.blob_count * self.blob_size_estimate
+        )
+
+    def record(self, rows, nbytes, elapsed=None):
+        """Record a received batch, elapsed is None if its round trip
+        overlapped others (prefetched)."""
+        self.rows += rows
+        self.nbytes += nbytes
+        if elapsed is not None and rows:
+            self.samples.append((nbytes, elapsed))
+
+    def _fit(self):
+        "Least squares fit of elapsed = latency + nbytes * seconds_per_byte"
+        n = len(self.samples)
+        if n < 2:
+            return None
+        mean_x = sum(x for x, _ in self.samples) / n
+        mean_y = sum(y for _, y in self.samples) / n
+        sxx = sum((x - mean_x) ** 2 for x, _ in self.samples)
+        if sxx == 0:
+            return None
+        sxy = sum((x - mean_x) * (y - mean_y) for x, y in self.samples)
+        seconds_per_byte = sxy / sxx
+        if seconds_per_byte <= 0:
+            return None
+        return max(mean_y - seconds_per_byte * mean_x, 0.0), seconds_per_byte
+
+    def fetch_count(self, min_count=1, memory_budget=None):
+        "Return the count of the next op_fetch"
+        last = self.sizes[-1] if self.sizes else None
+        fit = self._fit()
+        if last is None:
+            count = self.initial_count
+        elif fit is None:
+            # latency can not be told apart from the transfer yet
+            count = last * 2
+        else:
+            latency, seconds_per_byte = fit
+            count = int(self.latency_ratio * latency / (seconds_per_byte * self.row_width))
+            count = min(count, last * 4)
+        if memory_budget:
+            count = min(count, memory_budget // self.row_memory)
+        count = max(min(count, self.max_fetch_count), min_count, 1)
+        self.sizes.append(count)
+        return count
@@ -0,0 +1,209 @@
+##############################################################################
+# Copyright (c) 2009-2025, Hajime Nakagami<nakagami@gmail.com>
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#
+# * Redistributions of source code must retain the above copyright notice, this
+#   list of conditions and the following disclaimer.
+#
+# * Redistributions in binary form must reproduce the above copyright notice,
+#  this list of conditions and the following disclaimer in the documentation
+#  and/or other materials provided with the distribution.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+# DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE
+# FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL
+# DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR
+# SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER
+# CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY,
+# OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+# OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+#
+# Python DB-API 2.0 module for Firebird.
+##############################################################################
+import collections
+import threading
+
+
+class StatementCache:
+    """LRU cache of prepared statements of a connection keyed by SQL text.
+
+    A cursor takes a statement out of the cache while it uses it and puts
+    it back when it executes another query or is closed, so a statement
+    is never shared by two cursors.  The cache does no network I/O, the
+    statements returned by put() and clear() are to be dropped by the
+    caller.
+
+    `generation` changes when the connection is reconnected, statements
+    prepared before that are not valid any more and are discarded.
+
+    The RowDecoder of the SELECT statements prepared recently is kept
+    by SQL text even if the cache is disabled, the first op_fetch of the
+    SQL can be sent before the response of its prepare.
+    """
+    max_decoders = 64
+
+    def __init__(self, size=0):
+        self.size = size
+        self._statements = collections.OrderedDict()
+        self._decoders = collections.OrderedDict()
+        self.generation = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def __len__(self):
+        return len(self._statements)
+
+    def __iter__(self):
+        return iter(list(self._statements.values()))
+
+    def __contains__(self, sql):
+        return sql in self._statements
+
+    def take(self, sql):
+        "Remove and return the statement of sql, None if it is not cached"
+        if self.size <= 0:
+            return None
+        stmt = self._statements.pop(sql, None)
+        if stmt is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return stmt
+
+    def put(self, sql, stmt):
+        "Put back stmt, return the statements evicted"
+        if stmt.cache_generation != self.generation:
+            return []
+        if self.size <= 0:
+            return [stmt]
+        evicted = []
+        previous = self._statements.pop(sql, None)
+        if previous is not None:
+            # another cursor prepared the same SQL meanwhile
+            evicted.append(previous)
+        self._statements[sql] = stmt
+        while len(self._statements) > self.size:
+            evicted.append(self._statements.popitem(last=False)[1])
+        self.evictions += len(evicted)
+        return evicted
+
+    def decoder(self, sql):
+        "RowDecoder of the SELECT statement sql prepared last, None if not known"
+        decoder = self._decoders.get(sql)
+        if decoder is not None:
+            self._decoders.move_to_end(sql)
+        return decoder
+
+    def set_decoder(self, sql, decoder):
+        self._decoders[sql] = decoder
+        self._decoders.move_to_end(sql)
+        while len(self._decoders) > self.max_decoders:
+            self._decoders.popitem(last=False)
+
+    def clear(self):
+        "Remove and return all the statements, forget the decoders (metadata may change)"
+        statements = list(self._statements.values())
+        self._statements.clear()
+        self._decoders.clear()
+        return statements
+
+    def reset(self):
+        "Forget all the statements, their handles are gone with the connection"
+        self._statements.clear()
+        self._decoders.clear()
+        self.generation += 1
+
+
+class Described:
+    """Output descriptors of a prepared statement: the statement type,
+    the XSQLVAR list and the compiled RowDecoder (its output BLR).  They
+    are shared by the statements of all the connections and must not be
+    modified.  `describe` is the response of the describe items they
+    were built from."""
+    __slots__ = ('describe', 'stmt_type', 'xsqlda', 'decoder')
+
+    def __init__(self, describe, stmt_type, xsqlda, decoder):
+        self.describe = describe
+        self.stmt_type = stmt_type
+        self.xsqlda = xsqlda
+        self.decoder = decoder
+
+
+class DescribeCache:
+    """Process wide LRU cache of Described by (database, SQL text, charset,
+    protocol version), so the connections preparing the same SQL share
+    one copy of the descriptors instead of parsing and compiling them
+    each time.
+
+    The wire protocol has no schema version, the describe response is
+    the version of the metadata a statement depends on: an entry is used
+    only if the new response is the same bytes as the one it was built
+    from.  DDL executed by a connection of the process drops the entries
+    of its database by invalidate().
+
+    The describe buffer length needed by a statement whose columns did
+    not fit in the prepare response is kept by the same key, the next
+    prepare asks all of them at once.
+    """
+    def __init__(self, size=1024):
+        self.size = size
+        self._entries = collections.OrderedDict()
+        self._buffer_lengths = collections.OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, key, describe):
+        "Described of key if it was built from describe, None if not"
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry.describe == describe:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry
+            self.misses += 1
+            return None
+
+    def put(self, key, entry):
+        if self.size <= 0:
+            return
+        with self._lock:
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.size:
+                self._entries.popitem(last=False)
+
+    def buffer_length(self, key):
+        "Describe buffer length learned for key, None for the default"
+        with self._lock:
+            return self._buffer_lengths.get(key)
+
+    def set_buffer_length(self, key, buffer_length):
+        with self._lock:
+            self._buffer_lengths[key] = buffer_length
+            self._buffer_lengths.move_to_end(key)
+            while len(self._buffer_lengths) > self.size:
+                self._buffer_lengths.popitem(last=False)
+
+    def invalidate(self, database):
+        "Drop the entries of database, its metadata is changed"
+        with self._lock:
+            for key in [k for k in self._entries if k[0] == database]:
+                del self._entries[key]
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._buffer_lengths.clear()
+
+
+describe_cache = DescribeCache()
@@ -26,8 +26,11 @@
 # Python DB-API 2.0 module for Firebird.
 ##############################################################################
 import socket
+import select
 import zlib
 
+from firebirdsql.err import OperationalError
+
 try:
     import fcntl
 except ImportError:
@@ -42,7 +45,16 @@ else:
         fcntl.fcntl(fd, fcntl.F_SETFD, flags | fcntl.FD_CLOEXEC)
 
 
+# Initial size of the receive buffer.  It grows when a single read needs more.
+RECV_BUFFER_SIZE = 65536
+
+
 class SocketStream(object):
+    """Socket wrapper with a reusable receive buffer.
+
+    Received data is decrypted/decompressed into ``_rbuf`` and consumed
+    through the read cursor ``_rpos``; ``_wpos`` is the write cursor.
+    """
     def __init__(self, host, port, timeout=None, cloexec=False):
         self._sock = socket.create_connection((host, port), timeout)
         if cloexec:
@@ -53,7 +65,11 @@ class SocketStream(object):
         self.write_translator = None
         self._compressor = None
         self._decompressor = None
-        self._recv_buf = b''
+        self._rbuf = bytearray(RECV_BUFFER_SIZE)
+        self._rview = memoryview(self._rbuf)
+        self._rpos = 0
+        self._wpos = 0
+        self.received = 0   # total bytes appended to the buffer
 
     def enable_compression(self):
         """Enable zlib wire compression for the stream.
@@ -61,25 +77,117 @@ class SocketStream(object):
         """
         self._compressor = zlib.compressobj()
         self._decompressor = zlib.decompressobj()
-        self._recv_buf = b''
 
-    def recv(self, nbytes):
-        if self._decompressor:
-            while len(self._recv_buf) < nbytes:
+    @property
+    def buffered(self):
+        "Number of received bytes not consumed yet"
+        return self._wpos - self._rpos
+
+    @property
+    def consumed(self):
+        "Total number of received bytes consumed"
+        return self.received - (self._wpos - self._rpos)
+
+    def _reserve(self, nbytes):
+        "Make room for at least nbytes after the write cursor."
+        if len(self._rbuf) - self._wpos >= nbytes:
+            return
+        unread = self._wpos - self._rpos
+        if len(self._rbuf) - unread >= nbytes:
+            # compact: move unread data to the head of the buffer
+            self._rbuf[:unread] = self._rbuf[self._rpos:self._wpos]
+        else:
+            # grow: old views stay valid, they keep the old buffer alive
+            buf = bytearray(max(len(self._rbuf) * 2, unread + nbytes))
+            buf[:unread] = self._rview[self._rpos:self._wpos]
+            self._rbuf = buf
+            self._rview = memoryview(buf)
+        self._rpos = 0
+        self._wpos = unread
+
+    def _append_received(self, n):
+        "n raw bytes were received at the write cursor"
+        if self.read_translator:
+            self._rbuf[self._wpos:self._wpos + n] = self.read_translator.decrypt(
+                self._rview[self._wpos:self._wpos + n])
+        self._wpos += n
+        self.received += n
+        return n
+
+    def _decompress(self, b):
+        "Decrypt and decompress received bytes b"
+        if self.read_translator:
+            b = self.read_translator.decrypt(b)
+        return self._decompressor.decompress(b)
+
+    def _append_compressed(self, b):
+        "Decrypt and decompress received bytes b into the buffer"
+        return self._append(self._decompress(b))
+
+    def _append(self, b):
+        "Append decoded bytes b to the buffer"
+        n = len(b)
+        self._reserve(n)
+        self._rbuf[self._wpos:self._wpos + n] = b
+        self._wpos += n
+        self.received += n
+        return n
+
+    def _recv_more(self, nbytes, timeout=None):
+        """Receive at least one chunk from the socket into the buffer.
+        Return the number of bytes appended, 0 means the peer closed.
+        """
+        if timeout is not None and select.select([self._sock], [], [], timeout)[0] == []:
+            raise TimeoutError("Pakcet recv timeout error")
+        n = 0
+        while not n:
+            if self._decompressor:
                 b = self._sock.recv(max(nbytes, 8192))
                 if not b:
-                    break
-                if self.read_translator:
-                    b = self.read_translator.decrypt(b)
-                self._recv_buf += self._decompressor.decompress(b)
-            result = self._recv_buf[:nbytes]
-            self._recv_buf = self._recv_buf[nbytes:]
-            return result
-        else:
-            b = self._sock.recv(nbytes)
-            if self.read_translator:
-                b = self.read_translator.decrypt(b)
-            return b
+                    return 0
+                n = self._append_compressed(b)
+            else:
+                self._reserve(max(nbytes, 8192))
+                n = self._sock.recv_into(self._rview[self._wpos:])
+                if not n:
+                    return 0
+                self._append_received(n)
+        return n
+
+    def _fill(self, nbytes, timeout=None):
+        "Buffer at least nbytes of unread data."
+        while self._wpos - self._rpos < nbytes:
+            if not self._recv_more(nbytes - (self._wpos - self._rpos), timeout):
+                raise OperationalError('Can not recv() packets')
+
+    def buffer(self):
+        "Return (memoryview, read cursor, write cursor) of the receive buffer"
+        return self._rview, self._rpos, self._wpos
+
+    def consume(self, pos):
+        "Move the read cursor to pos, an offset returned by buffer()"
+        self._rpos = pos
+
+    def fill_more(self, timeout=None):
+        "Receive more data, buffer() positions are invalidated."
+        if not self._recv_more(1, timeout):
+            raise OperationalError('Can not recv() packets')
+
+    def read(self, nbytes, timeout=None, padding=0):
+        """Read exactly nbytes and skip following padding bytes.
+        """
+        self._fill(nbytes + padding, timeout)
+        pos = self._rpos
+        self._rpos += nbytes + padding
+        return bytes(self._rview[pos:pos + nbytes])
+
+    def recv(self, nbytes):
+        if self._rpos == self._wpos:
+            self._rpos = self._wpos = 0
+            if not self._recv_more(nbytes):
+                return b''
+        n = min(nbytes, self._wpos - self._rpos)
+        return self.read(n)
 
     def send(self, b):
         if self._compressor:
@@ -90,6 +198,10 @@ class SocketStream(object):
         while (n < len(b)):
             n += self._sock.send(b[n:])
 
+    def flush(self):
+        "send() writes at once"
+        pass
+
     def close(self):
         self._sock.close()
 
@@ -10,6 +10,12 @@ from firebirdsql.tests.test_chacha import *     # noqa
 from firebirdsql.tests.test_auth import *       # noqa
 from firebirdsql.tests.test_srp import *        # noqa
 from firebirdsql.tests.test_utils import *      # noqa
+from firebirdsql.tests.test_xsqlvar import *    # noqa
+from firebirdsql.tests.test_fetchsize import *  # noqa
+from firebirdsql.tests.test_blob import *       # noqa
+from firebirdsql.tests.test_stmtcache import *  # noqa
+from firebirdsql.tests.test_batch import *      # noqa
+from firebirdsql.tests.test_params import *     # noqa
 
 if sys.version_info[0] > 2:
     from firebirdsql.tests.test_async import *  # noqa
@@ -0,0 +1,172 @@
+import asyncio
+import os
+import socket
+import unittest
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+from firebirdsql import chacha
+from firebirdsql.err import OperationalError
+from firebirdsql.aio.stream import AsyncSocketStream
+
+
+class TestAsyncSocketStream(unittest.TestCase):
+    """AsyncSocketStream connected to a local socket standing for the server."""
+
+    def setUp(self):
+        self.listener = socket.socket()
+        self.listener.bind(('127.0.0.1', 0))
+        self.listener.listen(1)
+        self.loop = asyncio.new_event_loop()
+        self.executor = ThreadPoolExecutor(1)
+        # cleanups run last in, first out: the streams are closed before the loop
+        self.addCleanup(self.loop.close)
+        self.addCleanup(self.loop.run_until_complete, asyncio.sleep(0))
+        self.addCleanup(self.executor.shutdown)
+        self.addCleanup(self.listener.close)
+
+    def _connect(self, **kwargs):
+        stream = AsyncSocketStream(
+            '127.0.0.1', self.listener.getsockname()[1], self.loop, None, False, **kwargs)
+        server, _ = self.listener.accept()
+        self.loop.run_until_complete(stream.start())
+        self.addCleanup(stream.close)
+        self.addCleanup(server.close)
+        return stream, server
+
+    def _read(self, stream, nbytes):
+        return self.loop.run_until_complete(stream.async_read(nbytes))
+
+    def test_offload_decrypt(self):
+        key, nonce = os.urandom(32), os.urandom(12)
+        stream, server = self._connect(offload_threshold=4096, executor=self.executor)
+        stream.set_translator(chacha.ChaCha20(key, nonce), None)
+        encrypt = chacha.ChaCha20(key, nonce)
+        data = os.urandom(200000)
+        server.sendall(encrypt.translate(data[:100]))
+        self.assertEqual(self._read(stream, 100), data[:100])
+        self.assertEqual(stream.offloaded, 0)
+        server.sendall(encrypt.translate(data[100:]))
+        self.assertEqual(self._read(stream, len(data) - 100), data[100:])
+        self.assertGreater(stream.offloaded, 0)
+        self.assertGreater(stream.offloaded_bytes, 4096)
+        self.assertLess(stream.offloaded_bytes, len(data))
+        self.assertLess(stream.inline_seconds, 1.0)
+
+    def test_offload_decompress(self):
+        key, nonce = os.urandom(32), os.urandom(12)
+        stream, server = self._connect(offload_threshold=1, executor=self.executor)
+        stream.enable_compression()
+        stream.set_translator(chacha.ChaCha20(key, nonce), None)
+        encrypt = chacha.ChaCha20(key, nonce)
+        compressor = zlib.compressobj()
+        data = [os.urandom(n) for n in (10, 70000, 3, 50000)]
+        for b in data:
+            server.sendall(encrypt.translate(compressor.compress(b) + compressor.flush(zlib.Z_SYNC_FLUSH)))
+        for b in data:
+            self.assertEqual(self._read(stream, len(b)), b)
+        self.assertGreater(stream.offloaded, 0)
+        self.assertEqual(stream.max_inline_seconds, 0.0)
+
+    def test_inline(self):
+        key, nonce = os.urandom(32), os.urandom(12)
+        stream, server = self._connect()
+        stream.set_translator(chacha.ChaCha20(key, nonce), None)
+        data = os.urandom(100000)
+        server.sendall(chacha.ChaCha20(key, nonce).translate(data))
+        self.assertEqual(self._read(stream, len(data)), data)
+        self.assertEqual(stream.offloaded, 0)
+        self.assertGreater(stream.inline_seconds, 0.0)
+        self.assertGreaterEqual(stream.inline_seconds, stream.max_inline_seconds)
+
+    def test_wait_for_nbytes(self):
+        stream, server = self._connect()
+        server.sendall(b'abc')
+        self.loop.call_later(0.05, server.sendall, b'defg')
+        self.assertEqual(self._read(stream, 6), b'abcdef')
+        self.assertEqual(self.loop.run_until_complete(stream.async_recv(10)), b'g')
+        server.close()
+        with self.assertRaises(OperationalError):
+            self._read(stream, 1)
+
+    def test_flow_control(self):
+        stream, server = self._connect()
+        stream.read_high_water = 65536
+        server.setblocking(False)
+        data = os.urandom(1024 * 1024)
+        sent = 0
+
+        async def fill():
+            nonlocal sent
+            # the socket buffers fill up once the stream stops reading
+            while sent < len(data):
+                try:
+                    sent += server.send(data[sent:sent + 65536])
+                except BlockingIOError:
+                    if stream._reading_paused:
+                        return
+                await asyncio.sleep(0.01)
+        self.loop.run_until_complete(asyncio.wait_for(fill(), 5))
+        self.assertTrue(stream._reading_paused)
+        self.assertLess(stream.buffered, len(data))
+
+        async def send_rest():
+            nonlocal sent
+            while sent < len(data):
+                try:
+                    sent += server.send(data[sent:sent + 65536])
+                except BlockingIOError:
+                    await asyncio.sleep(0.01)
+        task = self.loop.create_task(send_rest())
+        self.assertEqual(self._read(stream, len(data)), data)
+        self.loop.run_until_complete(task)
+
+    def test_send(self):
+        key, nonce = os.urandom(32), os.urandom(12)
+        stream, server = self._connect()
+        stream.set_translator(None, chacha.ChaCha20(key, nonce))
+        data = os.urandom(100000)
+        stream.send(data[:10])
+        stream.send(data[10:])
+        self.loop.run_until_complete(stream.drain())
+        server.setblocking(False)
+        received = b''
+        while len(received) < len(data):
+            received += self.loop.run_until_complete(self.loop.sock_recv(server, 65536))
+        self.assertEqual(chacha.ChaCha20(key, nonce).translate(received), data)
+
+    def test_coalesce(self):
+        key, nonce = os.urandom(32), os.urandom(12)
+        stream, server = self._connect()
+        stream.enable_compression()
+        stream.set_translator(None, chacha.ChaCha20(key, nonce))
+        writes = []
+        write = stream._transport.write
+        stream._transport.write = lambda b: (writes.append(b), write(b))
+        packets = [os.urandom(n) for n in (16, 4, 100, 12)]
+        for b in packets[:3]:
+            stream.send(b)
+        self.assertEqual(writes, [])
+        self.loop.run_until_complete(asyncio.sleep(0))
+        self.assertEqual(len(writes), 1)
+        stream.send(packets[3])
+        stream.flush()
+        self.assertEqual(len(writes), 2)
+        decrypt, decompressor = chacha.ChaCha20(key, nonce), zlib.decompressobj()
+        self.assertEqual(b''.join(decompressor.decompress(decrypt.translate(b)) for b in writes), b''.join(packets))
+
+    def test_flush_before_read(self):
+        stream, server = self._connect()
+        stream.send(b'ping')
+        # written by the read, not by the end of the loop iteration
+        stream._flush_handle.cancel()
+
+        async def echo():
+            server.setblocking(False)
+            await self.loop.sock_sendall(server, await self.loop.sock_recv(server, 4))
+        task = self.loop.create_task(echo())
+        self.assertEqual(self._read(stream, 4), b'ping')
+        self.loop.run_until_complete(task)
+
+
+if __name__ == '__main__':
+    unittest.main()
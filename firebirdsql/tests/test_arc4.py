@@ -1,4 +1,5 @@
 import unittest
+from firebirdsql import arc4
 from firebirdsql.arc4 import ARC4
 
 
@@ -10,3 +11,18 @@ class TestArc4(unittest.TestCase):
         a2 = ARC4.new(b'a key')
         plain = a2.translate(enc)
         self.assertEqual(plain, b'plain text')
+
+    def test_known_answers(self):
+        for key, plain, enc in (
+            (b'Key', b'Plaintext', 'bbf316e8d940af0ad3'),
+            (b'Wiki', b'pedia', '1021bf0420'),
+            (b'Secret', b'Attack at dawn', '45a01f645fc35b383552544b9bf5'),
+        ):
+            self.assertEqual(ARC4(key).translate(plain).hex(), enc)
+            a = ARC4(key)
+            self.assertEqual((a.translate(plain[:2]) + a.translate(b'') + a.translate(plain[2:])).hex(), enc)
+
+    @unittest.skipIf(arc4._ARC4Algorithm is None, "cryptography is not installed")
+    def test_cryptography(self):
+        data = bytes(range(256)) * 20
+        self.assertEqual(arc4.CryptographyARC4(b'a key').translate(data), ARC4(b'a key').translate(data))
@@ -1,5 +1,6 @@
 from __future__ import with_statement
 import sys
+import io
 import datetime
 from decimal import Decimal
 import firebirdsql
@@ -526,3 +527,235 @@ class TestBasic(TestBase):
                 "error should not be the generic internal error fallback")
             self.assertIn("proc error message", err_msg,
                 "error should contain the actual Firebird exception message")
+
+    def test_prefetch(self):
+        cur = self.connection.cursor()
+        cur.execute("CREATE TABLE prefetch_test (a INTEGER, b VARCHAR(20), c DATE)")
+        self.connection.commit()
+        for i in range(1000):
+            cur.execute(
+                "insert into prefetch_test (a, b, c) values (?, ?, ?)",
+                (i, str(i) if i % 7 else None, datetime.date(2020, 1, 1) + datetime.timedelta(days=i)))
+        self.connection.commit()
+
+        cur.execute("select a, b, c from prefetch_test order by a")
+        expected = cur.fetchall()
+        self.assertEqual(len(expected), 1000)
+
+        cur.prefetch_depth = 2
+        cur.execute("select a, b, c from prefetch_test order by a")
+        rows = []
+        for r in cur:
+            rows.append(r)
+            if r[0] == 500:
+                # another request while fetches are in flight
+                cur2 = self.connection.cursor()
+                cur2.execute("select count(*) from prefetch_test")
+                self.assertEqual(cur2.fetchone()[0], 1000)
+                cur2.close()
+        self.assertEqual(rows, expected)
+
+        cur.execute("select a, b from prefetch_test order by a")
+        rows = cur.fetchmany(10)
+        columns = cur.fetch_columns()
+        self.assertEqual(rows + list(zip(*[
+            [None if is_null else v for v, is_null in zip(values, nulls)] for values, nulls in columns
+        ])), [r[:2] for r in expected])
+        cur.close()
+
+    def test_blob_lazy(self):
+        cur = self.connection.cursor()
+        cur.execute("CREATE TABLE blob_lazy_test (a INTEGER, b BLOB SUB_TYPE 0)")
+        self.connection.commit()
+        data = bytes(range(256)) * 1000
+        cur.execute("insert into blob_lazy_test (a, b) values (1, ?)", (data, ))
+        cur.execute("insert into blob_lazy_test (a, b) values (2, NULL)")
+
+        cur.blob_mode = 'lazy'
+        cur.execute("select a, b from blob_lazy_test order by a")
+        rows = cur.fetchall()
+        self.assertEqual(rows[1], (2, None))
+        reader = rows[0][1]
+        self.assertEqual(reader.total_length(), len(data))
+        self.assertEqual(reader.read(10), data[:10])
+        self.assertEqual(reader.seek(-5, 2), len(data) - 5)
+        self.assertEqual(reader.read(), data[-5:])
+        reader.seek(1000)
+        buf = bytearray(300)
+        self.assertEqual(reader.readinto(buf), 300)
+        self.assertEqual(bytes(buf), data[1000:1300])
+        reader.seek(0)
+        self.assertEqual(b''.join(reader), data)
+        reader.close()
+        cur.close()
+
+    def test_statement_cache(self):
+        self.connection.statement_cache.size = 10
+        cache = self.connection.statement_cache
+        self.connection.execute_immediate("insert into foo(a, b) values (1, 'a')")
+        self.connection.execute_immediate("insert into foo(a, b) values (2, 'b')")
+        cur = self.connection.cursor()
+        for i in range(3):
+            cur.execute("select count(*) from foo")
+            self.assertEqual(cur.fetchone(), (2, ))
+            cur.execute("select a from foo where a=?", (1, ))
+            self.assertEqual(cur.fetchall(), [(1, )])
+        self.assertEqual((cache.misses, cache.hits), (2, 4))
+
+        # another cursor, after the end of the transaction
+        self.connection.commit()
+        cur2 = self.connection.cursor()
+        cur2.execute("select count(*) from foo")
+        self.assertEqual(cur2.fetchone(), (2, ))
+        self.assertEqual(cache.hits, 5)
+
+        # DDL drops cached statements
+        cur2.execute("CREATE TABLE statement_cache_test (a INTEGER)")
+        self.assertEqual(len(cache), 0)
+        self.connection.commit()
+        cur2.execute("DROP TABLE statement_cache_test")
+        self.connection.commit()
+        cur.close()
+        cur2.close()
+
+    def test_statement_handle_reuse(self):
+        cur = self.connection.cursor()
+        cur.execute("select count(*) from foo")
+        self.assertEqual(cur.fetchone(), (0, ))
+        handle = cur.stmt.handle
+        cur.execute("select count(*) from bar_empty")
+        self.assertEqual(cur.fetchone(), (0, ))
+        if self.connection.accept_version >= PROTOCOL_VERSION13:
+            # unprepared and reused
+            self.assertEqual(cur.stmt.handle, handle)
+        cur.close()
+        cur = self.connection.cursor()
+        cur.execute("insert into foo(a, b) values (1, 'a')")
+        self.assertEqual(cur.rowcount, 1)
+        cur.close()
+
+    def test_executemany(self):
+        cur = self.connection.cursor()
+        rows = [(i, 'b%d' % i) for i in range(1000)]
+        cur.batch_buffer_size = 4096
+        cur.executemany("insert into foo(a, b) values (?, ?)", rows)
+        self.assertEqual(cur.rowcount, 1000)
+        self.assertEqual(cur.rowcounts, [1] * 1000)
+        cur.execute("select count(*) from foo")
+        self.assertEqual(cur.fetchone(), (1000, ))
+
+        # b is unique
+        rows = [(2000, 'x'), (2001, 'b1'), (2002, 'y')]
+        with self.assertRaises(firebirdsql.IntegrityError):
+            cur.executemany("insert into foo(a, b) values (?, ?)", rows)
+        self.assertEqual([i for i, e in cur.batch_errors], [1])
+        cur.batch_continue_on_error = True
+        cur.executemany("insert into foo(a, b) values (?, ?)", [(3000, 'b2'), (3001, 'z')])
+        self.assertEqual(cur.rowcounts, [BATCH_EXECUTE_FAILED, 1])
+        self.assertEqual([i for i, e in cur.batch_errors], [0])
+        self.assertIsInstance(cur.batch_errors[0][1], firebirdsql.IntegrityError)
+        self.assertEqual(cur.rowcount, 1)
+        cur.close()
+
+    def test_executemany_pipelined(self):
+        cur = self.connection.cursor()
+        # rows are sent ahead by op_execute before Firebird 4
+        cur.executemany_depth = 8
+        cur.executemany("insert into foo(a, b) values (?, ?)", [(i, 'b%d' % i) for i in range(100)])
+        self.assertEqual(cur.rowcount, 100)
+        cur.executemany("update foo set a = a + 1 where a < ?", [(10, ), (20, )])
+        self.assertEqual(cur.rowcounts, [10, 20])
+        # no row after the failed one takes effect
+        rows = [(i, 'c%d' % i) for i in range(20)]
+        rows[10] = (10, 'c5')
+        with self.assertRaises(firebirdsql.IntegrityError):
+            cur.executemany("insert into foo(a, b) values (?, ?)", rows)
+        self.assertEqual(cur.batch_errors[0][0], 10)
+        cur.execute("select count(*) from foo where b starting with 'c'")
+        self.assertEqual(cur.fetchone()[0], 10)
+        cur.close()
+
+    def test_track_rowcount(self):
+        cur = self.connection.cursor()
+        cur.execute("insert into foo(a, b) values (1, 'x')")
+        self.assertEqual(cur.rowcount, 1)
+        cur.track_rowcount = False
+        cur.execute("update foo set b = 'y' where a = 1")
+        self.assertEqual(cur.rowcount, -1)
+        cur.executemany("update foo set b = ? where a = 1", [('z', ), ('w', )])
+        self.assertEqual(cur.rowcount, -1)
+        self.assertEqual(cur.rowcounts, [BATCH_SUCCESS_NO_INFO, BATCH_SUCCESS_NO_INFO])
+        cur.close()
+
+    def test_execute_unprepared(self):
+        cur = self.connection.cursor()
+        cur.execute("insert into foo(a, b) values (1, 'x')")
+        self.assertEqual(cur.rowcount, 1)
+        for i in range(2):
+            # the first fetch is sent with the execute the second time
+            cur.execute("select a, b from foo where a = 1")
+            self.assertEqual(cur.fetchall(), [(1, 'x')])
+        with self.assertRaises(firebirdsql.IntegrityError):
+            cur.execute("insert into foo(a, b) values (1, 'y')")
+        cur.execute("select count(*) from foo")
+        self.assertEqual(cur.fetchone(), (1, ))
+        cur.close()
+
+    def test_execute_unprepared_blob(self):
+        cur = self.connection.cursor()
+        cur.execute("CREATE TABLE blob_unprepared_test (a INTEGER, b BLOB SUB_TYPE 0)")
+        self.connection.commit()
+        cur.close()
+        data = bytes(range(256)) * 1000
+        # the first statement of a connection, no statement handle to reuse
+        with firebirdsql.connect(
+            auth_plugin_name=self.auth_plugin_name,
+            wire_crypt=self.wire_crypt,
+            host=self.host,
+            database=self.database,
+            port=self.port,
+            user=self.user,
+            password=self.password,
+        ) as conn:
+            with conn.cursor() as cur:
+                cur.execute("insert into blob_unprepared_test (a, b) values (1, ?)", (data, ))
+                self.assertEqual(cur.rowcount, 1)
+                cur.execute("select a, b from blob_unprepared_test")
+                self.assertEqual(cur.fetchall(), [(1, data)])
+
+    def test_pipeline(self):
+        with self.connection.pipeline() as p:
+            r1 = p.execute("insert into foo(a, b) values (?, ?)", (101, 'p1'))
+            r2 = p.execute("insert into foo(a, b) values (?, ?)", (101, 'p2'))
+            r3 = p.execute("update foo set b = ? where a = ?", ('p3', 101))
+            p.commit()
+        self.assertEqual(r1.result(), 1)
+        # a = 101 is the primary key
+        self.assertRaises(firebirdsql.IntegrityError, r2.result)
+        self.assertEqual(r3.result(), 1)
+
+        with self.assertRaises(firebirdsql.IntegrityError):
+            with self.connection.pipeline() as p:
+                p.execute("insert into foo(a, b) values (?, ?)", (101, 'p4'))
+        with self.assertRaises(firebirdsql.ProgrammingError):
+            with self.connection.pipeline() as p:
+                p.execute("select * from foo")
+
+        cur = self.connection.cursor()
+        cur.execute("select b from foo where a = 101")
+        self.assertEqual(cur.fetchall(), [('p3', )])
+        cur.close()
+
+    def test_blob_stream_parameter(self):
+        cur = self.connection.cursor()
+        cur.execute("CREATE TABLE blob_stream_test (a INTEGER, b BLOB SUB_TYPE 0)")
+        self.connection.commit()
+        data = bytes(range(256)) * 1000
+        cur.execute("insert into blob_stream_test (a, b) values (1, ?)", (io.BytesIO(data), ))
+        cur.execute(
+            "insert into blob_stream_test (a, b) values (2, ?)",
+            (iter([data[i:i+1000] for i in range(0, len(data), 1000)]), ))
+        cur.execute("insert into blob_stream_test (a, b) values (3, ?)", (memoryview(data), ))
+        cur.execute("select b from blob_stream_test order by a")
+        self.assertEqual(cur.fetchall(), [(data, ), (data, ), (data, )])
+        cur.close()
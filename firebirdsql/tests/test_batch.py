@@ -0,0 +1,146 @@
+import collections
+import io
+import unittest
+from firebirdsql.consts import *    # noqa
+from firebirdsql.err import IntegrityError
+from firebirdsql.fbcore import ConnectionResponseMixin, Cursor, Transaction
+from firebirdsql.wireprotocol import WireProtocol, BatchBuffer
+
+
+def _protocol():
+    p = WireProtocol()
+    p.charset = 'UTF8'
+    p.accept_version = PROTOCOL_VERSION16
+    return p
+
+
+class TestBatchBuffer(unittest.TestCase):
+    def test_row(self):
+        p = _protocol()
+        self.assertEqual(
+            p._batch_row([1, 'ab', None]),
+            [(bytes([8, 0]), bytes([0, 0, 0, 1])), (bytes([14, 2, 0]), b'ab\x00\x00'), (None, b'')]
+        )
+        # BLOB values are not sent by a batch
+        self.assertIsNone(p._batch_row([1, io.BytesIO(b'abc')]))
+        self.assertIsNone(p._batch_row([1, b'x' * (MAX_CHAR_LENGTH + 1)]))
+
+    def test_merge(self):
+        p = _protocol()
+        buf = BatchBuffer()
+        self.assertTrue(buf.add(p._batch_row([1, 'a', None])))
+        self.assertTrue(buf.add(p._batch_row([2, 'abc', 3])))
+        self.assertTrue(buf.add(p._batch_row([2 ** 40, None, 4])))
+        self.assertEqual(buf.types, [bytes([16, 0]), bytes([37, 3, 0]), bytes([8, 0])])
+        self.assertEqual(len(buf), 3)
+        self.assertEqual(
+            buf.blr(),
+            bytes([5, 2, 4, 0, 6, 0, 16, 0, 7, 0, 37, 3, 0, 7, 0, 8, 0, 7, 0, 255, 76])
+        )
+        # bigint 0-8, NULL indicator 8-10, varchar 10-15, 16-18, integer 20-24, 24-26
+        self.assertEqual(BatchBuffer.message_length(buf.types), 26)
+        self.assertEqual(buf.messages(), [
+            bytes([4, 0, 0, 0]) + bytes([0] * 7 + [1]) + bytes([0, 0, 0, 1]) + b'a\x00\x00\x00',
+            bytes([0, 0, 0, 0]) + bytes([0] * 7 + [2]) + bytes([0, 0, 0, 3]) + b'abc\x00' + bytes([0, 0, 0, 3]),
+            bytes([2, 0, 0, 0]) + bytes([0, 0, 1, 0, 0, 0, 0, 0]) + bytes([0, 0, 0, 4]),
+        ])
+        # the format of a column can't be changed to others
+        self.assertFalse(buf.add(p._batch_row([1, 1.5, 1])))
+        self.assertFalse(buf.add(p._batch_row([1, 'a'])))
+        self.assertEqual(len(buf), 3)
+
+    def test_buffer_size(self):
+        p = _protocol()
+        row = p._batch_row([1, 2])
+        buf = BatchBuffer(BatchBuffer.message_length([t for t, v in row]) * 2)
+        self.assertTrue(buf.add(row))
+        self.assertTrue(buf.add(row))
+        self.assertFalse(buf.add(row))
+        self.assertEqual(len(buf), 2)
+
+
+class _Statement(object):
+    handle = 1
+    param_encoders = None
+    stmt_type = isc_info_sql_stmt_insert
+    _is_open = False
+
+
+class _PipelinedConnection(ConnectionResponseMixin, WireProtocol):
+    """Execute the rows of executemany() sent ahead by op_execute, the
+    rows of `fail` fail and the rows of `fail_once` fail the first time"""
+    def __init__(self, fail=(), fail_once=()):
+        self.fail = set(fail)
+        self.fail_once = set(fail_once)
+        self.accept_type = ptype_lazy_send
+        self.executed = []      # rows taking effect
+        self.savepoint = None
+        self.responses = collections.deque()
+        self._pending_responses = collections.deque()
+        self._cursors = {}
+
+    def _op_exec_immediate(self, trans_handle, query):
+        if query.startswith('SAVEPOINT '):
+            self.savepoint = len(self.executed)
+        elif query.startswith('ROLLBACK TO '):
+            del self.executed[self.savepoint:]
+        self.responses.append((0, bytes(8), b''))
+
+    def _op_execute(self, stmt_handle, trans_handle, params, param_encoders):
+        (row, ) = params
+        if row in self.fail or row in self.fail_once:
+            self.fail_once.discard(row)
+            self.responses.append(IntegrityError('row %d' % row))
+        else:
+            self.executed.append(row)
+            self.responses.append((0, bytes(8), b''))
+
+    def _recv_response(self):
+        r = self.responses.popleft()
+        if isinstance(r, Exception):
+            raise r
+        return r
+
+
+class TestExecutePipelined(unittest.TestCase):
+    def _cursor(self, connection):
+        transaction = Transaction(connection)
+        transaction._trans_handle = 1
+        cur = Cursor(transaction)
+        cur.track_rowcount = False
+        cur.executemany_depth = 4
+        return cur
+
+    def test_stop_at_error(self):
+        connection = _PipelinedConnection(fail=[5])
+        cur = self._cursor(connection)
+        with self.assertRaises(IntegrityError):
+            cur._execute_pipelined(_Statement(), [(i, ) for i in range(8)])
+        # rows after the failed one don't take effect
+        self.assertEqual(connection.executed, [0, 1, 2, 3, 4])
+        self.assertEqual(cur.rowcounts, [BATCH_SUCCESS_NO_INFO] * 5 + [BATCH_EXECUTE_FAILED])
+        self.assertEqual([i for i, e in cur.batch_errors], [5])
+        connection._recv_pending()
+        self.assertFalse(connection.responses)
+
+    def test_retry_succeeds(self):
+        connection = _PipelinedConnection(fail_once=[2])
+        cur = self._cursor(connection)
+        cur._execute_pipelined(_Statement(), [(i, ) for i in range(8)])
+        self.assertEqual(connection.executed, list(range(8)))
+        self.assertEqual(cur.rowcounts, [BATCH_SUCCESS_NO_INFO] * 8)
+        self.assertEqual(cur.batch_errors, [])
+        connection._recv_pending()
+        self.assertFalse(connection.responses)
+
+    def test_continue_on_error(self):
+        connection = _PipelinedConnection(fail=[2, 5])
+        cur = self._cursor(connection)
+        cur.batch_continue_on_error = True
+        cur._execute_pipelined(_Statement(), [(i, ) for i in range(8)])
+        self.assertEqual(connection.executed, [0, 1, 3, 4, 6, 7])
+        self.assertEqual([i for i, e in cur.batch_errors], [2, 5])
+
+
+if __name__ == "__main__":
+    unittest.main()
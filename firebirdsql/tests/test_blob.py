@@ -0,0 +1,190 @@
+import collections
+import io
+import struct
+import unittest
+from firebirdsql.consts import *    # noqa
+from firebirdsql.err import DatabaseError
+from firebirdsql.fbcore import SegmentAssembler, BlobReader, ConnectionResponseMixin
+from firebirdsql.wireprotocol import WireProtocol
+
+
+def _segments(*segments):
+    "op_get_segment response buffer"
+    return b''.join(struct.pack('<H', len(s)) + s for s in segments)
+
+
+class TestSegmentAssembler(unittest.TestCase):
+    def test_small_blob(self):
+        info = {
+            isc_info_blob_num_segments: 1,
+            isc_info_blob_max_segment: 3,
+            isc_info_blob_total_length: 3,
+        }
+        assembler = SegmentAssembler(info)
+        self.assertEqual(assembler.buffer_length, 5)
+        self.assertEqual(assembler.requests(), 1)
+        self.assertEqual(assembler.requests(), 0)
+        assembler.feed(2, _segments(b'abc'))
+        self.assertTrue(assembler.eof)
+        self.assertEqual(assembler.requests(), 0)
+        self.assertEqual(assembler.value(), b'abc')
+
+    def test_pipelined(self):
+        data = bytes(range(256)) * 1000
+        info = {
+            isc_info_blob_num_segments: 8,
+            isc_info_blob_max_segment: 32000,
+            isc_info_blob_total_length: len(data),
+        }
+        sink = io.BytesIO()
+        assembler = SegmentAssembler(info, 1000, sink)
+        assembler.append(data[1000:2000])
+        n = assembler.requests()
+        self.assertEqual(assembler.buffer_length, BLOB_GET_SEGMENT_LENGTH)
+        self.assertEqual(n, BLOB_SEGMENT_REQUESTS)
+
+        pos = 2000
+        while assembler.in_flight:
+            b = data[pos:pos + 32000]
+            pos += len(b)
+            assembler.feed(2 if pos == len(data) else 0, _segments(b) if b else b'')
+            assembler.requests()
+        self.assertEqual(sink.getvalue(), data[1000:])
+        self.assertEqual(assembler.length, len(data) - 1000)
+
+
+def _info(item, value):
+    return bytes([item]) + struct.pack('<H', 4) + struct.pack('<I', value)
+
+
+class _StreamBlobConnection(object):
+    "Answer the requests of a BlobReader on a stream BLOB of data"
+    def __init__(self, data):
+        self.data = data
+        self.pos = 0
+        self.requests = []
+        self.response = None
+
+    def _op_open_blob2(self, blob_id, trans_handle):
+        self.requests.append('open')
+        self.response = (1, bytes(8), b'')
+
+    def _op_info_blob(self, blob_handle, items):
+        self.requests.append('info')
+        self.response = (0, bytes(8), (
+            _info(isc_info_blob_num_segments, 1) + _info(isc_info_blob_max_segment, 0) +
+            _info(isc_info_blob_total_length, len(self.data)) + _info(isc_info_blob_type, 1) +
+            bytes([isc_info_end])))
+
+    def _op_seek_blob(self, blob_handle, mode, offset):
+        self.requests.append(('seek', mode, offset))
+        self.pos = offset
+        # the position is returned in the lower word of the BLOB id
+        self.response = (0, struct.pack('>ii', 0, offset), b'')
+
+    def _op_get_segment(self, blob_handle, buffer_length):
+        self.requests.append('get_segment')
+        b = self.data[self.pos:self.pos + 1000]
+        self.pos += len(b)
+        self.response = (2 if self.pos == len(self.data) else 0, bytes(8), _segments(b) if b else b'')
+
+    def _op_response(self):
+        return self.response
+
+
+class _Transaction(object):
+    trans_handle = 1
+
+    def __init__(self, connection):
+        self.connection = connection
+
+
+class TestBlobReader(unittest.TestCase):
+    def test_stream_blob_seek(self):
+        data = bytes(range(256)) * 100
+        connection = _StreamBlobConnection(data)
+        reader = BlobReader(_Transaction(connection), bytes(8))
+        self.assertEqual(reader.read(10), data[:10])
+        self.assertEqual(reader.seek(5000), 5000)
+        self.assertEqual(reader.tell(), 5000)
+        self.assertIn(('seek', blb_seek_from_head, 5000), connection.requests)
+        self.assertEqual(reader.read(10), data[5000:5010])
+        self.assertEqual(reader.tell(), 5010)
+        self.assertEqual(reader.seek(-5, 2), len(data) - 5)
+        self.assertEqual(reader.read(), data[-5:])
+        self.assertEqual(reader.seek(100), 100)
+        self.assertEqual(reader.read(3), data[100:103])
+
+
+class _BlobWriterConnection(ConnectionResponseMixin, WireProtocol):
+    "Answer the requests of WireProtocol._create_blob(), op_batch_segments number `fail` fails"
+    def __init__(self, fail=None):
+        self.fail = fail
+        self.requests = []
+        self.responses = collections.deque()
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self._pending_responses = collections.deque()
+
+    def _op_create_blob2(self, trans_handle):
+        self.requests.append('create')
+        self.responses.append(('create', (1, bytes(8), b'')))
+
+    def _op_batch_segments(self, blob_handle, segments):
+        self.requests.append('segments')
+        self.in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        if self.requests.count('segments') == self.fail:
+            self.responses.append(('segments', DatabaseError('segment')))
+        else:
+            self.responses.append(('segments', (0, bytes(8), b'')))
+
+    def _op_cancel_blob(self, blob_handle):
+        self.requests.append('cancel')
+        self.responses.append(('cancel', (0, bytes(8), b'')))
+
+    def _op_close_blob(self, blob_handle):
+        self.requests.append('close')
+        self.responses.append(('close', (0, bytes(8), b'')))
+
+    def _recv_response(self):
+        request, r = self.responses.popleft()
+        if request == 'segments':
+            self.in_flight -= 1
+        if isinstance(r, Exception):
+            raise r
+        return r
+
+
+class TestCreateBlob(unittest.TestCase):
+    def test_create(self):
+        connection = _BlobWriterConnection()
+        connection._create_blob(1, bytes(BLOB_BATCH_LENGTH * 20))
+        self.assertEqual(connection.requests[-1], 'close')
+        self.assertEqual(connection.max_in_flight, BLOB_SEGMENT_REQUESTS)
+        self.assertFalse(connection.responses)
+
+    def test_segment_error(self):
+        connection = _BlobWriterConnection(fail=3)
+        with self.assertRaises(DatabaseError):
+            connection._create_blob(1, bytes(BLOB_BATCH_LENGTH * 20))
+        self.assertEqual(connection.requests[-1], 'cancel')
+        self.assertNotIn('close', connection.requests)
+        self.assertFalse(connection.responses)
+        self.assertFalse(connection._pending_responses)
+
+    def test_source_error(self):
+        def chunks():
+            for i in range(5):
+                yield bytes(BLOB_BATCH_LENGTH)
+            raise ValueError('source')
+        connection = _BlobWriterConnection()
+        with self.assertRaises(ValueError):
+            connection._create_blob(1, chunks())
+        self.assertEqual(connection.requests[-1], 'cancel')
+        self.assertFalse(connection.responses)
+        self.assertFalse(connection._pending_responses)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -1,5 +1,6 @@
 import unittest
 from firebirdsql import utils
+from firebirdsql import chacha
 from firebirdsql.chacha import ChaCha20
 
 
@@ -17,3 +18,46 @@ class TestChaCha(unittest.TestCase):
         chacha2 = ChaCha20(key, nonce, 123)
         plain = chacha2.translate(enc)
         self.assertEqual(plain, b'plain text')
+
+    def test_rfc7539(self):
+        # RFC 7539 2.4.2
+        key = bytes(range(32))
+        nonce = utils.hex_to_bytes("000000000000004a00000000")
+        plain = (
+            b"Ladies and Gentlemen of the class of '99: If I could offer you only one tip for the future, "
+            b"sunscreen would be it."
+        )
+        enc = utils.hex_to_bytes(
+            "6e2e359a2568f98041ba0728dd0d6981e97e7aec1d4360c20a27afccfd9fae0b"
+            "f91b65c5524733ab8f593dabcd62b3571639d624e65152ab8f530c359f0861d8"
+            "07ca0dbf500d6a6156a38e088a22b65e52bc514d16ccf806818ce91ab7793736"
+            "5af90bbf74a35be6b40b8eedf2785e42874d"
+        )
+        self.assertEqual(ChaCha20(key, nonce, 1).translate(plain), enc)
+        # translated in pieces across the blocks
+        c = ChaCha20(key, nonce, 1)
+        self.assertEqual(b''.join(c.translate(plain[i:i+7]) for i in range(0, len(plain), 7)), enc)
+
+    def test_counter_carry(self):
+        # 64 bit counter of ChaCha64 goes over 32 bits
+        key, nonce = bytes(range(32)), bytes(8)
+        c = ChaCha20(key, nonce, 0xffffffff)
+        keystream = c.translate(bytes(64 * 3))
+        self.assertEqual(keystream[64:], ChaCha20(key, nonce, 0x100000000).translate(bytes(64 * 2)))
+        self.assertNotEqual(keystream[64:128], ChaCha20(key, nonce, 0).translate(bytes(64)))
+
+    def test_large(self):
+        key, nonce = bytes(range(32)), bytes(range(8))
+        data = bytes(range(256)) * 300
+        enc = ChaCha20(key, nonce).translate(data)
+        c = ChaCha20(key, nonce)
+        self.assertEqual(b''.join(c.translate(data[i:i+1000]) for i in range(0, len(data), 1000)), enc)
+        self.assertEqual(ChaCha20(key, nonce).translate(enc), data)
+
+    @unittest.skipIf(chacha.algorithms is None, "cryptography is not installed")
+    def test_cryptography(self):
+        key, data = bytes(range(32)), bytes(range(256)) * 20
+        for nonce in (bytes(range(8)), bytes(range(12))):
+            self.assertEqual(
+                chacha.CryptographyChaCha20(key, nonce).translate(data), ChaCha20(key, nonce).translate(data)
+            )
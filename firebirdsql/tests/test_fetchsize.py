@@ -0,0 +1,35 @@
+import unittest
+from firebirdsql.consts import *    # noqa
+from firebirdsql.fetchsize import FetchSizer
+from firebirdsql.tests.test_xsqlvar import _xsqlvar
+
+
+class TestFetchSizer(unittest.TestCase):
+    def setUp(self):
+        self.xsqlda = [_xsqlvar(SQL_TYPE_LONG), _xsqlvar(SQL_TYPE_VARYING, 100)]
+
+    def test_row_width(self):
+        sizer = FetchSizer(self.xsqlda)
+        # header 12, NULL bitmap 4, LONG 4, VARYING 4 + 100
+        self.assertEqual(sizer.row_width, 124)
+        sizer.record(10, 400)
+        self.assertEqual(sizer.row_width, 40)
+
+    def test_fetch_count(self):
+        sizer = FetchSizer(self.xsqlda, initial_count=100)
+        latency, seconds_per_byte = 0.01, 1e-7
+        for i in range(6):
+            n = sizer.fetch_count()
+            sizer.record(n, n * 40, latency + n * 40 * seconds_per_byte)
+        # transfer of a batch takes about 4 times of the latency
+        self.assertEqual(list(sizer.sizes)[:3], [100, 200, 800])
+        self.assertAlmostEqual(sizer.sizes[-1], 10000, delta=1)
+
+    def test_memory_budget(self):
+        sizer = FetchSizer(self.xsqlda + [_xsqlvar(SQL_TYPE_BLOB, 8)])
+        self.assertEqual(sizer.fetch_count(memory_budget=sizer.row_memory * 10), 10)
+        self.assertEqual(sizer.fetch_count(min_count=20, memory_budget=sizer.row_memory * 10), 20)
+
+
+if __name__ == "__main__":
+    unittest.main()
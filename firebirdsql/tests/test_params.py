@@ -0,0 +1,52 @@
+import datetime
+import decimal
+import unittest
+from firebirdsql.consts import *    # noqa
+from firebirdsql.wireprotocol import WireProtocol, ParamEncoder
+
+
+def _protocol(version):
+    p = WireProtocol()
+    p.charset = 'UTF8'
+    p.accept_version = version
+    return p
+
+
+class TestParamEncoder(unittest.TestCase):
+    rows = [
+        (1, -1, 0x7FFFFFFF, -0x80000000, 0x80000000, -0x80000001, 2 ** 63 - 1),
+        ('', 'a', 'abcd', 'abcde', 'あ', b'xyz', bytearray(b'12345'), memoryview(b'ab')),
+        (decimal.Decimal('1.23'), decimal.Decimal('-0.001'), decimal.Decimal('100'), decimal.Decimal('0')),
+        (1.5, -2.25, float('inf'), 0.0),
+        (datetime.date(2024, 2, 29), datetime.time(12, 34, 56, 789000), datetime.datetime(1999, 12, 31, 23, 59, 59)),
+        (True, False, None, None, 1, None, None, None, None, 'x'),
+        ([1, 2], None),
+    ]
+
+    def test_same_as_params_to_blr(self):
+        for version in (PROTOCOL_VERSION12, PROTOCOL_VERSION13):
+            p = _protocol(version)
+            encoders = {}
+            for params in self.rows:
+                for i in range(2):
+                    self.assertEqual(
+                        p.params_to_blr(None, params, encoders),
+                        p.params_to_blr(None, params),
+                        (version, params)
+                    )
+            self.assertEqual(len(encoders), len(self.rows))
+
+    def test_blr_cache(self):
+        encoder = ParamEncoder((int, bytes), PROTOCOL_VERSION13)
+        p = _protocol(PROTOCOL_VERSION13)
+        blr1, values1 = encoder.encode(p, None, (1, b'ab'))
+        blr2, values2 = encoder.encode(p, None, (2, b'cd'))
+        self.assertIs(blr1, blr2)
+        self.assertEqual(values2, bytes([0, 0, 0, 0]) + bytes([0, 0, 0, 2]) + b'cd\x00\x00')
+        blr3, values3 = encoder.encode(p, None, (2 ** 40, b'abc'))
+        self.assertEqual(blr3, bytes([5, 2, 4, 0, 4, 0, 16, 0, 7, 0, 14, 3, 0, 7, 0, 255, 76]))
+        self.assertEqual(len(encoder._blr), 2)
+
+
+if __name__ == "__main__":
+    unittest.main()
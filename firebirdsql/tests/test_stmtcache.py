@@ -0,0 +1,152 @@
+import struct
+import unittest
+from firebirdsql.consts import *    # noqa
+from firebirdsql.fbcore import Statement
+from firebirdsql.stmtcache import StatementCache, DescribeCache, Described, describe_cache
+
+
+class _Statement(object):
+    def __init__(self, cache):
+        self.cache_generation = cache.generation
+
+
+class TestStatementCache(unittest.TestCase):
+    def test_lru(self):
+        cache = StatementCache(2)
+        a, b, c = _Statement(cache), _Statement(cache), _Statement(cache)
+        self.assertIsNone(cache.take('a'))
+        self.assertEqual(cache.put('a', a), [])
+        self.assertEqual(cache.put('b', b), [])
+        self.assertIs(cache.take('a'), a)
+        self.assertEqual(cache.put('a', a), [])
+        # 'b' is the least recently used
+        self.assertEqual(cache.put('c', c), [b])
+        self.assertEqual(list(cache), [a, c])
+        self.assertEqual((cache.hits, cache.misses, cache.evictions), (1, 1, 1))
+
+    def test_same_sql(self):
+        cache = StatementCache(2)
+        a1, a2 = _Statement(cache), _Statement(cache)
+        cache.put('a', a1)
+        # prepared by another cursor meanwhile
+        self.assertEqual(cache.put('a', a2), [a1])
+        self.assertIs(cache.take('a'), a2)
+        self.assertIsNone(cache.take('a'))
+
+    def test_disabled(self):
+        cache = StatementCache(0)
+        a = _Statement(cache)
+        self.assertEqual(cache.put('a', a), [a])
+        self.assertIsNone(cache.take('a'))
+        self.assertEqual((cache.hits, cache.misses, cache.evictions), (0, 0, 0))
+
+    def test_clear_and_reset(self):
+        cache = StatementCache(4)
+        a, b = _Statement(cache), _Statement(cache)
+        cache.put('a', a)
+        self.assertEqual(cache.clear(), [a])
+        self.assertEqual(len(cache), 0)
+        cache.put('a', a)
+        cache.reset()
+        self.assertEqual(len(cache), 0)
+        # prepared before reconnect, handles are gone
+        self.assertEqual(cache.put('b', b), [])
+        self.assertNotIn('b', cache)
+        c = _Statement(cache)
+        cache.put('c', c)
+        self.assertIs(cache.take('c'), c)
+
+    def test_decoders(self):
+        cache = StatementCache(0)
+        cache.max_decoders = 2
+        cache.set_decoder('a', 'A')
+        cache.set_decoder('b', 'B')
+        self.assertEqual(cache.decoder('a'), 'A')
+        # 'b' is the least recently used
+        cache.set_decoder('c', 'C')
+        self.assertIsNone(cache.decoder('b'))
+        self.assertEqual(cache.decoder('c'), 'C')
+        cache.clear()
+        self.assertIsNone(cache.decoder('a'))
+
+
+class TestDescribeCache(unittest.TestCase):
+    def test_describe_check(self):
+        cache = DescribeCache(2)
+        db1, db2 = ('localhost', 3050, 'a.fdb'), ('localhost', 3050, 'b.fdb')
+        d = Described(b'describe', 1, [], None)
+        cache.put((db1, 'select 1', 'UTF8', 13), d)
+        self.assertIs(cache.get((db1, 'select 1', 'UTF8', 13), memoryview(b'describe')), d)
+        # metadata is changed
+        self.assertIsNone(cache.get((db1, 'select 1', 'UTF8', 13), b'described'))
+        self.assertIsNone(cache.get((db1, 'select 1', 'NONE', 13), b'describe'))
+        self.assertEqual((cache.hits, cache.misses), (1, 2))
+
+        cache.put((db2, 'select 1', 'UTF8', 13), d)
+        cache.invalidate(db1)
+        self.assertEqual(len(cache), 1)
+        self.assertIs(cache.get((db2, 'select 1', 'UTF8', 13), b'describe'), d)
+
+    def test_size(self):
+        cache = DescribeCache(2)
+        for sql in ('a', 'b', 'c'):
+            cache.put(sql, Described(b'', 2, [], None))
+        self.assertEqual(len(cache), 2)
+        self.assertIsNone(cache.get('a', b''))
+        cache = DescribeCache(0)
+        cache.put('a', Described(b'', 2, [], None))
+        self.assertEqual(len(cache), 0)
+
+
+class _Connection(object):
+    charset = 'UTF8'
+    accept_version = PROTOCOL_VERSION13
+
+    def _database_key(self):
+        return ('localhost', 3050, 'describe.fdb')
+
+
+class _Transaction(object):
+    connection = _Connection()
+
+
+def _describe_char(charset_id, length):
+    "Describe response of a SELECT of a CHAR column"
+    items = [
+        bytes([isc_info_sql_sqlda_seq]) + struct.pack('<HI', 4, 1),
+        bytes([isc_info_sql_type]) + struct.pack('<HI', 4, SQL_TYPE_TEXT + 1),
+        bytes([isc_info_sql_sub_type]) + struct.pack('<HI', 4, charset_id),
+        bytes([isc_info_sql_length]) + struct.pack('<HI', 4, length),
+        bytes([isc_info_sql_describe_end]),
+    ]
+    return (
+        bytes([isc_info_sql_stmt_type]) + struct.pack('<HI', 4, isc_info_sql_stmt_select) +
+        bytes([isc_info_sql_select, isc_info_sql_describe_vars]) + struct.pack('<HI', 4, 1) +
+        b''.join(items) + bytes([isc_info_end])
+    )
+
+
+class TestDescribed(unittest.TestCase):
+    def setUp(self):
+        self.addCleanup(describe_cache.invalidate, _Connection()._database_key())
+
+    def _prepare(self, describe):
+        stmt = Statement.__new__(Statement)
+        stmt.trans = _Transaction()
+        stmt.handle = 1
+        stmt._prepared('select c from t', describe)
+        return stmt
+
+    def test_same_blr(self):
+        # CHAR(16) CHARACTER SET OCTETS altered to CHAR(4) CHARACTER SET UTF8
+        octets = self._prepare(_describe_char(1, 16))
+        utf8 = self._prepare(_describe_char(4, 16))
+        self.assertEqual(octets.decoder.blr, utf8.decoder.blr)
+        # the first fetch sent with the decoder of the last prepare is fetched again
+        self.assertIsNot(octets.decoder, utf8.decoder)
+        self.assertIs(self._prepare(_describe_char(4, 16)).decoder, utf8.decoder)
+        self.assertEqual([x.sqlsubtype for x in utf8.xsqlda], [4])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -1,8 +1,36 @@
 import unittest
 from firebirdsql import utils
+from firebirdsql.err import InternalError
 from firebirdsql.tests.base import *    # noqa
 
 
+def _bint_to_bytes(val, nbytes):
+    "byte by byte implementation to compare with"
+    v = abs(val)
+    b = []
+    for n in range(nbytes):
+        b.append((v >> (8 * (nbytes - n - 1)) & 0xff))
+    if val < 0:
+        for i in range(nbytes):
+            b[i] = ~b[i] + 256
+        b[-1] += 1
+        for i in range(nbytes):
+            if b[nbytes - i - 1] == 256:
+                b[nbytes - i - 1] = 0
+                b[nbytes - i - 2] += 1
+    return bytes(b)
+
+
+def _bytes_to_bint(b, u=False):
+    "byte by byte implementation to compare with"
+    n = 0
+    for c in b:
+        n = (n << 8) | c
+    if not u and b[0] & 0x80:
+        n -= 1 << (len(b) * 8)
+    return n
+
+
 class TestUtils(unittest.TestCase):
     def test_hex(self):
         s = b'37313243354638413244423832343634433444363430414539373130323541413530414236343930364434463034344638323245384146384135384144414242444245314546414241303042434344344344414138413935354243343343333630304245414239454242394244343141434335364533374631413438463137323933463234453837364235334545413641363037313244334639343337363930353642363332303234313638323742343030453136324138433039333844343832323734333037353835453042433144394444353245464137333330423238453431423743464345464439453835323346443131343430454535444539334138'
@@ -26,3 +54,24 @@ class TestUtils(unittest.TestCase):
         self.assertEqual(utils.parse_dsn("localhost/dir/dbname"), ("localhost", 3050, "/dir/dbname", None, None))
         self.assertEqual(utils.parse_dsn("localhost/c:\\fbdata\\database.fdb"), ("localhost", 3050, "c:\\fbdata\\database.fdb", None, None))
         self.assertEqual(utils.parse_dsn("localhost/c:/fbdata/database.fdb"), ("localhost", 3050, "c:/fbdata/database.fdb", None, None))
+
+    def test_int_conversion(self):
+        for nbytes in (1, 2, 3, 4, 5, 7, 8, 16):
+            bits = nbytes * 8
+            values = [
+                0, 1, -1, -2, 255, 0x1234 & ((1 << bits) - 1),
+                (1 << (bits - 1)) - 1, -(1 << (bits - 1)), (1 << bits) - 1,
+            ]
+            for v in values:
+                b = utils.bint_to_bytes(v, nbytes)
+                self.assertEqual(b, _bint_to_bytes(v, nbytes), (v, nbytes))
+                self.assertEqual(utils.int_to_bytes(v, nbytes), b[::-1], (v, nbytes))
+                self.assertEqual(utils.bytes_to_bint(b), _bytes_to_bint(b), (v, nbytes))
+                self.assertEqual(utils.bytes_to_bint(b, u=True), _bytes_to_bint(b, u=True), (v, nbytes))
+                self.assertEqual(utils.bytes_to_int(b[::-1]), _bytes_to_bint(b), (v, nbytes))
+                self.assertEqual(utils.bytes_to_uint(b[::-1]), _bytes_to_bint(b, u=True), (v, nbytes))
+        # INT128 with the high bit of the lower half set
+        b = bytes([0] * 7 + [1] + [0xff] * 8)
+        self.assertEqual(utils.bytes_to_bint(b), (1 << 65) - 1)
+        self.assertEqual(utils.bytes_to_bint(memoryview(b'\xff\xfe')), -2)
+        self.assertRaises(InternalError, utils.bytes_to_bint, b'')
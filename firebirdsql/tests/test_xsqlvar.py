@@ -0,0 +1,209 @@
+import unittest
+import datetime
+import decimal
+import struct
+from firebirdsql.consts import *    # noqa
+from firebirdsql.xsqlvar import XSQLVAR, RowDecoder, ColumnBuilder, DescribeContinuation, parse_select_items
+from firebirdsql.tests.base import *    # noqa
+
+
+def _xsqlvar(sqltype, sqllen=4, sqlscale=0):
+    x = XSQLVAR(lambda b: str(b, 'utf_8'))
+    x.sqltype = sqltype
+    x.sqllen = sqllen
+    x.sqlscale = sqlscale
+    x.sqlsubtype = 0
+    return x
+
+
+class TestRowDecoder(unittest.TestCase):
+    def setUp(self):
+        self.xsqlda = [
+            _xsqlvar(SQL_TYPE_LONG),
+            _xsqlvar(SQL_TYPE_VARYING, 10),
+            _xsqlvar(SQL_TYPE_INT64, 8, -2),
+            _xsqlvar(SQL_TYPE_TIMESTAMP, 8),
+            _xsqlvar(SQL_TYPE_TEXT, 5),
+            _xsqlvar(SQL_TYPE_BOOLEAN, 1),
+        ]
+        self.raw = [
+            struct.pack('>i', -123),
+            'abc'.encode('utf_8'),
+            struct.pack('>q', 12345),
+            struct.pack('>ii', 58849, 36000000),
+            b'xyz  ',
+            b'\x01',
+        ]
+        self.expected = [
+            -123,
+            'abc',
+            decimal.Decimal('123.45'),
+            datetime.datetime(2020, 1, 1, 1, 0, 0),
+            'xyz',
+            True,
+        ]
+
+    def _pad(self, b):
+        return b + b'\x00' * (-len(b) & 3)
+
+    def _value(self, x, b):
+        if x.sqltype == SQL_TYPE_VARYING:
+            return struct.pack('>i', len(b)) + self._pad(b)
+        return self._pad(b)
+
+    def test_value(self):
+        for x, b, v in zip(self.xsqlda, self.raw, self.expected):
+            self.assertEqual(x.value(b), v)
+
+    def test_null_bitmap(self):
+        decoder = RowDecoder(self.xsqlda, PROTOCOL_VERSION13)
+        buf = b'\x00\x00\x00\x00' + b''.join(self._value(x, b) for x, b in zip(self.xsqlda, self.raw))
+        self.assertEqual(decoder.decode(buf, 0, len(buf)), (self.expected, len(buf)))
+
+        # 2nd and 5th columns are NULL
+        buf = b'\x12\x00\x00\x00' + b''.join(
+            self._value(x, b) for i, (x, b) in enumerate(zip(self.xsqlda, self.raw)) if i not in (1, 4))
+        expected = list(self.expected)
+        expected[1] = expected[4] = None
+        self.assertEqual(decoder.decode(buf, 0, len(buf)), (expected, len(buf)))
+
+        # incomplete row
+        self.assertEqual(decoder.decode(buf, 0, len(buf) - 1), (None, 0))
+
+    def test_null_indicator(self):
+        decoder = RowDecoder(self.xsqlda, PROTOCOL_VERSION13 - 1)
+        buf = b''.join(
+            self._value(x, b) + (b'\xff\xff\xff\xff' if i == 1 else b'\x00\x00\x00\x00')
+            for i, (x, b) in enumerate(zip(self.xsqlda, self.raw)))
+        expected = list(self.expected)
+        expected[1] = None
+        self.assertEqual(decoder.decode(buf, 0, len(buf)), (expected, len(buf)))
+        self.assertEqual(decoder.decode(buf, 0, len(buf) - 4), (None, 0))
+
+
+class TestColumnBuilder(unittest.TestCase):
+    def setUp(self):
+        self.xsqlda = [
+            _xsqlvar(SQL_TYPE_LONG),
+            _xsqlvar(SQL_TYPE_DATE),
+            _xsqlvar(SQL_TYPE_DOUBLE, 8),
+            _xsqlvar(SQL_TYPE_INT64, 8, -2),
+        ]
+        self.rows = [
+            (1, 58849, 0.5, 12345),
+            (2, None, 1.5, None),
+            (None, 58850, 2.5, -1),
+        ]
+        self.expected = [
+            [1, 2, None],
+            [datetime.date(2020, 1, 1), None, datetime.date(2020, 1, 2)],
+            [0.5, 1.5, 2.5],
+            [decimal.Decimal('123.45'), None, decimal.Decimal('-0.01')],
+        ]
+
+    def _packet(self, row, protocol_version):
+        "op_fetch_response packet of the row and the op code of the next packet"
+        fmts = ['i', 'i', 'd', 'q']
+        b = struct.pack('>ii', 0, 1)    # status, count
+        if protocol_version >= PROTOCOL_VERSION13:
+            null_bitmap = sum(1 << i for i, v in enumerate(row) if v is None)
+            b += struct.pack('<I', null_bitmap)
+            for fmt, v in zip(fmts, row):
+                if v is not None:
+                    b += struct.pack('>' + fmt, v)
+        else:
+            for fmt, v in zip(fmts, row):
+                b += struct.pack('>' + fmt + 'i', v or 0, -1 if v is None else 0)
+        return b + struct.pack('>i', 66)
+
+    def _columns(self, builder):
+        return [
+            [None if is_null else v for v, is_null in zip(values, nulls)]
+            for values, nulls in builder.columns()
+        ]
+
+    def test_append_packed(self):
+        for protocol_version in (PROTOCOL_VERSION13 - 1, PROTOCOL_VERSION13):
+            builder = ColumnBuilder(RowDecoder(self.xsqlda, protocol_version, columnar=True))
+            buf = b''.join(self._packet(r, protocol_version) for r in self.rows)
+            pos = builder.append_packed(buf, 0, len(buf), 66)
+            if protocol_version < PROTOCOL_VERSION13:
+                self.assertEqual(pos, len(buf))
+            else:
+                # stops at the 2nd row, it has NULLs
+                self.assertEqual(pos, len(self._packet(self.rows[0], protocol_version)))
+            while pos < len(buf):
+                r, pos = builder.decoder.decode(buf, pos + 8, len(buf))
+                builder.append(r)
+                pos += 4
+            self.assertEqual(builder.count, 3)
+            columns = self._columns(builder)
+            if not isinstance(columns[1][0], datetime.date):    # numpy.datetime64
+                columns[1] = [None if v is None else v.item() for v in columns[1]]
+            self.assertEqual(columns, self.expected)
+
+    def test_append_converted(self):
+        builder = ColumnBuilder(RowDecoder(self.xsqlda, PROTOCOL_VERSION13, columnar=True))
+        for row in zip(*self.expected):
+            builder.append_converted(row)
+        columns = self._columns(builder)
+        self.assertEqual([list(v) for v in columns[0::2]], self.expected[0::2])
+
+
+class _Connection(object):
+    charset = 'UTF8'
+
+
+def _describe_items(start, ncols, length):
+    "Describe items of the columns from start, truncated to length bytes"
+    buf = bytearray()
+    for i in range(start, ncols + 1):
+        name = ('COLUMN_%d' % i).encode()
+        items = [
+            bytes([isc_info_sql_sqlda_seq]) + struct.pack('<HI', 4, i),
+            bytes([isc_info_sql_type]) + struct.pack('<HI', 4, SQL_TYPE_LONG + 1),
+            bytes([isc_info_sql_length]) + struct.pack('<HI', 4, 4),
+            bytes([isc_info_sql_alias]) + struct.pack('<H', len(name)) + name,
+            bytes([isc_info_sql_describe_end]),
+        ]
+        for item in items:
+            if len(buf) + len(item) >= length:
+                return bytes(buf) + bytes([isc_info_truncated])
+            buf += item
+    return bytes(buf) + bytes([isc_info_end])
+
+
+class TestDescribeContinuation(unittest.TestCase):
+    def test_truncated(self):
+        connection = _Connection()
+        xsqlda = [None] * 50
+        next_index = parse_select_items(_describe_items(1, 50, 200), xsqlda, connection)
+        self.assertGreater(next_index, 1)
+        self.assertEqual(xsqlda[next_index-2].aliasname, 'COLUMN_%d' % (next_index - 1))
+
+        more = DescribeContinuation(xsqlda, next_index, 200)
+        requests = more.requests()
+        self.assertEqual(requests[0][0], next_index)
+        rounds = 0
+        while requests:
+            for start, length in requests:
+                head = bytes([isc_info_sql_select, isc_info_sql_describe_vars]) + struct.pack('<HI', 4, 50)
+                more.received(start, head + _describe_items(start, 50, length // 3), connection)
+            requests = more.requests()
+            rounds += 1
+        self.assertEqual([x.aliasname for x in xsqlda], ['COLUMN_%d' % i for i in range(1, 51)])
+        self.assertGreater(rounds, 1)
+        self.assertGreater(more.describe_length, 50 * 20)
+
+    def test_truncated_after_column(self):
+        connection = _Connection()
+        xsqlda = [None] * 3
+        buf = _describe_items(1, 3, 1000)
+        # truncated just after the describe_end of the 2nd column
+        n = buf.index(bytes([isc_info_sql_sqlda_seq, 4, 0, 3, 0, 0, 0]))
+        self.assertEqual(parse_select_items(buf[:n] + bytes([isc_info_truncated]), xsqlda, connection), 3)
+        self.assertEqual(parse_select_items(buf, xsqlda, connection), -1)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -67,70 +67,51 @@ def bytes_to_hex(b):
     return s
 
 
+# struct of fixed width integers by byte length
+_BIG_ENDIAN = {n: struct.Struct('>' + c) for n, c in ((1, 'b'), (2, 'h'), (4, 'l'), (8, 'q'))}
+_BIG_ENDIAN_UNSIGNED = {n: struct.Struct('>' + c) for n, c in ((1, 'B'), (2, 'H'), (4, 'L'), (8, 'Q'))}
+_LITTLE_ENDIAN = {n: struct.Struct('<' + c) for n, c in ((1, 'b'), (2, 'h'), (4, 'l'), (8, 'q'))}
+_LITTLE_ENDIAN_UNSIGNED = {n: struct.Struct('<' + c) for n, c in ((1, 'B'), (2, 'H'), (4, 'L'), (8, 'Q'))}
+_INT32 = _BIG_ENDIAN[4]
+
+
 def bytes_to_bint(b, u=False):           # Read as big endian
-    if u:
-        fmtmap = {1: 'B', 2: '>H', 4: '>L', 8: '>Q'}
-    else:
-        fmtmap = {1: 'b', 2: '>h', 4: '>l', 8: '>q'}
-    fmt = fmtmap.get(len(b))
-    if fmt is None:
-        if len(b) == 16:
-            if u:
-                a, b = struct.unpack('>QQ', b)
-            else:
-                a, b = struct.unpack('>qq', b)
-            return (a << 64) | b
-
-        raise InternalError("Invalid bytes length:%d" % (len(b), ))
-    return struct.unpack(fmt, b)[0]
+    if not u and len(b) == 4:
+        return _INT32.unpack(b)[0]
+    st = (_BIG_ENDIAN_UNSIGNED if u else _BIG_ENDIAN).get(len(b))
+    if st is None:
+        if not b:
+            raise InternalError("Invalid bytes length:%d" % (len(b), ))
+        return int.from_bytes(b, 'big', signed=not u)
+    return st.unpack(b)[0]
 
 
 def bytes_to_int(b):        # Read as little endian.
-    fmtmap = {1: 'b', 2: '<h', 4: '<l', 8: '<q'}
-    fmt = fmtmap.get(len(b))
-    if fmt is None:
-        raise InternalError("Invalid bytes length:%d" % (len(b), ))
-    return struct.unpack(fmt, b)[0]
+    st = _LITTLE_ENDIAN.get(len(b))
+    if st is None:
+        if not b:
+            raise InternalError("Invalid bytes length:%d" % (len(b), ))
+        return int.from_bytes(b, 'little', signed=True)
+    return st.unpack(b)[0]
 
 
 def bytes_to_uint(b):        # Read as little endian unsigned int.
-    fmtmap = {1: 'B', 2: '<H', 4: '<L', 8: '<Q'}
-    fmt = fmtmap.get(len(b))
-    if fmt is None:
-        raise InternalError("Invalid bytes length:%d" % (len(b), ))
-    return struct.unpack(fmt, b)[0]
+    st = _LITTLE_ENDIAN_UNSIGNED.get(len(b))
+    if st is None:
+        if not b:
+            raise InternalError("Invalid bytes length:%d" % (len(b), ))
+        return int.from_bytes(b, 'little')
+    return st.unpack(b)[0]
 
 
 def bint_to_bytes(val, nbytes):     # Convert int value to big endian bytes.
-    v = abs(val)
-    b = []
-    for n in range(nbytes):
-        b.append((v >> (8 * (nbytes - n - 1)) & 0xff))
-    if val < 0:
-        for i in range(nbytes):
-            b[i] = ~b[i] + 256
-        b[-1] += 1
-        for i in range(nbytes):
-            if b[nbytes - i - 1] == 256:
-                b[nbytes - i - 1] = 0
-                b[nbytes - i - 2] += 1
-    return bytes(b)
+    if nbytes == 4 and -0x80000000 <= val <= 0x7FFFFFFF:
+        return _INT32.pack(val)
+    return (val & ((1 << (nbytes * 8)) - 1)).to_bytes(nbytes, 'big')
 
 
 def int_to_bytes(val, nbytes):  # Convert int value to little endian bytes.
-    v = abs(val)
-    b = []
-    for n in range(nbytes):
-        b.append((v >> (8 * n)) & 0xff)
-    if val < 0:
-        for i in range(nbytes):
-            b[i] = ~b[i] + 256
-        b[0] += 1
-        for i in range(nbytes):
-            if b[i] == 256:
-                b[i] = 0
-                b[i+1] += 1
-    return bytes(b)
+    return (val & ((1 << (nbytes * 8)) - 1)).to_bytes(nbytes, 'little')
 
 
 def parse_dsn(dsn, host=None, port=None, database=None, user=None, password=None):
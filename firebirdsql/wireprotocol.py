@@ -31,8 +31,9 @@ import os
 import socket
 import datetime
 import decimal
+import struct
 
-from firebirdsql.err import OperationalError
+from firebirdsql.err import OperationalError, DatabaseError, InternalError
 from firebirdsql.consts import *    # noqa
 from firebirdsql.utils import *     # noqa
 from firebirdsql import srp
@@ -62,6 +63,9 @@ INFO_SQL_SELECT_DESCRIBE_VARS = bytes([
     isc_info_sql_alias,
     isc_info_sql_describe_end])
 
+# largest buffer length of the info requests (a 16 bit value on the server side)
+MAX_INFO_BUFFER_LENGTH = 65535
+
 
 def get_crypt(plain):
     from passlib.hash import des_crypt
@@ -115,25 +119,336 @@ def wire_operation(fn):
     return f
 
 
+_INT = struct.Struct('>i')
+_INT2 = struct.Struct('>ii')
+_INT3 = struct.Struct('>iii')
+_INT4 = struct.Struct('>iiii')
+_PADDING = (b'', b'\0\0\0', b'\0\0', b'\0')
+
+# XDR opaque of BLR and info items, they are sent repeatedly
+_packed_bytes_cache = {}
+
+
+def _packed_bytes(b):
+    r = _packed_bytes_cache.get(b)
+    if r is None:
+        if len(_packed_bytes_cache) >= 256:
+            _packed_bytes_cache.clear()
+        r = _packed_bytes_cache[b] = _INT.pack(len(b)) + b + _PADDING[len(b) & 3]
+    return r
+
+
 class Packer(object):
     def __init__(self):
-        self.buf = b''
+        self.buf = bytearray()
 
     def pack_int(self, v):
-        self.buf += bint_to_bytes(v, 4)
+        if -0x80000000 <= v <= 0x7FFFFFFF:
+            self.buf += _INT.pack(v)
+        else:
+            self.buf += (v & 0xFFFFFFFF).to_bytes(4, 'big')
 
     def pack_bytes(self, v):
         n = len(v)
-        self.buf += bint_to_bytes(n, 4)
-        n = ((n+3)//4)*4
-        self.buf += v + (n - len(v)) * b'\0'
+        self.buf += _INT.pack(n)
+        self.buf += v
+        self.buf += _PADDING[n & 3]
 
     def get_buffer(self):
-        return self.buf
+        return bytes(self.buf)
+
+
+# BLR type: (length of the value in a message, alignment)
+_BLR_TYPE_SIZES = {
+    8: (4, 4),      # blr_long
+    9: (8, 4),      # blr_quad
+    10: (4, 4),     # blr_float
+    12: (4, 4),     # blr_sql_date
+    13: (4, 4),     # blr_sql_time
+    16: (8, 8),     # blr_int64
+    23: (1, 1),     # blr_bool
+    27: (8, 8),     # blr_double
+    28: (8, 4),     # blr_sql_time_tz
+    29: (12, 4),    # blr_timestamp_tz
+    35: (8, 4),     # blr_timestamp
+}
+
+
+class BatchBuffer(object):
+    """Rows sent by an op_batch_msg, they share a message format.
+
+    A row is a list of (BLR, value) of the parameters made by
+    WireProtocol._batch_row().  Text values of a column with different
+    lengths are sent as VARYING of the longest one, and INTEGER values as
+    BIGINT if the column has BIGINT values.
+    """
+    def __init__(self, buffer_size=DEFAULT_BATCH_BUFFER_SIZE):
+        self.buffer_size = buffer_size
+        self.types = None
+        self.rows = []
+
+    def __len__(self):
+        return len(self.rows)
+
+    @staticmethod
+    def _merge_type(a, b):
+        "BLR of a column having values of BLR a and b (None is NULL), False if there is no such one"
+        if a is None or a == b:
+            return b
+        if b is None:
+            return a
+        if a[0] in (14, 37) and b[0] in (14, 37):   # blr_text, blr_varying
+            n = max(a[1] | a[2] << 8, b[1] | b[2] << 8)
+            return bytes([37, n & 255, n >> 8])
+        if {a, b} == {bytes([8, 0]), bytes([16, 0])}:
+            return bytes([16, 0])
+        return False
+
+    @staticmethod
+    def message_length(types):
+        "Length of a message in the server's layout, each value is followed by a NULL indicator"
+        n = 0
+        for t in types:
+            if t is None:
+                length, align = 0, 1
+            elif t[0] == 14:
+                length, align = t[1] | t[2] << 8, 1
+            elif t[0] == 37:
+                length, align = (t[1] | t[2] << 8) + 2, 2
+            else:
+                length, align = _BLR_TYPE_SIZES[t[0]]
+            n = (n + align - 1) // align * align + length
+            n = (n + 1) // 2 * 2 + 2
+        return n
+
+    def add(self, row):
+        "Add the row, return False if it doesn't fit in the format or the buffer"
+        if self.types is None:
+            types = [t for t, v in row]
+        elif len(row) != len(self.types):
+            return False
+        else:
+            types = [self._merge_type(a, b) for a, (b, v) in zip(self.types, row)]
+            if False in types:
+                return False
+            if self.message_length(types) * (len(self.rows) + 1) > self.buffer_size:
+                return False
+        self.types = types
+        self.rows.append(row)
+        return True
+
+    def blr(self):
+        ln = len(self.types) * 2
+        blr = bytes([5, 2, 4, 0, ln & 255, ln >> 8])
+        for t in self.types:
+            blr += (t or bytes([14, 0, 0])) + bytes([7, 0])
+        return blr + bytes([255, 76])    # [blr_end, blr_eoc]
+
+    def messages(self):
+        "Messages of the rows, NULL bitmap and values"
+        n = (len(self.types) + 7) // 8
+        n += (4 - n) & 3
+        r = []
+        for row in self.rows:
+            null_bitmap = 0
+            values = []
+            for i, (t, (b, v)) in enumerate(zip(self.types, row)):
+                if b is None:
+                    null_bitmap |= 1 << i
+                    continue
+                if t != b:
+                    if t[0] == 37:  # text as VARYING
+                        v = bint_to_bytes(b[1] | b[2] << 8, 4) + v
+                    else:           # INTEGER as BIGINT
+                        v = bint_to_bytes(bytes_to_bint(v), 8)
+                values.append(v)
+            r.append(null_bitmap.to_bytes(n, 'little') + b''.join(values))
+        return r
+
+
+_BLR_LONG = bytes([8, 0])
+_BLR_INT64 = bytes([16, 0])
+_BLR_QUAD = bytes([9, 0])
+_BLR_NULL = bytes([14, 0, 0])
+
+
+def _encode_text(protocol, trans_handle, p):
+    nbytes = len(p)
+    if nbytes > MAX_CHAR_LENGTH:
+        return _BLR_QUAD, protocol._create_blob(trans_handle, p)
+    return bytes([14, nbytes & 255, nbytes >> 8]), bytes(p) + bytes((4 - nbytes) & 3)
+
+
+def _encode_str(protocol, trans_handle, p):
+    return _encode_text(protocol, trans_handle, protocol.str_to_bytes(p))
+
+
+def _encode_buffer(protocol, trans_handle, p):
+    return _encode_text(protocol, trans_handle, memoryview(p).cast('B'))
+
+
+def _encode_int(protocol, trans_handle, p):
+    if -0x80000000 <= p <= 0x7FFFFFFF:
+        return _BLR_LONG, _INT.pack(p)
+    return _BLR_INT64, (p & 0xFFFFFFFFFFFFFFFF).to_bytes(8, 'big')
+
+
+def _encode_decimal(protocol, trans_handle, p):
+    (sign, digits, exponent) = p.as_tuple()
+    v = int(''.join(map(str, digits))) if digits else 0
+    if sign:
+        v = -v
+    if exponent < 0:
+        exponent += 256
+    return bytes([16, exponent]), (v & 0xFFFFFFFFFFFFFFFF).to_bytes(8, 'big')
+
+
+def _encode_float(protocol, trans_handle, p):
+    if p == float("inf"):
+        return bytes([10]), b'\x7f\x80\x00\x00'
+    return _encode_decimal(protocol, trans_handle, decimal.Decimal(str(p)))
+
+
+def _encode_date(protocol, trans_handle, p):
+    return bytes([12]), convert_date(p)
+
+
+def _encode_time(protocol, trans_handle, p):
+    if p.tzinfo:
+        return bytes([28]), convert_time_tz(p)
+    return bytes([13]), convert_time(p)
+
+
+def _encode_datetime(protocol, trans_handle, p):
+    if p.tzinfo:
+        return bytes([29]), convert_timestamp_tz(p)
+    return bytes([35]), convert_timestamp(p)
+
+
+def _encode_bool(protocol, trans_handle, p):
+    return bytes([23]), bytes([1, 0, 0, 0]) if p else bytes([0, 0, 0, 0])
+
+
+def _encode_any(protocol, trans_handle, p):
+    return protocol._param_to_blr(trans_handle, p)
+
+
+# Python type: encoder, other types are converted by WireProtocol._param_to_blr()
+_PARAM_ENCODERS = {
+    str: _encode_str,
+    bytes: _encode_text,
+    bytearray: _encode_buffer,
+    memoryview: _encode_buffer,
+    int: _encode_int,
+    float: _encode_float,
+    decimal.Decimal: _encode_decimal,
+    datetime.date: _encode_date,
+    datetime.time: _encode_time,
+    datetime.datetime: _encode_datetime,
+    bool: _encode_bool,
+}
+
+
+class ParamEncoder(object):
+    """Parameter encoder of a statement for a signature, the tuple of the
+    types of the parameters.
+
+    The encoder of each parameter is looked up once.  The BLR depends on
+    the values only by the length of a text, the range of an int and the
+    scale of a Decimal, it is cached by the BLR items of the parameters.
+    """
+    max_blr_count = 64
+
+    def __init__(self, signature, protocol_version):
+        self.signature = signature
+        self.encoders = [_PARAM_ENCODERS.get(t, _encode_any) for t in signature]
+        self.null_indicator = protocol_version < PROTOCOL_VERSION13
+        n = (len(signature) + 7) // 8
+        self.null_bitmap_length = n + ((4 - n) & 3)
+        ln = len(signature) * 2
+        self.blr_header = bytes([5, 2, 4, 0, ln & 255, ln >> 8])
+        self._blr = {}
+
+    def _make_blr(self, items):
+        if len(self._blr) >= self.max_blr_count:
+            self._blr.clear()
+        blr = self._blr[items] = (
+            self.blr_header + b''.join(item + bytes([7, 0]) for item in items) + bytes([255, 76])
+        )
+        return blr
+
+    def encode(self, protocol, trans_handle, params):
+        "Return BLR and values of the parameters like WireProtocol.params_to_blr()"
+        items = []
+        values = []
+        null_bitmap = 0
+        for i, (encoder, p) in enumerate(zip(self.encoders, params)):
+            if p is None:
+                null_bitmap |= 1 << i
+                items.append(_BLR_NULL)
+                if self.null_indicator:
+                    values.append(bytes([0xff, 0xff, 0xff, 0xff]))
+                continue
+            item, v = encoder(protocol, trans_handle, p)
+            items.append(item)
+            values.append(v)
+            if self.null_indicator:
+                values.append(bytes(4))
+        items = tuple(items)
+        blr = self._blr.get(items) or self._make_blr(items)
+        if not self.null_indicator:
+            values.insert(0, null_bitmap.to_bytes(self.null_bitmap_length, 'little'))
+        return blr, b''.join(values)
+
+
+class PendingResponse(object):
+    """Response of a request sent without waiting for it.
+
+    The connection reads the responses in the order the requests were
+    sent, each one by its `reader`, a method name of the connection
+    ('_async' is prefixed on an AsyncConnection) called with `args`.
+    `callback` is called with the result.  The error of a response is
+    raised by the connection when it is read, unless it is `observed`,
+    then it is kept and raised by result().
+    """
+    def __init__(self, reader='_recv_response', args=(), callback=None, owner=None, observed=False, wait=None):
+        self.reader = reader
+        self.args = args
+        self.callback = callback
+        self.owner = owner
+        self.observed = observed
+        self._wait = wait
+        self.done = False
+        self.value = None
+        self.error = None
+        self.retrieved = False
+
+    def set_result(self, value):
+        self.done = True
+        self.value = value
+        if self.callback:
+            self.callback(value)
+
+    def set_error(self, e):
+        self.done = True
+        self.error = e
+
+    def result(self):
+        "Return the result, wait for the response on a blocking connection"
+        if not self.done and self._wait:
+            self._wait(self)
+        if not self.done:
+            raise InternalError("The response is not received yet")
+        self.retrieved = True
+        if self.error:
+            raise self.error
+        return self.value
 
 
 class WireProtocol(object):
     buffer_length = 1024
+    # number of Connection.pipeline() blocks entered
+    _pipelines = 0
 
     op_connect = 1
     op_exit = 2
@@ -151,9 +466,11 @@ class WireProtocol(object):
     op_open_blob = 35
     op_get_segment = 36
     op_put_segment = 37
+    op_cancel_blob = 38
     op_close_blob = 39
     op_info_database = 40
     op_info_transaction = 42
+    op_info_blob = 43
     op_batch_segments = 44
     op_que_events = 48
     op_cancel_events = 49
@@ -162,6 +479,7 @@ class WireProtocol(object):
     op_connect_request = 53
     op_open_blob2 = 56
     op_create_blob2 = 57
+    op_seek_blob = 61
     op_allocate_statement = 62
     op_execute = 63
     op_exec_immediate = 64
@@ -192,6 +510,30 @@ class WireProtocol(object):
     op_crypt = 96
     op_crypt_key_callback = 97
     op_cond_accept = 98
+    op_batch_create = 99
+    op_batch_msg = 100
+    op_batch_exec = 101
+    op_batch_rls = 102
+    op_batch_cs = 103
+
+    @property
+    def lazy_response_count(self):
+        "Number of the responses of the requests sent and not read yet"
+        return len(self._pending_responses)
+
+    def _defers_response(self):
+        """True if the response of a request without a result (free,
+        close) is left to be read with the next one"""
+        ptype = self.accept_type & ptype_MASK
+        return ptype == ptype_lazy_send or (self._pipelines > 0 and ptype >= ptype_batch_send)
+
+    def _defer_response(self, reader='_recv_response', args=(), callback=None, owner=None, observed=False):
+        """Queue the response of the request just sent, it is read before
+        the response of any later request"""
+        # an AsyncConnection can not wait in PendingResponse.result()
+        r = PendingResponse(reader, args, callback, owner, observed, getattr(self, '_wait_response', None))
+        self._pending_responses.append(r)
+        return r
 
     def str_to_bytes(self, s):
         "convert str to bytes"
@@ -200,24 +542,171 @@ class WireProtocol(object):
         return s
 
     def bytes_to_str(self, b):
-        return b.decode(charset_map.get(self.charset, self.charset))
-
-    def _create_blob(self, trans_handle, b):
+        "convert bytes (or a memoryview of them) to str"
+        return str(b, charset_map.get(self.charset, self.charset))
+
+    def _blob_chunks(self, source):
+        "Chunks (bytes like) of a BLOB parameter"
+        if hasattr(source, 'read'):     # file like object
+            while True:
+                chunk = source.read(BLOB_SEGMENT_SIZE)
+                if not chunk:
+                    break
+                yield self.str_to_bytes(chunk)
+        elif hasattr(source, '__next__'):   # iterator of chunks
+            for chunk in source:
+                yield self.str_to_bytes(chunk)
+        else:
+            yield source
+
+    def _blob_batches(self, source):
+        """Lists of segments for op_batch_segments, the source is read
+        as they are sent"""
+        batch, length = [], 0
+        for chunk in self._blob_chunks(source):
+            chunk = memoryview(chunk).cast('B')
+            for i in range(0, len(chunk), BLOB_SEGMENT_SIZE):
+                segment = chunk[i:i+BLOB_SEGMENT_SIZE]
+                if length + len(segment) + 2 > BLOB_BATCH_LENGTH:
+                    yield batch
+                    batch, length = [], 0
+                batch.append(segment)
+                length += len(segment) + 2
+        if batch:
+            yield batch
+
+    def _create_blob(self, trans_handle, source):
+        """Create a BLOB from bytes like object, file like object or iterator
+        of chunks.  Up to BLOB_SEGMENT_REQUESTS op_batch_segments are sent
+        ahead of their responses.  The BLOB is cancelled when a segment is
+        not written or the source raises."""
         self._op_create_blob2(trans_handle)
         (blob_handle, blob_id, buf) = self._op_response()
 
-        i = 0
-        while i < len(b):
-            self._op_put_segment(blob_handle, b[i:i+BLOB_SEGMENT_SIZE])
-            (h, oid, buf) = self._op_response()
-            i += BLOB_SEGMENT_SIZE
+        sent = []
+        try:
+            for segments in self._blob_batches(source):
+                if len(sent) == BLOB_SEGMENT_REQUESTS:
+                    self._recv_pending(sent.pop(0))
+                self._op_batch_segments(blob_handle, segments)
+                sent.append(self._defer_response())
+            self._recv_pending()
+        except Exception:
+            # read the responses left and cancel the BLOB to keep the connection usable
+            try:
+                self._recv_pending()
+            except DatabaseError:
+                pass
+            self._op_cancel_blob(blob_handle)
+            try:
+                self._op_response()
+            except DatabaseError:
+                pass
+            raise
 
         self._op_close_blob(blob_handle)
         (h, oid, buf) = self._op_response()
         return blob_id
 
-    def params_to_blr(self, trans_handle, params):
-        "Convert parameter array to BLR and values format."
+    def _param_to_blr(self, trans_handle, p):
+        "Convert a parameter to BLR (without the NULL indicator) and value."
+        if isinstance(p, str):
+            p = self.str_to_bytes(p)
+        t = type(p)
+        if p is None:
+            v = bytes([])
+            blr = bytes([14, 0, 0])
+        elif t == bytearray or t == memoryview:
+            p = memoryview(p).cast('B')
+            if len(p) > MAX_CHAR_LENGTH:
+                v = self._create_blob(trans_handle, p)
+                blr = bytes([9, 0])
+            else:
+                v = bytes(p)
+                nbytes = len(v)
+                pad_length = ((4-nbytes) & 3)
+                v += bytes([0]) * pad_length
+                blr = bytes([14, nbytes & 255, nbytes >> 8])
+        elif hasattr(p, 'read') or hasattr(p, '__next__'):
+            # file like object or iterator, streamed into a BLOB
+            v = self._create_blob(trans_handle, p)
+            blr = bytes([9, 0])
+        elif t == bytes:
+            if len(p) > MAX_CHAR_LENGTH:
+                v = self._create_blob(trans_handle, p)
+                blr = bytes([9, 0])
+            else:
+                v = p
+                nbytes = len(v)
+                pad_length = ((4-nbytes) & 3)
+                v += bytes([0]) * pad_length
+                blr = bytes([14, nbytes & 255, nbytes >> 8])
+        elif t == int:
+            if p <= 0x7FFFFFFF and p >= -0x80000000:
+                v = bint_to_bytes(p, 4)
+                blr = bytes([8, 0])    # blr_long
+            else:
+                v = bint_to_bytes(p, 8)
+                blr = bytes([16, 0])    # blr_int64
+        elif t == float and p == float("inf"):
+            v = b'\x7f\x80\x00\x00'
+            blr = bytes([10])
+        elif t == decimal.Decimal or t == float:
+            if t == float:
+                p = decimal.Decimal(str(p))
+            (sign, digits, exponent) = p.as_tuple()
+            v = 0
+            ln = len(digits)
+            for i in range(ln):
+                v += digits[i] * (10 ** (ln - i - 1))
+            if sign:
+                v *= -1
+            v = bint_to_bytes(v, 8)
+            if exponent < 0:
+                exponent += 256
+            blr = bytes([16, exponent])
+        elif t == datetime.date:
+            v = convert_date(p)
+            blr = bytes([12])
+        elif t == datetime.time:
+            if p.tzinfo:
+                v = convert_time_tz(p)
+                blr = bytes([28])
+            else:
+                v = convert_time(p)
+                blr = bytes([13])
+        elif t == datetime.datetime:
+            if p.tzinfo:
+                v = convert_timestamp_tz(p)
+                blr = bytes([29])
+            else:
+                v = convert_timestamp(p)
+                blr = bytes([35])
+        elif t == bool:
+            v = bytes([1, 0, 0, 0]) if p else bytes([0, 0, 0, 0])
+            blr = bytes([23])
+        else:   # fallback, convert to string
+            p = p.__repr__()
+            if isinstance(p, str):
+                p = self.str_to_bytes(p)
+            v = p
+            nbytes = len(v)
+            pad_length = ((4-nbytes) & 3)
+            v += bytes([0]) * pad_length
+            blr = bytes([14, nbytes & 255, nbytes >> 8])
+        return blr, v
+
+    def params_to_blr(self, trans_handle, params, encoders=None):
+        """Convert parameter array to BLR and values format.
+        encoders is a dict of ParamEncoder by signature kept by the statement."""
+        if encoders is not None:
+            signature = tuple(map(type, params))
+            encoder = encoders.get(signature)
+            if encoder is None:
+                if len(encoders) >= MAX_PARAM_ENCODERS:
+                    encoders.clear()
+                encoder = encoders[signature] = ParamEncoder(signature, self.accept_version)
+            return encoder.encode(self, trans_handle, params)
         ln = len(params) * 2
         blr = bytes([5, 2, 4, 0, ln & 255, ln >> 8])
         if self.accept_version < PROTOCOL_VERSION13:
@@ -239,82 +728,38 @@ class WireProtocol(object):
                 null_indicator >>= 8
             values = bytes(null_indicator_bytes)
         for p in params:
-            if isinstance(p, str):
-                p = self.str_to_bytes(p)
-            t = type(p)
-            if p is None:
-                v = bytes([])
-                blr += bytes([14, 0, 0])
-            elif t == bytes:
-                if len(p) > MAX_CHAR_LENGTH:
-                    v = self._create_blob(trans_handle, p)
-                    blr += bytes([9, 0])
-                else:
-                    v = p
-                    nbytes = len(v)
-                    pad_length = ((4-nbytes) & 3)
-                    v += bytes([0]) * pad_length
-                    blr += bytes([14, nbytes & 255, nbytes >> 8])
-            elif t == int:
-                if p <= 0x7FFFFFFF and p >= -0x80000000:
-                    v = bint_to_bytes(p, 4)
-                    blr += bytes([8, 0])    # blr_long
-                else:
-                    v = bint_to_bytes(p, 8)
-                    blr += bytes([16, 0])    # blr_int64
-            elif t == float and p == float("inf"):
-                v = b'\x7f\x80\x00\x00'
-                blr += bytes([10])
-            elif t == decimal.Decimal or t == float:
-                if t == float:
-                    p = decimal.Decimal(str(p))
-                (sign, digits, exponent) = p.as_tuple()
-                v = 0
-                ln = len(digits)
-                for i in range(ln):
-                    v += digits[i] * (10 ** (ln - i - 1))
-                if sign:
-                    v *= -1
-                v = bint_to_bytes(v, 8)
-                if exponent < 0:
-                    exponent += 256
-                blr += bytes([16, exponent])
-            elif t == datetime.date:
-                v = convert_date(p)
-                blr += bytes([12])
-            elif t == datetime.time:
-                if p.tzinfo:
-                    v = convert_time_tz(p)
-                    blr += bytes([28])
-                else:
-                    v = convert_time(p)
-                    blr += bytes([13])
-            elif t == datetime.datetime:
-                if p.tzinfo:
-                    v = convert_timestamp_tz(p)
-                    blr += bytes([29])
-                else:
-                    v = convert_timestamp(p)
-                    blr += bytes([35])
-            elif t == bool:
-                v = bytes([1, 0, 0, 0]) if p else bytes([0, 0, 0, 0])
-                blr += bytes([23])
-            else:   # fallback, convert to string
-                p = p.__repr__()
-                if isinstance(p, str):
-                    p = self.str_to_bytes(p)
-                v = p
-                nbytes = len(v)
-                pad_length = ((4-nbytes) & 3)
-                v += bytes([0]) * pad_length
-                blr += bytes([14, nbytes & 255, nbytes >> 8])
-            blr += bytes([7, 0])
+            b, v = self._param_to_blr(trans_handle, p)
+            blr += b + bytes([7, 0])
             values += v
             if self.accept_version < PROTOCOL_VERSION13:
                 values += bytes([0]) * 4 if p is not None else bytes([0xff, 0xff, 0xff, 0xff])
         blr += bytes([255, 76])    # [blr_end, blr_eoc]
         return blr, values
 
+    def _blob_params(self, params):
+        "True if any of the parameters is sent as a BLOB, it costs round trips to create"
+        for p in params:
+            if hasattr(p, 'read') or hasattr(p, '__next__'):
+                return True
+            if isinstance(p, (bytes, bytearray, memoryview)) and memoryview(p).nbytes > MAX_CHAR_LENGTH:
+                return True
+            if isinstance(p, str) and len(p) > MAX_CHAR_LENGTH // 4 and len(self.str_to_bytes(p)) > MAX_CHAR_LENGTH:
+                return True
+        return False
+
+    def _batch_row(self, params):
+        """BLR and value of each parameter for BatchBuffer, None if the
+        parameters have BLOB values, they are not sent by batches."""
+        if self._blob_params(params):
+            return None
+        row = []
+        for p in params:
+            if p is None:
+                row.append((None, b''))
+            else:
+                row.append(self._param_to_blr(None, p))
+        return row
+
     def uid(self, auth_plugin_name, wire_crypt):
         def pack_cnct_param(k, v):
             if k != CNCT_specific_data:
@@ -626,14 +1071,10 @@ class WireProtocol(object):
 
     @wire_operation
     def _op_free_statement(self, stmt_handle, mode):
-        p = Packer()
-        p.pack_int(self.op_free_statement)
-        p.pack_int(stmt_handle)
-        p.pack_int(mode)
-        self.sock.send(p.get_buffer())
+        self.sock.send(_INT3.pack(self.op_free_statement, stmt_handle, mode))
 
     @wire_operation
-    def _op_prepare_statement(self, stmt_handle, trans_handle, query, option_items=None):
+    def _op_prepare_statement(self, stmt_handle, trans_handle, query, option_items=None, buffer_length=None):
         if option_items is None:
             option_items = bytes([])
         desc_items = option_items + bytes([isc_info_sql_stmt_type])+INFO_SQL_SELECT_DESCRIBE_VARS
@@ -644,43 +1085,31 @@ class WireProtocol(object):
         p.pack_int(3)   # dialect = 3
         p.pack_bytes(self.str_to_bytes(query))
         p.pack_bytes(desc_items)
-        p.pack_int(self.buffer_length)
+        p.pack_int(self.buffer_length if buffer_length is None else buffer_length)
         self.sock.send(p.get_buffer())
 
     @wire_operation
-    def _op_info_sql(self, stmt_handle, vars):
-        p = Packer()
-        p.pack_int(self.op_info_sql)
-        p.pack_int(stmt_handle)
-        p.pack_int(0)
-        p.pack_bytes(vars)
-        p.pack_int(self.buffer_length)
-        self.sock.send(p.get_buffer())
+    def _op_info_sql(self, stmt_handle, vars, buffer_length=None):
+        self.sock.send(
+            _INT3.pack(self.op_info_sql, stmt_handle, 0) + _packed_bytes(vars) +
+            _INT.pack(self.buffer_length if buffer_length is None else buffer_length)
+        )
 
     @wire_operation
-    def _op_execute(self, stmt_handle, trans_handle, params):
-        p = Packer()
-        p.pack_int(self.op_execute)
-        p.pack_int(stmt_handle)
-        p.pack_int(trans_handle)
-
+    def _op_execute(self, stmt_handle, trans_handle, params, encoders=None):
         if len(params) == 0:
-            p.pack_bytes(bytes([]))
-            p.pack_int(0)
-            p.pack_int(0)
-            buf = p.get_buffer()
+            buf = _INT3.pack(self.op_execute, stmt_handle, trans_handle) + _packed_bytes(b'') + _INT2.pack(0, 0)
         else:
-            (blr, values) = self.params_to_blr(trans_handle, params)
-            p.pack_bytes(blr)
-            p.pack_int(0)
-            p.pack_int(1)
-            buf = p.get_buffer() + values
+            (blr, values) = self.params_to_blr(trans_handle, params, encoders)
+            buf = b''.join([
+                _INT3.pack(self.op_execute, stmt_handle, trans_handle), _packed_bytes(blr), _INT2.pack(0, 1), values
+            ])
         if self.accept_version >= PROTOCOL_VERSION16:
-            buf += int_to_bytes(0, 4)
+            buf += bytes(4)
         self.sock.send(buf)
 
     @wire_operation
-    def _op_execute2(self, stmt_handle, trans_handle, params, output_blr):
+    def _op_execute2(self, stmt_handle, trans_handle, params, output_blr, encoders=None):
         p = Packer()
         p.pack_int(self.op_execute2)
         p.pack_int(stmt_handle)
@@ -692,7 +1121,7 @@ class WireProtocol(object):
             p.pack_int(0)
             p.pack_int(0)
         else:
-            (blr, values) = self.params_to_blr(trans_handle, params)
+            (blr, values) = self.params_to_blr(trans_handle, params, encoders)
             p.pack_bytes(blr)
             p.pack_int(0)
             p.pack_int(1)
@@ -722,13 +1151,9 @@ class WireProtocol(object):
 
     @wire_operation
     def _op_fetch(self, stmt_handle, blr, fetch_count):
-        p = Packer()
-        p.pack_int(self.op_fetch)
-        p.pack_int(stmt_handle)
-        p.pack_bytes(blr)
-        p.pack_int(0)
-        p.pack_int(fetch_count)
-        self.sock.send(p.get_buffer())
+        self.sock.send(
+            _INT2.pack(self.op_fetch, stmt_handle) + _packed_bytes(blr) + _INT2.pack(0, fetch_count)
+        )
 
     @wire_operation
     def _op_detach(self):
@@ -765,13 +1190,11 @@ class WireProtocol(object):
         self.sock.send(p.get_buffer())
 
     @wire_operation
-    def _op_get_segment(self, blob_handle):
-        p = Packer()
-        p.pack_int(self.op_get_segment)
-        p.pack_int(blob_handle)
-        p.pack_int(self.buffer_length)
-        p.pack_int(0)
-        self.sock.send(p.get_buffer())
+    def _op_get_segment(self, blob_handle, buffer_length=None):
+        self.sock.send(_INT4.pack(
+            self.op_get_segment, blob_handle,
+            self.buffer_length if buffer_length is None else buffer_length, 0
+        ))
 
     @wire_operation
     def _op_put_segment(self, blob_handle, seg_data):
@@ -785,15 +1208,78 @@ class WireProtocol(object):
         self.sock.send(p.get_buffer() + seg_data + bytes([0])*pad_length)
 
     @wire_operation
-    def _op_batch_segments(self, blob_handle, seg_data):
-        ln = len(seg_data)
+    def _op_batch_segments(self, blob_handle, segments):
+        buf = bytearray()
+        for seg_data in segments:
+            buf += int_to_bytes(len(seg_data), 2)
+            buf += seg_data
+        ln = len(buf)
         p = Packer()
         p.pack_int(self.op_batch_segments)
         p.pack_int(blob_handle)
-        p.pack_int(ln + 2)
-        p.pack_int(ln + 2)
-        pad_length = ((4-(ln+2)) & 3)
-        self.sock.send(p.get_buffer() + int_to_bytes(ln, 2) + seg_data + bytes([0])*pad_length)
+        p.pack_int(ln)
+        p.pack_int(ln)
+        pad_length = ((4-ln) & 3)
+        self.sock.send(p.get_buffer() + buf + bytes([0])*pad_length)
+
+    @wire_operation
+    def _op_batch_create(self, stmt_handle, blr, msglen, bpb):
+        p = Packer()
+        p.pack_int(self.op_batch_create)
+        p.pack_int(stmt_handle)
+        p.pack_bytes(blr)
+        p.pack_int(msglen)
+        p.pack_bytes(bpb)
+        self.sock.send(p.get_buffer())
+
+    @wire_operation
+    def _op_batch_msg(self, stmt_handle, messages):
+        p = Packer()
+        p.pack_int(self.op_batch_msg)
+        p.pack_int(stmt_handle)
+        p.pack_int(len(messages))
+        self.sock.send(p.get_buffer() + b''.join(messages))
+
+    @wire_operation
+    def _op_batch_exec(self, stmt_handle, trans_handle):
+        p = Packer()
+        p.pack_int(self.op_batch_exec)
+        p.pack_int(stmt_handle)
+        p.pack_int(trans_handle)
+        self.sock.send(p.get_buffer())
+
+    @wire_operation
+    def _op_batch_rls(self, stmt_handle):
+        p = Packer()
+        p.pack_int(self.op_batch_rls)
+        p.pack_int(stmt_handle)
+        self.sock.send(p.get_buffer())
+
+    @wire_operation
+    def _op_info_blob(self, blob_handle, b):
+        p = Packer()
+        p.pack_int(self.op_info_blob)
+        p.pack_int(blob_handle)
+        p.pack_int(0)
+        p.pack_bytes(b)
+        p.pack_int(self.buffer_length)
+        self.sock.send(p.get_buffer())
+
+    @wire_operation
+    def _op_seek_blob(self, blob_handle, mode, offset):
+        p = Packer()
+        p.pack_int(self.op_seek_blob)
+        p.pack_int(blob_handle)
+        p.pack_int(mode)
+        p.pack_int(offset)
+        self.sock.send(p.get_buffer())
+
+    @wire_operation
+    def _op_cancel_blob(self, blob_handle):
+        p = Packer()
+        p.pack_int(self.op_cancel_blob)
+        p.pack_int(blob_handle)
+        self.sock.send(p.get_buffer())
 
     @wire_operation
     def _op_close_blob(self, blob_handle):
@@ -25,17 +25,31 @@
 #
 # Python DB-API 2.0 module for Firebird.
 ##############################################################################
+import array
 import datetime
 import decimal
+import functools
 
 from firebirdsql.consts import *    # noqa
 from firebirdsql.utils import *     # noqa
-from firebirdsql.wireprotocol import INFO_SQL_SELECT_DESCRIBE_VARS
+from firebirdsql.err import InternalError
+from firebirdsql.wireprotocol import INFO_SQL_SELECT_DESCRIBE_VARS, MAX_INFO_BUFFER_LENGTH
 from firebirdsql.tz_utils import get_tzinfo_by_id
 from firebirdsql import decfloat
 
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
 
 class XSQLVAR:
+    # shared by the connections to a database, see stmtcache.DescribeCache
+    __slots__ = (
+        'bytes_to_str', 'sqltype', 'sqlscale', 'sqlsubtype', 'sqllen', 'null_ok',
+        'fieldname', 'relname', 'ownname', 'aliasname',
+    )
+
     type_length = {
         SQL_TYPE_VARYING: -1,
         SQL_TYPE_SHORT: 4,
@@ -119,39 +133,36 @@ class XSQLVAR:
 
     def _parse_date(self, raw_value):
         "Convert raw data to datetime.date"
-        nday = bytes_to_bint(raw_value) + 678882
-        century = (4 * nday - 1) // 146097
-        nday = 4 * nday - 1 - 146097 * century
-        day = nday // 4
-
-        nday = (4 * day + 3) // 1461
-        day = 4 * day + 3 - 1461 * nday
-        day = (day + 4) // 4
-
-        month = (5 * day - 3) // 153
-        day = 5 * day - 3 - 153 * month
-        day = (day + 5) // 5
-        year = 100 * century + nday
-        if month < 10:
-            month += 3
-        else:
-            month -= 9
-            year += 1
-        return year, month, day
+        return _date_from_int(bytes_to_bint(raw_value))
 
     def _parse_time(self, raw_value):
         "Convert raw data to datetime.time"
-        n = bytes_to_bint(raw_value)
-        s = n // 10000
-        m = s // 60
-        h = m // 60
-        m = m % 60
-        s = s % 60
-        return (h, m, s, (n % 10000) * 100)
+        return _time_from_int(bytes_to_bint(raw_value))
 
     def _parse_time_zone(self, raw_value):
         return get_tzinfo_by_id(bytes_to_bint(raw_value, u=True))
 
+    def _parse_timestamp_tz(self, raw_value):
+        yyyy, mm, dd = self._parse_date(raw_value[:4])
+        h, m, s, ms = self._parse_time(raw_value[4:8])
+        if raw_value[8:10] == b'\x00\x00':
+            return datetime.datetime(yyyy, mm, dd, h, m, s, ms, tzinfo=datetime.timezone.utc)
+        tz = self._parse_time_zone(raw_value[8:10])
+        offset = self._parse_time_zone(raw_value[10:12])
+        dt = datetime.datetime(yyyy, mm, dd, h, m, s, ms, tzinfo=tz)
+        return dt.astimezone(offset)
+
+    def _parse_time_tz(self, raw_value):
+        h, m, s, ms = self._parse_time(raw_value[:4])
+        if raw_value[4:6] == b'\x00\x00':
+            return datetime.time(h, m, s, ms, tzinfo=datetime.timezone.utc)
+        tz = self._parse_time_zone(raw_value[4:6])
+        offset = self._parse_time_zone(raw_value[6:8])
+        t = datetime.time(h, m, s, ms, tzinfo=tz)
+        dt = datetime.datetime.combine(datetime.date.today(), t).astimezone(offset)
+        t = datetime.time(dt.hour, dt.minute, dt.second, dt.microsecond, tzinfo=offset)
+        return t
+
     def value(self, raw_value):
         if self.sqltype == SQL_TYPE_TEXT:
             return self.bytes_to_str(raw_value).rstrip()
@@ -180,24 +191,9 @@ class XSQLVAR:
         elif self.sqltype == SQL_TYPE_BOOLEAN:
             return True if raw_value[0] != 0 else False
         elif self.sqltype == SQL_TYPE_TIMESTAMP_TZ:
-            yyyy, mm, dd = self._parse_date(raw_value[:4])
-            h, m, s, ms = self._parse_time(raw_value[4:8])
-            if raw_value[8:10] == b'\x00\x00':
-                return datetime.datetime(yyyy, mm, dd, h, m, s, ms, tzinfo=datetime.timezone.utc)
-            tz = self._parse_time_zone(raw_value[8:10])
-            offset = self._parse_time_zone(raw_value[10:12])
-            dt = datetime.datetime(yyyy, mm, dd, h, m, s, ms, tzinfo=tz)
-            return dt.astimezone(offset)
+            return self._parse_timestamp_tz(raw_value)
         elif self.sqltype == SQL_TYPE_TIME_TZ:
-            h, m, s, ms = self._parse_time(raw_value[:4])
-            if raw_value[4:6] == b'\x00\x00':
-                return datetime.time(h, m, s, ms, tzinfo=datetime.timezone.utc)
-            tz = self._parse_time_zone(raw_value[4:6])
-            offset = self._parse_time_zone(raw_value[6:8])
-            t = datetime.time(h, m, s, ms, tzinfo=tz)
-            dt = datetime.datetime.combine(datetime.date.today(), t).astimezone(offset)
-            t = datetime.time(dt.hour, dt.minute, dt.second, dt.microsecond, tzinfo=offset)
-            return t
+            return self._parse_time_tz(raw_value)
         elif self.sqltype == SQL_TYPE_DEC_FIXED:
             return decfloat.decimal_fixed_to_decimal(raw_value, self.sqlscale)
         elif self.sqltype == SQL_TYPE_DEC64:
@@ -205,7 +201,90 @@ class XSQLVAR:
         elif self.sqltype == SQL_TYPE_DEC128:
             return decfloat.decimal128_to_decimal(raw_value)
         else:
-            return raw_value
+            return bytes(raw_value)
+
+    def wire_format(self):
+        """Return (struct format, converter) of the column for RowDecoder.
+        The converter takes the unpacked item, None means the item is the
+        value itself.  VARYING has no fixed format and its converter takes
+        the bytes.
+        """
+        sqltype = self.sqltype
+        if sqltype == SQL_TYPE_VARYING:
+            return None, self.bytes_to_str
+        elif sqltype == SQL_TYPE_TEXT:
+            bytes_to_str = self.bytes_to_str
+            return '%ds%dx' % (self.sqllen, -self.sqllen & 3), lambda b: bytes_to_str(b).rstrip()
+        elif sqltype in (SQL_TYPE_SHORT, SQL_TYPE_LONG, SQL_TYPE_INT64, SQL_TYPE_INT128):
+            fmt = {SQL_TYPE_INT64: 'q', SQL_TYPE_INT128: '16s'}.get(sqltype, 'i')
+            scale = self.sqlscale
+            if sqltype == SQL_TYPE_INT128:
+                if scale:
+                    return fmt, lambda b: decimal.Decimal(str(bytes_to_bint(b)) + 'e' + str(scale))
+                return fmt, bytes_to_bint
+            if scale:
+                return fmt, lambda n: decimal.Decimal(str(n) + 'e' + str(scale))
+            return fmt, None
+        elif sqltype == SQL_TYPE_DATE:
+            return 'i', lambda n: datetime.date(*_date_from_int(n))
+        elif sqltype == SQL_TYPE_TIME:
+            return 'i', lambda n: datetime.time(*_time_from_int(n))
+        elif sqltype == SQL_TYPE_TIMESTAMP:
+            # date in the high word, time in the low word
+            return 'q', lambda n: datetime.datetime(*_date_from_int(n >> 32), *_time_from_int(n & 0xffffffff))
+        elif sqltype == SQL_TYPE_FLOAT:
+            return 'f', None
+        elif sqltype == SQL_TYPE_DOUBLE:
+            return 'd', None
+        elif sqltype == SQL_TYPE_BOOLEAN:
+            return '?3x', None
+        elif sqltype == SQL_TYPE_TIMESTAMP_TZ:
+            return '12s', self._parse_timestamp_tz
+        elif sqltype == SQL_TYPE_TIME_TZ:
+            return '8s', self._parse_time_tz
+        elif sqltype == SQL_TYPE_DEC_FIXED:
+            scale = self.sqlscale
+            return '16s', lambda b: decfloat.decimal_fixed_to_decimal(b, scale)
+        elif sqltype == SQL_TYPE_DEC64:
+            return '8s', decfloat.decimal64_to_decimal
+        elif sqltype == SQL_TYPE_DEC128:
+            return '16s', decfloat.decimal128_to_decimal
+        else:
+            ln = self.io_length()
+            return '%ds%dx' % (ln, -ln & 3), None
+
+
+def _date_from_int(nday):
+    "Convert days from 1858-11-17 to (year, month, day)"
+    nday += 678882
+    century = (4 * nday - 1) // 146097
+    nday = 4 * nday - 1 - 146097 * century
+    day = nday // 4
+
+    nday = (4 * day + 3) // 1461
+    day = 4 * day + 3 - 1461 * nday
+    day = (day + 4) // 4
+
+    month = (5 * day - 3) // 153
+    day = 5 * day - 3 - 153 * month
+    day = (day + 5) // 5
+    year = 100 * century + nday
+    if month < 10:
+        month += 3
+    else:
+        month -= 9
+        year += 1
+    return year, month, day
+
+
+def _time_from_int(n):
+    "Convert 1/10000 seconds from midnight to (hour, minute, second, microsecond)"
+    s = n // 10000
+    m = s // 60
+    h = m // 60
+    m = m % 60
+    s = s % 60
+    return (h, m, s, (n % 10000) * 100)
 
 
 sqltype2blr = {
@@ -256,15 +335,297 @@ def calc_blr(xsqlda):
     return bytes(256 + b if b < 0 else b for b in blr)
 
 
+_INT = struct.Struct('>i')
+
+
+class RowDecoder:
+    """Row decoder compiled from a XSQLVAR array.
+
+    Converters, struct formats for runs of fixed width columns and the
+    output BLR are computed once when the statement is prepared, so
+    decoding a row does no per value type dispatch.
+    """
+    def __init__(self, xsqlda, protocol_version, columnar=False):
+        self.xsqlda = xsqlda
+        self.blr = calc_blr(xsqlda)
+        self.null_bitmap_length = (len(xsqlda) + 7) // 8
+        self.null_indicator = null_indicator = protocol_version < PROTOCOL_VERSION13
+
+        # (Struct or None, converter) by column, for rows having NULLs
+        self.columns = []
+        # (Struct, converters) for a run of fixed width columns,
+        # (None, converter) for a VARYING column
+        self.steps = []
+        fmts, converters = [], []
+        for x in xsqlda:
+            fmt, converter = x.wire_format()
+            if columnar and _column_typecode(x):
+                converter = None    # ColumnBuilder keeps the unpacked item
+            if fmt is None:
+                if fmts:
+                    self.steps.append((struct.Struct('>' + ''.join(fmts)), tuple(converters)))
+                    fmts, converters = [], []
+                self.steps.append((None, converter))
+                self.columns.append((None, converter))
+            else:
+                self.columns.append((struct.Struct('>' + fmt), converter))
+                fmts.append(fmt + 'i' if null_indicator else fmt)
+                converters.append(converter)
+        if fmts:
+            self.steps.append((struct.Struct('>' + ''.join(fmts)), tuple(converters)))
+        # format of the whole row if all columns are fixed width
+        self.fixed_format = ''.join(fmts) if len(self.steps) < 2 and fmts else None
+
+        self.decode = self._decode_with_null_indicator if null_indicator else self._decode_with_null_bitmap
+
+    def _decode_with_null_indicator(self, buf, start, end):
+        "Decode a row, each value is followed by a NULL indicator (protocol < 13)"
+        r = []
+        pos = start
+        for st, converters in self.steps:
+            if st is None:  # VARYING
+                if end - pos < 4:
+                    return None, start
+                ln = _INT.unpack_from(buf, pos)[0]
+                pos += 4
+                n = (ln + 3) & ~3
+                if end - pos < n + 4:
+                    return None, start
+                if _INT.unpack_from(buf, pos + n)[0]:
+                    r.append(None)
+                else:
+                    r.append(converters(buf[pos:pos+ln]))
+                pos += n + 4
+            else:
+                if end - pos < st.size:
+                    return None, start
+                values = st.unpack_from(buf, pos)
+                pos += st.size
+                r += [
+                    None if is_null else v if converter is None else converter(v)
+                    for converter, v, is_null in zip(converters, values[::2], values[1::2])
+                ]
+        return r, pos
+
+    def _decode_with_null_bitmap(self, buf, start, end):
+        "Decode a row, NULL columns are omitted and marked in a bitmap (protocol >= 13)"
+        n = self.null_bitmap_length
+        pos = start + ((n + 3) & ~3)
+        if end < pos:
+            return None, start
+        null_bitmap = int.from_bytes(buf[start:start+n], 'little')
+        r = []
+        if null_bitmap:
+            for i, (st, converter) in enumerate(self.columns):
+                if null_bitmap & (1 << i):
+                    r.append(None)
+                elif st is None:    # VARYING
+                    if end - pos < 4:
+                        return None, start
+                    ln = _INT.unpack_from(buf, pos)[0]
+                    pos += 4
+                    if end - pos < (ln + 3) & ~3:
+                        return None, start
+                    r.append(converter(buf[pos:pos+ln]))
+                    pos += (ln + 3) & ~3
+                else:
+                    if end - pos < st.size:
+                        return None, start
+                    v = st.unpack_from(buf, pos)[0]
+                    pos += st.size
+                    r.append(v if converter is None else converter(v))
+            return r, pos
+
+        for st, converters in self.steps:
+            if st is None:  # VARYING
+                if end - pos < 4:
+                    return None, start
+                ln = _INT.unpack_from(buf, pos)[0]
+                pos += 4
+                if end - pos < (ln + 3) & ~3:
+                    return None, start
+                r.append(converters(buf[pos:pos+ln]))
+                pos += (ln + 3) & ~3
+            else:
+                if end - pos < st.size:
+                    return None, start
+                values = st.unpack_from(buf, pos)
+                pos += st.size
+                r += [v if converter is None else converter(v) for converter, v in zip(converters, values)]
+        return r, pos
+
+
+_column_typecodes = {
+    SQL_TYPE_SHORT: 'h',
+    SQL_TYPE_LONG: 'i',
+    SQL_TYPE_INT64: 'q',
+    SQL_TYPE_FLOAT: 'f',
+    SQL_TYPE_DOUBLE: 'd',
+    SQL_TYPE_DATE: 'i',     # days from 1858-11-17
+}
+
+# 1858-11-17 + 40587 days = 1970-01-01
+_UNIX_EPOCH_DAY = 40587
+_BASE_DATE = datetime.date(1858, 11, 17)
+
+
+def _column_typecode(x):
+    "array.array typecode of a column for columnar fetch, None if it goes to a list"
+    if x.sqlscale and x.sqltype in (SQL_TYPE_SHORT, SQL_TYPE_LONG, SQL_TYPE_INT64):
+        return None
+    return _column_typecodes.get(x.sqltype)
+
+
+def _to_numpy(a, dtype):
+    "numpy array sharing the buffer of array.array a"
+    return numpy.frombuffer(a, dtype=dtype) if a else numpy.empty(0, dtype)
+
+
+class ColumnBuilder:
+    """Collect fetched rows into one container by column.
+
+    SHORT, LONG, INT64 without scale, FLOAT, DOUBLE and DATE columns go
+    into array.array (numpy arrays by columns() if numpy is installed),
+    other columns go into lists.  Every column has a NULL mask.
+    Runs of fixed length rows are unpacked at once and sliced by column.
+    """
+    def __init__(self, decoder):
+        # decoder is a RowDecoder(columnar=True)
+        self.decoder = decoder
+        self.xsqlda = decoder.xsqlda
+        self.count = 0
+        self.values = []
+        self.nulls = []
+        self.converters = [converter for st, converter in decoder.columns]
+        for x in self.xsqlda:
+            typecode = _column_typecode(x)
+            self.values.append(array.array(typecode) if typecode else [])
+            self.nulls.append(array.array('B'))
+        self._null_values = [0 if isinstance(v, array.array) else None for v in self.values]
+        self._packed = {}
+
+        if decoder.null_indicator:
+            self._header = '8x'     # status, count
+            self._zero_bitmap = b''
+        else:
+            n = decoder.null_bitmap_length
+            self._header = '%dx' % (8 + ((n + 3) & ~3))
+            self._zero_bitmap = bytes(n)
+        if decoder.fixed_format is not None:
+            # status, count, row and op code of the next packet
+            self._stride = struct.calcsize('>' + self._header + decoder.fixed_format + '4x')
+
+    def append(self, row):
+        "Append a row decoded by the columnar RowDecoder"
+        for values, nulls, null_value, v in zip(self.values, self.nulls, self._null_values, row):
+            if v is None:
+                values.append(null_value)
+                nulls.append(1)
+            else:
+                values.append(v)
+                nulls.append(0)
+        self.count += 1
+
+    def append_converted(self, row):
+        "Append a row decoded by the default RowDecoder"
+        row = list(row)
+        for i, x in enumerate(self.xsqlda):
+            if x.sqltype == SQL_TYPE_DATE and row[i] is not None:
+                row[i] = (row[i] - _BASE_DATE).days
+        self.append(row)
+
+    def _packed_struct(self, n):
+        st = self._packed.get(n)
+        if st is None:
+            if len(self._packed) > 8:
+                self._packed.clear()
+            st = self._packed[n] = struct.Struct(
+                '>' + (self._header + self.decoder.fixed_format + '4x') * n)
+        return st
+
+    def append_packed(self, buf, pos, end, op_fetch_response):
+        """Decode a run of op_fetch_response packets of one row without NULL
+        bitmap, starting at the status of a packet whose op code is read.
+        Return the position after the run.
+        """
+        if self.decoder.fixed_format is None:
+            return pos
+        stride = self._stride
+        zero_bitmap = self._zero_bitmap
+        bitmap_end = 8 + len(zero_bitmap)
+        n = 0
+        p = pos
+        while end - p >= stride:
+            if (_INT.unpack_from(buf, p + 4)[0] != 1
+                    or _INT.unpack_from(buf, p + stride - 4)[0] != op_fetch_response
+                    or buf[p+8:p+bitmap_end] != zero_bitmap):
+                break
+            n += 1
+            p += stride
+        if not n:
+            return pos
+        items = self._packed_struct(n).unpack_from(buf, pos)
+        if self.decoder.null_indicator:
+            m = len(self.values) * 2
+            for i in range(len(self.values)):
+                self._extend(i, items[i*2::m], items[i*2+1::m])
+        else:
+            m = len(self.values)
+            for i in range(m):
+                self._extend(i, items[i::m])
+        self.count += n
+        return p
+
+    def _extend(self, i, items, null_indicators=()):
+        values, converter = self.values[i], self.converters[i]
+        if not any(null_indicators):
+            self.nulls[i].frombytes(bytes(len(items)))
+            values.extend(items if converter is None else map(converter, items))
+        else:
+            null_value = self._null_values[i]
+            self.nulls[i].extend([1 if ind else 0 for ind in null_indicators])
+            values.extend([
+                null_value if ind else v if converter is None else converter(v)
+                for v, ind in zip(items, null_indicators)
+            ])
+
+    def columns(self):
+        "Return [(values, nulls), ...] by column"
+        r = []
+        for x, values, nulls in zip(self.xsqlda, self.values, self.nulls):
+            if numpy is not None:
+                nulls = _to_numpy(nulls, numpy.bool_)
+                if x.sqltype == SQL_TYPE_DATE:
+                    days = _to_numpy(values, numpy.int32).astype(numpy.int64)
+                    values = (days - _UNIX_EPOCH_DAY).astype('datetime64[D]')
+                    values[nulls] = numpy.datetime64('NaT')
+                elif isinstance(values, array.array):
+                    values = _to_numpy(values, values.typecode)
+            elif x.sqltype == SQL_TYPE_DATE:
+                values = [None if is_null else datetime.date(*_date_from_int(n)) for n, is_null in zip(values, nulls)]
+            r.append((values, nulls))
+        return r
+
+
+@functools.lru_cache(maxsize=None)
+def charset_bytes_to_str(charset):
+    "bytes to str function of a charset, it does not refer to a connection"
+    return functools.partial(str, encoding=charset_map.get(charset, charset))
+
+
 def parse_select_items(buf, xsqlda, connection):
+    "Return the index of the first column not described by buf, -1 if all are"
     index = 0
+    described = False   # describe_end of the column of index is read
     i = 0
+    bytes_to_str = charset_bytes_to_str(connection.charset)
     item = buf[i]
     while item != isc_info_end:
         if item == isc_info_sql_sqlda_seq:
             ln = bytes_to_int(buf[i+1:i+3])
             index = bytes_to_int(buf[i+3:i+3+ln])
-            xsqlda[index-1] = XSQLVAR(connection.bytes_to_str)
+            xsqlda[index-1] = XSQLVAR(bytes_to_str)
+            described = False
             i = i + 3 + ln
         elif item == isc_info_sql_type:
             ln = bytes_to_int(buf[i+1:i+3])
@@ -288,23 +649,26 @@ def parse_select_items(buf, xsqlda, connection):
             i = i + 3 + ln
         elif item == isc_info_sql_field:
             ln = bytes_to_int(buf[i+1:i+3])
-            xsqlda[index-1].fieldname = connection.bytes_to_str(buf[i+3:i+3+ln])
+            xsqlda[index-1].fieldname = bytes_to_str(buf[i+3:i+3+ln])
             i = i + 3 + ln
         elif item == isc_info_sql_relation:
             ln = bytes_to_int(buf[i+1:i+3])
-            xsqlda[index-1].relname = connection.bytes_to_str(buf[i+3:i+3+ln])
+            xsqlda[index-1].relname = bytes_to_str(buf[i+3:i+3+ln])
             i = i + 3 + ln
         elif item == isc_info_sql_owner:
             ln = bytes_to_int(buf[i+1:i+3])
-            xsqlda[index-1].ownname = connection.bytes_to_str(buf[i+3:i+3+ln])
+            xsqlda[index-1].ownname = bytes_to_str(buf[i+3:i+3+ln])
             i = i + 3 + ln
         elif item == isc_info_sql_alias:
             ln = bytes_to_int(buf[i+1:i+3])
-            xsqlda[index-1].aliasname = connection.bytes_to_str(buf[i+3:i+3+ln])
+            xsqlda[index-1].aliasname = bytes_to_str(buf[i+3:i+3+ln])
             i = i + 3 + ln
         elif item == isc_info_truncated:
+            if described:
+                return index + 1 if index < len(xsqlda) else -1
             return index    # return next index
         elif item == isc_info_sql_describe_end:
+            described = True
             i = i + 1
         else:
             print('\t', item, 'Invalid item [%02x] ! i=%d' % (buf[i], i))
@@ -313,9 +677,77 @@ def parse_select_items(buf, xsqlda, connection):
     return -1   # no more info
 
 
+class DescribeContinuation:
+    """Columns of a SELECT not described by a truncated prepare response.
+
+    They are asked by op_info_sql requests sent together, each from a
+    start index with a buffer sized by the bytes per column seen in the
+    prepare response.  A response may be truncated again, only its
+    complete columns are kept and the rest are asked by the next round.
+    """
+    def __init__(self, xsqlda, next_index, nbytes):
+        self.xsqlda = xsqlda
+        # the column of next_index may be described partly
+        xsqlda[next_index-1] = None
+        self.column_size = max(nbytes // max(next_index - 1, 1), 64) * 5 // 4
+        self.missing = None
+
+    @property
+    def describe_length(self):
+        "Estimated buffer length describing all the columns in one response"
+        return min(32 + len(self.xsqlda) * self.column_size, MAX_INFO_BUFFER_LENGTH)
+
+    def requests(self):
+        "[(start index, buffer length), ...] of the next round, [] if described"
+        missing = self.xsqlda.count(None)
+        if not missing:
+            return []
+        if self.missing is not None and missing >= self.missing:
+            # no progress, columns are larger than estimated
+            if self.column_size >= MAX_INFO_BUFFER_LENGTH:
+                raise InternalError('describe vars do not fit in an info buffer')
+            self.column_size = min(self.column_size * 2, MAX_INFO_BUFFER_LENGTH)
+        self.missing = missing
+        per_request = max(MAX_INFO_BUFFER_LENGTH // self.column_size, 1)
+        requests = []
+        i, n = 0, len(self.xsqlda)
+        while i < n:
+            if self.xsqlda[i] is not None:
+                i += 1
+                continue
+            j = i
+            while j < n and self.xsqlda[j] is None:
+                j += 1
+            for k in range(i, j, per_request):
+                count = min(per_request, j - k)
+                requests.append((k + 1, min(16 + count * self.column_size, MAX_INFO_BUFFER_LENGTH)))
+            i = j
+        return requests
+
+    @staticmethod
+    def items(start):
+        "op_info_sql items describing the columns from start"
+        return bytes([isc_info_sql_sqlda_start, 2]) + int_to_bytes(start, 2) + INFO_SQL_SELECT_DESCRIBE_VARS
+
+    def received(self, start, buf, connection):
+        "Keep the complete columns of the response of the request from start"
+        assert buf[:2] == bytes([0x04, 0x07])
+        ln = bytes_to_int(buf[2:4])
+        assert bytes_to_int(buf[4:4+ln]) == len(self.xsqlda)
+        items = [None] * len(self.xsqlda)
+        end = parse_select_items(buf[4+ln:], items, connection)
+        if end < 0:
+            end = len(items) + 1
+        self.xsqlda[start-1:end-1] = items[start-1:end-1]
+
+
 def parse_xsqlda(buf, connection, stmt_handle):
+    """Return (statement type, XSQLVAR list, describe length).  The
+    describe length is None if buf held all the columns, else the
+    estimated buffer length to describe them in one response."""
     xsqlda = []
     stmt_type = None
+    describe_length = None
     i = 0
     while i < len(buf):
         if buf[i:i+3] == bytes([isc_info_sql_stmt_type, 0x04, 0x00]):
@@ -328,16 +760,18 @@ def parse_xsqlda(buf, connection, stmt_handle):
             col_len = bytes_to_int(buf[i:i+ln])
             xsqlda = [None] * col_len
             next_index = parse_select_items(buf[i+ln:], xsqlda, connection)
-            while next_index > 0:   # more describe vars
-                connection._op_info_sql(
-                    stmt_handle,
-                    bytes([isc_info_sql_sqlda_start, 2]) + int_to_bytes(next_index, 2) + INFO_SQL_SELECT_DESCRIBE_VARS
-                )
-                (h, oid, buf) = connection._op_response()
-                assert buf[:2] == bytes([0x04, 0x07])
-                ln = bytes_to_int(buf[2:4])
-                assert bytes_to_int(buf[4:4+ln]) == col_len
-                next_index = parse_select_items(buf[4+ln:], xsqlda, connection)
+            if next_index > 0:
+                more = DescribeContinuation(xsqlda, next_index, len(buf))
+                requests = more.requests()
+                while requests:
+                    for start, length in requests:
+                        connection._op_info_sql(stmt_handle, more.items(start), length)
+                    for start, length in requests:
+                        (h, oid, info) = connection._op_response()
+                        more.received(start, info, connection)
+                    requests = more.requests()
+                describe_length = more.describe_length
+            break
         else:
             break
-    return stmt_type, xsqlda
+    return stmt_type, xsqlda, describe_length
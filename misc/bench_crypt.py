@@ -0,0 +1,57 @@
+#!/usr/bin/env python3
+##############################################################################
+# Copyright (c) 2025, Hajime Nakagami<nakagami@gmail.com>
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#
+# * Redistributions of source code must retain the above copyright notice, this
+#   list of conditions and the following disclaimer.
+#
+# * Redistributions in binary form must reproduce the above copyright notice,
+#  this list of conditions and the following disclaimer in the documentation
+#  and/or other materials provided with the distribution.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+# DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE
+# FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL
+# DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR
+# SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER
+# CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY,
+# OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+# OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+#
+# Micro benchmark of the wire encryption ciphers.
+import os
+import sys
+import timeit
+sys.path.append('./../')
+from firebirdsql import arc4, chacha
+
+
+def main(number=10, size=1024 * 1024):
+    data = os.urandom(size)
+    ciphers = [
+        ('ChaCha20', lambda: chacha.ChaCha20(bytes(32), bytes(12))),
+        ('ChaCha64', lambda: chacha.ChaCha20(bytes(32), bytes(8))),
+        ('ARC4', lambda: arc4.ARC4(bytes(16))),
+    ]
+    if chacha.algorithms is not None:
+        ciphers.append(('CryptographyChaCha20', lambda: chacha.CryptographyChaCha20(bytes(32), bytes(12))))
+    if arc4._ARC4Algorithm is not None:
+        ciphers.append(('CryptographyARC4', lambda: arc4.CryptographyARC4(bytes(16))))
+    for name, cipher in ciphers:
+        c = cipher()
+        t = timeit.timeit(lambda: c.translate(data), number=number)
+        print('%-20s %10.3f MB/s' % (name, size * number / t / 1e6))
+        # small packets
+        c = cipher()
+        t = timeit.timeit(lambda: c.translate(data[:100]), number=number * 1000)
+        print('%-20s %10.3f usec per 100 bytes' % (name, t / (number * 1000) * 1e6))
+
+
+if __name__ == '__main__':
+    main()
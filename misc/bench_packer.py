@@ -0,0 +1,93 @@
+#!/usr/bin/env python3
+##############################################################################
+# Copyright (c) 2025, Hajime Nakagami<nakagami@gmail.com>
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#
+# * Redistributions of source code must retain the above copyright notice, this
+#   list of conditions and the following disclaimer.
+#
+# * Redistributions in binary form must reproduce the above copyright notice,
+#  this list of conditions and the following disclaimer in the documentation
+#  and/or other materials provided with the distribution.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+# DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE
+# FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL
+# DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR
+# SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER
+# CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY,
+# OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+# OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+#
+# Micro benchmark of building wire protocol packets.
+##############################################################################
+import sys
+import timeit
+sys.path.append('./../')
+from firebirdsql.utils import bint_to_bytes
+from firebirdsql.wireprotocol import WireProtocol, Packer
+
+
+class BytesPacker(object):
+    "Packer concatenating bytes, as it was before"
+    def __init__(self):
+        self.buf = b''
+
+    def pack_int(self, v):
+        self.buf += bint_to_bytes(v, 4)
+
+    def pack_bytes(self, v):
+        n = len(v)
+        self.buf += bint_to_bytes(n, 4)
+        n = ((n+3)//4)*4
+        self.buf += v + (n - len(v)) * b'\0'
+
+    def get_buffer(self):
+        return self.buf
+
+
+class NullSocket(object):
+    def send(self, b):
+        pass
+
+
+def fetch_packet(packer_class, blr):
+    p = packer_class()
+    p.pack_int(WireProtocol.op_fetch)
+    p.pack_int(1)
+    p.pack_bytes(blr)
+    p.pack_int(0)
+    p.pack_int(400)
+    return p.get_buffer()
+
+
+def main(number=100000):
+    blr = bytes([5, 2, 4, 0, 8, 0] + [8, 0, 7, 0] * 4 + [255, 76])
+    for packer_class in (BytesPacker, Packer):
+        t = timeit.timeit(lambda: fetch_packet(packer_class, blr), number=number)
+        print('%-12s op_fetch packet %8.3f usec' % (packer_class.__name__, t / number * 1e6))
+
+    protocol = WireProtocol()
+    protocol.charset = 'UTF8'
+    protocol.accept_version = 16
+    protocol.db_handle = 1
+    protocol.sock = NullSocket()
+    for name, args in (
+        ('_op_fetch', (1, blr, 400)),
+        ('_op_free_statement', (1, 1)),
+        ('_op_info_sql', (1, bytes([23]))),
+        ('_op_get_segment', (1, 65535)),
+        ('_op_execute', (1, 2, [1, b'abc', None], {})),
+    ):
+        op = getattr(protocol, name)
+        t = timeit.timeit(lambda: op(*args), number=number)
+        print('WireProtocol.%-20s %8.3f usec' % (name, t / number * 1e6))
+
+
+if __name__ == '__main__':
+    main()